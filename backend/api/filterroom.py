@@ -1,6 +1,10 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException, status, Query
 from typing import List, Dict
 
+from services.elasticsearch_service import build_facet_aggs, parse_facet_aggs, search_rooms_combined_async
+from services.room_filters import PRICE_RANGES, AREA_RANGES
+from services.room_format import format_room_docs
+
 router = APIRouter()
 
 # ===== API 1: LẤY FILTER NỘI THẤT =====
@@ -44,13 +48,8 @@ async def get_price_ranges():
     """
     API LẤY DANH SÁCH KHOẢNG GIÁ
     """
-    price_ranges = [
-        {"label": "Tất cả khoảng giá", "value": ""},
-        {"label": "Dưới 1 triệu", "value": "under-1m"},
-        {"label": "1 - 3 triệu", "value": "1m-3m"},
-        {"label": "3 - 5 triệu", "value": "3m-5m"},
-        {"label": "5 - 7 triệu", "value": "5m-7m"},
-        {"label": "Trên 7 triệu", "value": "over-7m"},
+    price_ranges = [{"label": "Tất cả khoảng giá", "value": ""}] + [
+        {"label": r["label"], "value": r["value"]} for r in PRICE_RANGES
     ]
     
     return {
@@ -64,16 +63,64 @@ async def get_area_ranges():
     """
     API LẤY DANH SÁCH DIỆN TÍCH
     """
-    area_ranges = [
-        {"label": "Tất cả diện tích", "value": ""},
-        {"label": "Dưới 20m²", "value": "under-20"},
-        {"label": "20 - 30m²", "value": "20-30"},
-        {"label": "30 - 40m²", "value": "30-40"},
-        {"label": "40 - 50m²", "value": "40-50"},
-        {"label": "Trên 50m²", "value": "over-50"},
+    area_ranges = [{"label": "Tất cả diện tích", "value": ""}] + [
+        {"label": r["label"], "value": r["value"]} for r in AREA_RANGES
     ]
     
     return {
         "success": True,
         "data": area_ranges
-    }
\ No newline at end of file
+    }
+
+# ===== API 5: FACET COUNT CHO SIDEBAR (KÈM KẾT QUẢ TÌM KIẾM) =====
+@router.post("/facets")
+async def get_facets(
+    search_data: dict,
+    page: int = Query(1, ge=1),
+    limit: int = Query(20, ge=1, le=100)
+):
+    """
+    API LẤY SỐ PHÒNG THEO TỪNG KHOẢNG GIÁ / DIỆN TÍCH / TỈNH / QUẬN
+    cho query hiện tại, tính cùng 1 request Elasticsearch với danh sách phòng.
+    
+    Body: giống API /api/find-rooms/search-combined
+    """
+    keyword = (search_data.get("keyword") or "").strip()
+    
+    try:
+        docs, total, aggregations = await search_rooms_combined_async(
+            query_string=keyword or None,
+            search_data=search_data,
+            page=page,
+            page_size=limit,
+            facet_aggs=build_facet_aggs(search_data, PRICE_RANGES, AREA_RANGES)
+        )
+    except Exception as e:
+        print(f"🚨 ELASTICSEARCH ERROR DETAIL: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Lỗi dịch vụ tìm kiếm. Vui lòng thử lại sau."
+        )
+    
+    counts = parse_facet_aggs(aggregations)
+    
+    return {
+        "success": True,
+        "total": total,
+        "page": page,
+        "limit": limit,
+        "total_pages": (total + limit - 1) // limit if total > 0 else 0,
+        "rooms": format_room_docs(docs),
+        "facets": {
+            "price": [
+                {"label": r["label"], "value": r["value"], "count": counts["price"].get(r["value"], 0)}
+                for r in PRICE_RANGES
+            ],
+            "area": [
+                {"label": r["label"], "value": r["value"], "count": counts["area"].get(r["value"], 0)}
+                for r in AREA_RANGES
+            ],
+            "province": [{"value": k, "count": v} for k, v in counts["province"].items()],
+            "district": [{"value": k, "count": v} for k, v in counts["district"].items()]
+        }
+    }
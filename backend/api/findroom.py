@@ -1,132 +1,154 @@
 # api/find_room_api.py
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlmodel import select, or_, and_
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Header, Response
+from sqlmodel import select, or_, and_, func
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import tuple_
+from sqlalchemy.orm import selectinload, joinedload
 from typing import List, Optional
 from uuid import UUID
 
-from core.database import get_async_session
-from models.models import User, Room
+from core.database import get_async_session, async_session_maker
+from core.cursor import encode_cursor, decode_cursor
+from models.models import User, Room, normalize_location
 
-from services.elasticsearch_service import search_rooms as es_search
+from services.room_filters import RANGE_FIELDS, sql_range_conditions
+from services.room_format import format_room_items, format_room_docs
+from models.schemas import RoomSearchResponse, RoomCursorResponse, orjson_response
+from services.search_cache import SEARCH_CACHE
+from services.room_detail_cache import ROOM_DETAIL_CACHE
+from services.elasticsearch_service import search_rooms_async as es_search, search_room_docs_async, search_rooms_combined_async
 
 router = APIRouter()
 
-# ===== API 1: LỌC PHÒNG THEO LOCATION + FILTERS (CHỈ TRẢ VỀ TRANG 1) =====
-@router.post("/search")
-async def search_rooms(
-    search_data: dict,
-    session: AsyncSession = Depends(get_async_session),
-    limit: int = Query(20, ge=1, le=100)
-):
+# Load thông tin liên hệ chủ trọ cho cả trang bằng 1 query (SELECT ... WHERE id IN (...)),
+# chỉ lấy các cột response cần => bỏ N+1 query landlord
+LANDLORD_CONTACT = selectinload(Room.landlord).load_only(User.email, User.phone)
+
+# ===== HELPER: QUERY BUILDER DÙNG CHUNG CHO /search VÀ /search/page =====
+def build_room_filters(search_data: dict) -> list:
     """
-    API LỌC PHÒNG - CHỈ TRẢ VỀ TRANG 1
-    
-    Body mẫu:
-    {
-        "location": {
-            "province": "Hà Nội",
-            "district": "Cầu Giấy", 
-            "ward": "Dịch Vọng"
-        },
-        "filters": {
-            "price": {"min": 2000000, "max": 5000000},
-            "area": {"min": 20, "max": 30}
-        }
-    }
+    Chuyển body tìm kiếm (location + filters) thành danh sách điều kiện WHERE.
+    Dùng chung cho cả truy vấn lấy dữ liệu và truy vấn COUNT(*).
     """
-    
-    # Base query - chỉ lấy phòng available
-    query = select(Room).where(Room.room_status == "available")
+    # Base - chỉ lấy phòng available
+    conditions = [Room.room_status == "available"]
     
     # ===== LOCATION FILTERS =====
     location = search_data.get("location", {})
+    # So khớp trên cột *_norm (không dấu, lower-case) => dùng được GIN trigram index
     if location:
         if location.get("province"):
-            query = query.where(Room.province.ilike(f"%{location['province']}%"))
+            conditions.append(Room.province_norm.contains(normalize_location(location["province"]), autoescape=True))
         
         if location.get("district"):
-            query = query.where(Room.district.ilike(f"%{location['district']}%"))
+            conditions.append(Room.district_norm.contains(normalize_location(location["district"]), autoescape=True))
         
         if location.get("ward"):
-            query = query.where(Room.ward.ilike(f"%{location['ward']}%"))
+            conditions.append(Room.ward_norm.contains(normalize_location(location["ward"]), autoescape=True))
     
     # ===== FILTERS =====
-    filters = search_data.get("filters", {})
+    # Nhận slug ("3m-5m", predicate dựng sẵn trong registry) hoặc {"min","max"}
+    filters = search_data.get("filters") or {}
+    for field in RANGE_FIELDS:
+        if filters.get(field):
+            conditions.extend(sql_range_conditions(field, filters[field]))
     
-    # Price filter
-    if filters.get("price"):
-        price_filter = filters["price"]
-        
-        if price_filter.get("min") is not None:
-            try:
-                min_price = float(price_filter["min"])
-                query = query.where(Room.price >= min_price)
-            except (ValueError, TypeError):
-                pass
-        
-        if price_filter.get("max") is not None:
-            try:
-                max_price = float(price_filter["max"])
-                query = query.where(Room.price <= max_price)
-            except (ValueError, TypeError):
-                pass
-    
-    # Area filter
-    if filters.get("area"):
-        area_filter = filters["area"]
-        
-        if area_filter.get("min") is not None:
-            try:
-                min_area = float(area_filter["min"])
-                query = query.where(Room.area >= min_area)
-            except (ValueError, TypeError):
-                pass
-        
-        if area_filter.get("max") is not None:
-            try:
-                max_area = float(area_filter["max"])
-                query = query.where(Room.area <= max_area)
-            except (ValueError, TypeError):
-                pass
+    return conditions
+
+
+async def fetch_room_page(
+    session: AsyncSession,
+    search_data: dict,
+    page: int,
+    limit: int
+) -> tuple[List[Room], int]:
+    """
+    Lấy 1 trang phòng + tổng số kết quả.
+    LIMIT/OFFSET chạy trong SQL, tổng số lấy bằng COUNT(*) riêng
+    => mỗi request chỉ load đúng số phòng của 1 trang.
+    """
+    conditions = build_room_filters(search_data)
     
-    # Order by created_at desc
-    query = query.order_by(Room.created_at.desc())
+    # Tổng số - COUNT(*) không load row nào
+    count_result = await session.execute(
+        select(func.count()).select_from(Room).where(*conditions)
+    )
+    total = count_result.scalar_one()
     
-    # Execute query - LẤY TỔNG SỐ
-    result = await session.execute(query)
-    all_rooms = result.scalars().all()
-    total = len(all_rooms)
+    if total == 0:
+        return [], 0
     
-    # CHỈ LẤY TRANG 1
-    page = 1
+    # Lấy đúng 1 trang
     offset = (page - 1) * limit
-    paginated_rooms = all_rooms[offset:offset + limit]
+    if offset >= total:
+        return [], total
     
-    # Format response
-    rooms_data = []
-    for room in paginated_rooms:
-        # Get landlord info
-        landlord_result = await session.execute(
-            select(User).where(User.id == room.landlord_id)
+    result = await session.execute(
+        select(Room)
+        .options(LANDLORD_CONTACT)
+        .where(*conditions)
+        .order_by(Room.created_at.desc(), Room.id.desc())
+        .offset(offset)
+        .limit(limit)
+    )
+    return list(result.scalars().all()), total
+
+
+async def fetch_room_page_by_cursor(
+    session: AsyncSession,
+    search_data: dict,
+    cursor: Optional[str],
+    limit: int
+) -> tuple[List[Room], Optional[str]]:
+    """
+    Keyset pagination: seek bằng WHERE (created_at, id) < (:ts, :id)
+    thay vì OFFSET => chi phí mỗi trang không đổi dù cuộn sâu tới đâu.
+    Dùng index ix_rooms_status_created_at_id.
+    """
+    conditions = build_room_filters(search_data)
+    
+    if cursor:
+        last_created_at, last_id = decode_cursor(cursor)
+        conditions.append(
+            tuple_(Room.created_at, Room.id) < tuple_(last_created_at, last_id)
         )
-        landlord = landlord_result.scalar_one_or_none()
-        
-        rooms_data.append({
-            "id": str(room.id),
-            "title": room.title,
-            "province": room.province,
-            "district": room.district,
-            "ward": room.ward,
-            "area": room.area,
-            "price": room.price,
-            "images": room.images or [],
-            "created_at": room.created_at.isoformat(),
-            "landlord_email": landlord.email if landlord else None,
-            "landlord_phone": landlord.phone if landlord else None
-        })
     
-    return {
+    # Lấy dư 1 phòng để biết còn trang sau hay không
+    result = await session.execute(
+        select(Room)
+        .options(LANDLORD_CONTACT)
+        .where(*conditions)
+        .order_by(Room.created_at.desc(), Room.id.desc())
+        .limit(limit + 1)
+    )
+    rooms = list(result.scalars().all())
+    
+    next_cursor = None
+    if len(rooms) > limit:
+        rooms = rooms[:limit]
+        next_cursor = encode_cursor(rooms[-1].created_at, rooms[-1].id)
+    
+    return rooms, next_cursor
+
+
+async def build_search_page_response(
+    session: AsyncSession,
+    search_data: dict,
+    page: int,
+    limit: int
+) -> dict:
+    """Response của /search và /search/page - đọc từ cache nếu có"""
+    cache_key, cache_location = SEARCH_CACHE.make_key("search", search_data, page=page, limit=limit)
+    cached = await SEARCH_CACHE.get(cache_key)
+    if cached is not None:
+        return cached
+    
+    paginated_rooms, total = await fetch_room_page(session, search_data, page, limit)
+    
+    # Format response
+    rooms_data = format_room_items(paginated_rooms)
+    
+    response = {
         "success": True,
         "total": total,
         "page": page,
@@ -134,10 +156,41 @@ async def search_rooms(
         "total_pages": (total + limit - 1) // limit if total > 0 else 0,
         "rooms": rooms_data
     }
+    await SEARCH_CACHE.set(cache_key, cache_location, response)
+    return response
+
+
+# ===== API 1: LỌC PHÒNG THEO LOCATION + FILTERS (CHỈ TRẢ VỀ TRANG 1) =====
+@router.post("/search", response_model=RoomSearchResponse)
+async def search_rooms(
+    search_data: dict,
+    session: AsyncSession = Depends(get_async_session),
+    limit: int = Query(20, ge=1, le=100)
+):
+    """
+    API LỌC PHÒNG - CHỈ TRẢ VỀ TRANG 1
+    
+    Body mẫu:
+    {
+        "location": {
+            "province": "Hà Nội",
+            "district": "Cầu Giấy", 
+            "ward": "Dịch Vọng"
+        },
+        "filters": {
+            "price": {"min": 2000000, "max": 5000000},
+            "area": {"min": 20, "max": 30}
+        }
+    }
+    Filters cũng nhận slug từ /api/filters: {"price": "3m-5m", "area": "20-30"}
+    """
+    
+    # CHỈ LẤY TRANG 1
+    return orjson_response(await build_search_page_response(session, search_data, 1, limit))
 
 
 # ===== API MỚI: LẤY DATA THEO PAGE CỤ THỂ =====
-@router.post("/search/page/{page_num}")
+@router.post("/search/page/{page_num}", response_model=RoomSearchResponse)
 async def search_rooms_by_page(
     page_num: int,  # ĐÂY LÀ PATH PARAMETER, KHÔNG PHẢI QUERY
     search_data: dict,
@@ -151,125 +204,113 @@ async def search_rooms_by_page(
     
     Body: giống hệt API search bình thường
     """
+    if page_num < 1:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Số trang phải >= 1"
+        )
     
-    # Base query - chỉ lấy phòng available
-    query = select(Room).where(Room.room_status == "available")
-    
-    # ===== LOCATION FILTERS =====
-    location = search_data.get("location", {})
-    if location:
-        if location.get("province"):
-            query = query.where(Room.province.ilike(f"%{location['province']}%"))
-        
-        if location.get("district"):
-            query = query.where(Room.district.ilike(f"%{location['district']}%"))
-        
-        if location.get("ward"):
-            query = query.where(Room.ward.ilike(f"%{location['ward']}%"))
-    
-    # ===== FILTERS =====
-    filters = search_data.get("filters", {})
-    
-    # Price filter
-    if filters.get("price"):
-        price_filter = filters["price"]
-        
-        if price_filter.get("min") is not None:
-            try:
-                min_price = float(price_filter["min"])
-                query = query.where(Room.price >= min_price)
-            except (ValueError, TypeError):
-                pass
-        
-        if price_filter.get("max") is not None:
-            try:
-                max_price = float(price_filter["max"])
-                query = query.where(Room.price <= max_price)
-            except (ValueError, TypeError):
-                pass
-    
-    # Area filter
-    if filters.get("area"):
-        area_filter = filters["area"]
-        
-        if area_filter.get("min") is not None:
-            try:
-                min_area = float(area_filter["min"])
-                query = query.where(Room.area >= min_area)
-            except (ValueError, TypeError):
-                pass
-        
-        if area_filter.get("max") is not None:
-            try:
-                max_area = float(area_filter["max"])
-                query = query.where(Room.area <= max_area)
-            except (ValueError, TypeError):
-                pass
+    # LẤY DATA THEO PAGE CỤ THỂ
+    return orjson_response(await build_search_page_response(session, search_data, page_num, limit))
+
+
+# ===== API MỚI: CUỘN VÔ HẠN BẰNG CURSOR (KEYSET PAGINATION) =====
+@router.post("/search/cursor", response_model=RoomCursorResponse)
+async def search_rooms_by_cursor(
+    search_data: dict,
+    session: AsyncSession = Depends(get_async_session),
+    cursor: Optional[str] = Query(None),
+    limit: int = Query(20, ge=1, le=100)
+):
+    """
+    API LẤY DATA THEO CURSOR - DÙNG CHO INFINITE SCROLL
     
-    # Order by created_at desc
-    query = query.order_by(Room.created_at.desc())
+    POST /api/find-rooms/search/cursor              -> trang đầu
+    POST /api/find-rooms/search/cursor?cursor=xxx   -> trang tiếp theo
     
-    # Execute query - LẤY TỔNG SỐ
-    result = await session.execute(query)
-    all_rooms = result.scalars().all()
-    total = len(all_rooms)
+    Body: giống hệt API search bình thường
+    Response trả về "next_cursor" (null nếu đã hết dữ liệu)
+    """
     
-    # LẤY DATA THEO PAGE CỤ THỂ
-    offset = (page_num - 1) * limit
-    paginated_rooms = all_rooms[offset:offset + limit]
+    rooms, next_cursor = await fetch_room_page_by_cursor(session, search_data, cursor, limit)
     
     # Format response
-    rooms_data = []
-    for room in paginated_rooms:
-        # Get landlord info
-        landlord_result = await session.execute(
-            select(User).where(User.id == room.landlord_id)
-        )
-        landlord = landlord_result.scalar_one_or_none()
-        
-        rooms_data.append({
-            "id": str(room.id),
-            "title": room.title,
-            "province": room.province,
-            "district": room.district,
-            "ward": room.ward,
-            "area": room.area,
-            "price": room.price,
-            "images": room.images or [],
-            "created_at": room.created_at.isoformat(),
-            "landlord_email": landlord.email if landlord else None,
-            "landlord_phone": landlord.phone if landlord else None
-        })
+    rooms_data = format_room_items(rooms)
     
-    return {
+    return orjson_response({
         "success": True,
-        "total": total,
-        "page": page_num,
         "limit": limit,
-        "total_pages": (total + limit - 1) // limit if total > 0 else 0,
+        "next_cursor": next_cursor,
+        "has_more": next_cursor is not None,
         "rooms": rooms_data
-    }
+    })
 
 
 # ===== API 2: TÌM KIẾM THEO KEYWORD (KHÔNG CẦN LOGIN) =====
-@router.get("/search-keyword")
+@router.get("/search-keyword", response_model=RoomSearchResponse)
 async def search_by_keyword(
     keyword: str = Query(..., min_length=1),
     session: AsyncSession = Depends(get_async_session),
     page: int = Query(1, ge=1),
-    limit: int = Query(20, ge=1, le=100)
+    limit: int = Query(20, ge=1, le=100),
+    hydrate: bool = Query(False)
 ):
     """
     API TÌM KIẾM THEO KEYWORD SỬ DỤNG ELASTICSEARCH ĐỂ XẾP HẠNG
     
     Query params: ?keyword=sinh viên&page=1&limit=20
+    
+    Mặc định response được dựng thẳng từ _source của ES (1 round trip).
+    hydrate=true: lấy ID từ ES rồi đọc dữ liệu mới nhất từ Postgres.
     """
+    cache_key, cache_location = SEARCH_CACHE.make_key(
+        "keyword", keyword=" ".join(keyword.lower().split()), page=page, limit=limit, hydrate=hydrate
+    )
+    cached = await SEARCH_CACHE.get(cache_key)
+    if cached is not None:
+        return orjson_response(cached)
+    
+    response = await keyword_search_response(session, keyword, page, limit, hydrate)
+    await SEARCH_CACHE.set(cache_key, cache_location, response)
+    return orjson_response(response)
+
+
+async def keyword_search_response(
+    session: AsyncSession,
+    keyword: str,
+    page: int,
+    limit: int,
+    hydrate: bool
+) -> dict:
+    if not hydrate:
+        try:
+            docs, total = await search_room_docs_async(
+                query_string=keyword,
+                page=page,
+                page_size=limit
+            )
+        except Exception as e:
+            print(f"🚨 ELASTICSEARCH ERROR DETAIL: {str(e)}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Lỗi dịch vụ tìm kiếm. Vui lòng thử lại sau."
+            )
+        
+        return {
+            "success": True,
+            "keyword": keyword,
+            "total": total,
+            "page": page,
+            "limit": limit,
+            "total_pages": (total + limit - 1) // limit if total > 0 else 0,
+            "rooms": format_room_docs(docs)
+        }
     
     # 1. TÌM KIẾM BẰNG ELASTICSEARCH ĐỂ CÓ ID ĐÃ XẾP HẠNG VÀ TỔNG SỐ
     try:
-        # Gọi hàm search_rooms đã sửa đổi trong elasticsearch_service.py
+        # Gọi bản async của search_rooms (AsyncElasticsearch) => không block event loop
         # Hàm này trả về List[str] ID và int Total Hits
-        ranked_room_ids, total = es_search(
+        ranked_room_ids, total = await es_search(
             query_string=keyword, 
             page=page, 
             page_size=limit
@@ -301,7 +342,7 @@ async def search_by_keyword(
     room_uuids: List[UUID] = [UUID(id_str) for id_str in ranked_room_ids]
     
     # Truy vấn PostgreSQL để lấy dữ liệu chi tiết của các phòng có ID trong danh sách ES đã xếp hạng.
-    query = select(Room).where(
+    query = select(Room).options(LANDLORD_CONTACT).where(
         and_(
             Room.room_status == "available",
             Room.id.in_(room_uuids)
@@ -325,28 +366,8 @@ async def search_by_keyword(
     # Sử dụng 'total' (tổng số hits) chính xác từ Elasticsearch
     total_pages = (total + limit - 1) // limit if total > 0 else 0
     
-    # 5. FORMAT RESPONSE (Giữ nguyên logic fetch landlord detail)
-    rooms_data = []
-    for room in paginated_rooms:
-        # Lấy thông tin chủ nhà (N+1 query)
-        landlord_result = await session.execute(
-            select(User).where(User.id == room.landlord_id)
-        )
-        landlord = landlord_result.scalar_one_or_none()
-        
-        rooms_data.append({
-            "id": str(room.id),
-            "title": room.title,
-            "province": room.province,
-            "district": room.district,
-            "ward": room.ward,
-            "area": room.area,
-            "price": room.price,
-            "images": room.images or [],
-            "created_at": room.created_at.isoformat(),
-            "landlord_email": landlord.email if landlord else None,
-            "landlord_phone": landlord.phone if landlord else None
-        })
+    # 5. FORMAT RESPONSE (landlord đã được load sẵn cùng query ở bước 2)
+    rooms_data = format_room_items(paginated_rooms)
     
     return {
         "success": True,
@@ -358,62 +379,131 @@ async def search_by_keyword(
         "rooms": rooms_data
     }
 
+# ===== API MỚI: KEYWORD + LOCATION + FILTERS TRONG 1 QUERY ELASTICSEARCH =====
+@router.post("/search-combined", response_model=RoomSearchResponse)
+async def search_combined(
+    search_data: dict,
+    page: int = Query(1, ge=1),
+    limit: int = Query(20, ge=1, le=100)
+):
+    """
+    API TÌM KIẾM KẾT HỢP KEYWORD + BỘ LỌC (1 LẦN GỌI ELASTICSEARCH)
+    
+    Body mẫu:
+    {
+        "keyword": "sinh viên",
+        "location": {"province": "Hà Nội", "district": "Cầu Giấy"},
+        "filters": {
+            "price": {"min": 2000000, "max": 5000000},
+            "area": {"min": 20, "max": 30}
+        }
+    }
+    Bỏ "keyword" => chỉ lọc, phòng mới nhất trước.
+    """
+    keyword = (search_data.get("keyword") or "").strip()
+    
+    cache_key, cache_location = SEARCH_CACHE.make_key(
+        "combined", search_data, keyword=" ".join(keyword.lower().split()), page=page, limit=limit
+    )
+    cached = await SEARCH_CACHE.get(cache_key)
+    if cached is not None:
+        return orjson_response(cached)
+    
+    try:
+        docs, total, _ = await search_rooms_combined_async(
+            query_string=keyword or None,
+            search_data=search_data,
+            page=page,
+            page_size=limit
+        )
+    except Exception as e:
+        print(f"🚨 ELASTICSEARCH ERROR DETAIL: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Lỗi dịch vụ tìm kiếm. Vui lòng thử lại sau."
+        )
+    
+    response = {
+        "success": True,
+        "keyword": keyword,
+        "total": total,
+        "page": page,
+        "limit": limit,
+        "total_pages": (total + limit - 1) // limit if total > 0 else 0,
+        "rooms": format_room_docs(docs)
+    }
+    await SEARCH_CACHE.set(cache_key, cache_location, response)
+    return orjson_response(response)
+
+
+async def load_room_detail(room_id: UUID) -> Optional[dict]:
+    """Đọc chi tiết phòng + chủ trọ (1 query JOIN) bằng session riêng - dùng cho ROOM_DETAIL_CACHE"""
+    async with async_session_maker() as session:
+        result = await session.execute(
+            select(Room).options(joinedload(Room.landlord)).where(Room.id == room_id)
+        )
+        room = result.scalar_one_or_none()
+        
+        if not room:
+            return None
+        
+        landlord = room.landlord
+        
+        return {
+            "success": True,
+            "room": {
+                "id": str(room.id),
+                "title": room.title,
+                "description": room.description,
+                "address": {
+                    "province": room.province,
+                    "district": room.district,
+                    "ward": room.ward,
+                    "address_detail": room.address_detail,
+                    "full_address": f"{room.address_detail}, {room.ward}, {room.district}, {room.province}"
+                },
+                "area": room.area,
+                "price": room.price,
+                "room_status": room.room_status,
+                "images": room.images or [],
+                "created_at": room.created_at.isoformat(),
+                "landlord": {
+                    "id": str(landlord.id) if landlord else None,
+                    "email": landlord.email if landlord else None,
+                    "phone": landlord.phone if landlord else None,
+                    "role": landlord.role if landlord else None
+                }
+            }
+        }
+
+
 # ===== API 3: CHI TIẾT PHÒNG ĐẦY ĐỦ (KHÔNG CẦN LOGIN) =====
 @router.get("/{room_id}")
 async def get_room_detail(
     room_id: UUID,
-    session: AsyncSession = Depends(get_async_session)
+    if_none_match: Optional[str] = Header(None)
 ):
     """
     API LẤY CHI TIẾT PHÒNG - KHÔNG CẦN ĐĂNG NHẬP
     
     GET /api/find-rooms/{room_id}
+    
+    Response có ETag; gửi lại If-None-Match => 304 nếu phòng chưa đổi.
     """
     
-    # Get room
-    result = await session.execute(
-        select(Room).where(Room.id == room_id)
-    )
-    room = result.scalar_one_or_none()
+    cached = await ROOM_DETAIL_CACHE.get_or_load(room_id, load_room_detail)
     
-    if not room:
+    if cached is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Không tìm thấy phòng"
         )
     
-    # Get landlord full info
-    landlord_result = await session.execute(
-        select(User).where(User.id == room.landlord_id)
-    )
-    landlord = landlord_result.scalar_one_or_none()
+    body, etag = cached
+    # private: body có email/số điện thoại chủ trọ => proxy/CDN dùng chung không được lưu
+    headers = {"ETag": etag, "Cache-Control": "private, max-age=0, must-revalidate"}
     
-    # Return FULL room details
-    return {
-        "success": True,
-        "room": {
-            "id": str(room.id),
-            "title": room.title,
-            "description": room.description,
-            "address": {
-                "province": room.province,
-                "district": room.district,
-                "ward": room.ward,
-                "address_detail": room.address_detail,
-                "full_address": f"{room.address_detail}, {room.ward}, {room.district}, {room.province}"
-            },
-            "area": room.area,
-            "price": room.price,
-            "room_status": room.room_status,
-            "images": room.images or [],
-            "created_at": room.created_at.isoformat(),
-            "landlord": {
-                "id": str(landlord.id) if landlord else None,
-                "email": landlord.email if landlord else None,
-                "phone": landlord.phone if landlord else None,
-                "role": landlord.role if landlord else None
-            }
-        }
-    }
-
-
+    if if_none_match and etag in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
+    return Response(content=body, media_type="application/json", headers=headers)
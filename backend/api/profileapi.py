@@ -0,0 +1,184 @@
+# api/profile_api.py
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlmodel import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.database import get_async_session
+from core.auth import current_active_user
+from models.models import User, UserProfile
+
+router = APIRouter()
+
+PROFILE_STATUSES = ("needs_room", "has_room")
+PROFILE_GENDERS = ("male", "female")
+MAX_MATCHES_LIMIT = 20
+TEXT_FIELDS = ("full_name", "school")
+
+
+# ===== HELPER FUNCTIONS =====
+
+def profile_to_dict(profile: UserProfile) -> dict:
+    return {
+        "id": str(profile.id),
+        "user_id": str(profile.user_id),
+        "full_name": profile.full_name,
+        "age": profile.age,
+        "gender": profile.gender,
+        "school": profile.school,
+        "habits": profile.habits or {},
+        "contact_info": profile.contact_info or {},
+        "status": profile.status,
+        "is_active": profile.is_active,
+        "max_matches": profile.max_matches,
+        "created_at": profile.created_at.isoformat()
+    }
+
+
+def validate_profile_data(profile_data: dict, partial: bool) -> dict:
+    """Kiểm tra body, trả về các cột cần ghi. partial=False: đủ trường bắt buộc (tạo mới)"""
+    if not partial:
+        for field in ("full_name", "age", "gender", "school"):
+            if field not in profile_data:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Thiếu trường bắt buộc: {field}"
+                )
+
+    values = {}
+    for field in TEXT_FIELDS:
+        if field in profile_data:
+            if not isinstance(profile_data[field], str) or not profile_data[field].strip():
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"{field} không hợp lệ"
+                )
+            values[field] = profile_data[field].strip()
+
+    if "age" in profile_data:
+        age = profile_data["age"]
+        if not isinstance(age, int) or isinstance(age, bool) or not 16 <= age <= 100:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Tuổi phải là số nguyên từ 16 đến 100"
+            )
+        values["age"] = age
+
+    if "gender" in profile_data:
+        if profile_data["gender"] not in PROFILE_GENDERS:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"gender phải là một trong: {', '.join(PROFILE_GENDERS)}"
+            )
+        values["gender"] = profile_data["gender"]
+
+    if "status" in profile_data:
+        if profile_data["status"] not in PROFILE_STATUSES:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"status phải là một trong: {', '.join(PROFILE_STATUSES)}"
+            )
+        values["status"] = profile_data["status"]
+
+    for field in ("habits", "contact_info"):
+        if field in profile_data:
+            if not isinstance(profile_data[field], dict):
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"{field} phải là object"
+                )
+            values[field] = profile_data[field]
+
+    if "max_matches" in profile_data:
+        max_matches = profile_data["max_matches"]
+        if not isinstance(max_matches, int) or isinstance(max_matches, bool) or not 1 <= max_matches <= MAX_MATCHES_LIMIT:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"max_matches phải từ 1 đến {MAX_MATCHES_LIMIT}"
+            )
+        values["max_matches"] = max_matches
+
+    if "is_active" in profile_data:
+        if not isinstance(profile_data["is_active"], bool):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="is_active phải là true/false"
+            )
+        values["is_active"] = profile_data["is_active"]
+
+    return values
+
+
+async def get_profile_of(session: AsyncSession, user_id) -> UserProfile:
+    result = await session.execute(select(UserProfile).where(UserProfile.user_id == user_id))
+    return result.scalars().first()
+
+
+# ===== ENDPOINTS =====
+# Mọi thao tác ghi profile đi qua ORM => listener trong services/match_worker.py ghi hàng đợi
+# re-match cùng transaction, worker nền cập nhật gợi ý ghép sau vài giây
+
+# GET - Hồ sơ ghép phòng của tôi
+@router.get("/me")
+async def get_my_profile(
+    user: User = Depends(current_active_user),
+    session: AsyncSession = Depends(get_async_session)
+):
+    profile = await get_profile_of(session, user.id)
+    if not profile:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Bạn chưa có hồ sơ ghép phòng"
+        )
+    return {"profile": profile_to_dict(profile)}
+
+
+# PUT - Tạo / cập nhật hồ sơ ghép phòng
+@router.put("/me")
+async def upsert_my_profile(
+    profile_data: dict,
+    user: User = Depends(current_active_user),
+    session: AsyncSession = Depends(get_async_session)
+):
+    """
+    Tạo hồ sơ (cần full_name, age, gender, school) hoặc cập nhật các trường gửi lên.
+
+    Body: {"full_name": "...", "age": 20, "gender": "female", "school": "...",
+           "habits": {"sleep_time": "early", ...}, "status": "needs_room", "max_matches": 5}
+    """
+    profile = await get_profile_of(session, user.id)
+    values = validate_profile_data(profile_data, partial=profile is not None)
+
+    if profile is None:
+        profile = UserProfile(
+            user_id=user.id,
+            habits=values.pop("habits", {}),
+            contact_info=values.pop("contact_info", {}),
+            **values
+        )
+        session.add(profile)
+        message = "Tạo hồ sơ thành công"
+    else:
+        for field, value in values.items():
+            setattr(profile, field, value)
+        message = "Cập nhật hồ sơ thành công"
+
+    await session.commit()
+    await session.refresh(profile)
+    return {"message": message, "profile": profile_to_dict(profile)}
+
+
+# DELETE - Xóa hồ sơ ghép phòng
+@router.delete("/me")
+async def delete_my_profile(
+    user: User = Depends(current_active_user),
+    session: AsyncSession = Depends(get_async_session)
+):
+    profile = await get_profile_of(session, user.id)
+    if not profile:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Bạn chưa có hồ sơ ghép phòng"
+        )
+    await session.delete(profile)
+    await session.commit()
+    return {"message": "Xóa hồ sơ thành công"}
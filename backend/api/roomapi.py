@@ -1,41 +1,122 @@
 # api/room_api.py
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlmodel import select
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Query
+from sqlmodel import select, func
+from sqlalchemy import update, insert, any_, bindparam
+from sqlalchemy.dialects.postgresql import ARRAY, UUID as PG_UUID
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from uuid import UUID
 
 from core.database import get_async_session
 from core.auth import current_active_user
-from models.models import User, Room
+from models.models import MAX_ROOM_PRICE, ROOM_STATUSES, User, Room, RoomIndexOutbox
+from models.schemas import LandlordRoom, LandlordRoomSummaryPage, orjson_response
+from services.es_sync_worker import room_outbox_entry, process_outbox_batch
+from services.cache_invalidation import publish_invalidation
+from services.room_import import IMPORT_CHUNK_SIZE, iter_records, import_chunk
+from types import SimpleNamespace
+import math
 
 router = APIRouter()
 
+# Các kiểu sắp xếp danh sách phòng của chủ trọ (id để thứ tự ổn định khi phân trang)
+# newest dùng index ix_rooms_landlord_created_at_id
+MY_ROOMS_SORTS = {
+    "newest": (Room.created_at.desc(), Room.id.desc()),
+    "oldest": (Room.created_at.asc(), Room.id.asc()),
+    "price_asc": (Room.price.asc(), Room.id.asc()),
+    "price_desc": (Room.price.desc(), Room.id.desc()),
+}
+MY_ROOMS_SORT_PATTERN = "^(" + "|".join(MY_ROOMS_SORTS) + ")$"
+
+
+def validate_room_status(value) -> str:
+    """room_status phải thuộc ROOM_STATUSES (cùng luật với import) => 400"""
+    if not isinstance(value, str) or value not in ROOM_STATUSES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"room_status phải là một trong: {', '.join(ROOM_STATUSES)}"
+        )
+    return value
+
+
+def parse_room_number(value, label: str) -> float:
+    """Số hữu hạn (NaN / inf ghi vào DB rồi bị ES từ chối mãi => outbox retry vô hạn)"""
+    try:
+        if isinstance(value, bool):
+            raise TypeError(label)
+        number = float(value)
+        if not math.isfinite(number):
+            raise ValueError(label)
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"{label} phải là số"
+        )
+    return number
+
+
+def parse_room_area(value) -> float:
+    area = parse_room_number(value, "Diện tích")
+    if area <= 0 or area > 1000:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Diện tích phải > 0 và <= 1000"
+        )
+    return area
+
+
+def parse_room_price(value) -> float:
+    price = parse_room_number(value, "Giá")
+    if price <= 0:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Giá phải > 0"
+        )
+    if price >= MAX_ROOM_PRICE:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Giá quá lớn"
+        )
+    return price
+
 # ===== ENDPOINTS =====
 
 # GET - Lấy tất cả phòng của chủ trọ
-@router.get("/my-rooms", response_model=List[dict])
+@router.get("/my-rooms", response_model=List[LandlordRoom])
 async def get_my_rooms(
     user: User = Depends(current_active_user),
-    session: AsyncSession = Depends(get_async_session)
+    session: AsyncSession = Depends(get_async_session),
+    page: int = Query(1, ge=1),
+    limit: Optional[int] = Query(None, ge=1, le=500),
+    sort: str = Query("newest", pattern=MY_ROOMS_SORT_PATTERN)
 ):
-    """Lấy danh sách phòng của landlord"""
+    """
+    Lấy danh sách phòng của landlord (đầy đủ thông tin)
+    
+    Không truyền limit => trả về tất cả (giữ tương thích). Dashboard nên dùng /my-rooms/summary.
+    """
     if user.role != "landlord":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Chỉ chủ trọ mới có quyền truy cập"
         )
     
-    result = await session.execute(
+    query = (
         select(Room)
         .where(Room.landlord_id == user.id)
-        .order_by(Room.created_at.desc())  # 👈 THÊM DÒNG NÀY
+        .order_by(*MY_ROOMS_SORTS[sort])
     )
+    if limit is not None:
+        query = query.offset((page - 1) * limit).limit(limit)
+    
+    result = await session.execute(query)
     rooms = result.scalars().all()
     
-    return [
+    # Trả thẳng ORJSONResponse: không validate lại + orjson tự encode UUID/datetime
+    return orjson_response([
         {
-            "id": str(room.id),
+            "id": room.id,
             "title": room.title,
             "description": room.description,
             "province": room.province,
@@ -46,13 +127,77 @@ async def get_my_rooms(
             "price": room.price,
             "room_status": room.room_status,
             "images": room.images or [],
-            "created_at": room.created_at.isoformat()
+            "created_at": room.created_at
         }
         for room in rooms
-    ]
+    ])
+
+# GET - Danh sách phòng rút gọn có phân trang (cho dashboard)
+@router.get("/my-rooms/summary", response_model=LandlordRoomSummaryPage)
+async def get_my_rooms_summary(
+    user: User = Depends(current_active_user),
+    session: AsyncSession = Depends(get_async_session),
+    page: int = Query(1, ge=1),
+    limit: int = Query(20, ge=1, le=100),
+    sort: str = Query("newest", pattern=MY_ROOMS_SORT_PATTERN)
+):
+    """
+    Danh sách phòng của landlord - chỉ id, tiêu đề, giá, trạng thái, ảnh đầu tiên
+    
+    GET /api/rooms/my-rooms/summary?page=1&limit=20&sort=newest
+    sort: newest | oldest | price_asc | price_desc
+    """
+    if user.role != "landlord":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Chỉ chủ trọ mới có quyền truy cập"
+        )
+    
+    count_result = await session.execute(
+        select(func.count()).select_from(Room).where(Room.landlord_id == user.id)
+    )
+    total = count_result.scalar_one()
+    
+    rows = []
+    if total > 0:
+        # Chỉ SELECT các cột cần, ảnh đầu tiên lấy trong SQL (images->>0)
+        result = await session.execute(
+            select(
+                Room.id,
+                Room.title,
+                Room.price,
+                Room.room_status,
+                Room.images[0].astext.label("thumbnail"),
+                Room.created_at
+            )
+            .where(Room.landlord_id == user.id)
+            .order_by(*MY_ROOMS_SORTS[sort])
+            .offset((page - 1) * limit)
+            .limit(limit)
+        )
+        rows = result.all()
+    
+    return orjson_response({
+        "success": True,
+        "total": total,
+        "page": page,
+        "limit": limit,
+        "total_pages": (total + limit - 1) // limit if total > 0 else 0,
+        "rooms": [
+            {
+                "id": row.id,
+                "title": row.title,
+                "price": row.price,
+                "room_status": row.room_status,
+                "thumbnail": row.thumbnail,
+                "created_at": row.created_at
+            }
+            for row in rows
+        ]
+    })
 
 # GET - Chi tiết 1 phòng
-@router.get("/{room_id}", response_model=dict)
+@router.get("/{room_id}", response_model=LandlordRoom)
 async def get_room(
     room_id: UUID,
     user: User = Depends(current_active_user),
@@ -76,8 +221,8 @@ async def get_room(
             detail="Không có quyền truy cập phòng này"
         )
     
-    return {
-        "id": str(room.id),
+    return orjson_response({
+        "id": room.id,
         "title": room.title,
         "description": room.description,
         "province": room.province,
@@ -88,8 +233,8 @@ async def get_room(
         "price": room.price,
         "room_status": room.room_status,
         "images": room.images or [],
-        "created_at": room.created_at.isoformat()
-    }
+        "created_at": room.created_at
+    })
 
 # POST - Tạo phòng mới
 @router.post("/", status_code=status.HTTP_201_CREATED)
@@ -115,26 +260,10 @@ async def create_room(
             )
     
     # Validate kiểu dữ liệu
-    try:
-        area = float(room_data["area"])
-        price = float(room_data["price"])
-        
-        if area <= 0 or area > 1000:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Diện tích phải > 0 và <= 1000"
-            )
-        
-        if price <= 0:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Giá phải > 0"
-            )
-    except (ValueError, TypeError):
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Diện tích và giá phải là số"
-        )
+    area = parse_room_area(room_data["area"])
+    price = parse_room_price(room_data["price"])
+    
+    room_status = validate_room_status(room_data.get("room_status", "available"))
     
     # Tạo phòng
     new_room = Room(
@@ -147,11 +276,15 @@ async def create_room(
         address_detail=room_data["address_detail"],
         area=area,
         price=price,
-        room_status=room_data.get("room_status", "available"),
+        room_status=room_status,
         images=room_data.get("images", [])
     )
     
     session.add(new_room)
+    # Ghi outbox cùng transaction => worker nền sẽ index phòng sang ES
+    session.add(room_outbox_entry(new_room.id, "index"))
+    # Kết quả ES được xóa khỏi cache khi worker đã index phòng
+    await publish_invalidation(session, ["sql"], [new_room])
     await session.commit()
     await session.refresh(new_room)
     
@@ -168,6 +301,164 @@ async def create_room(
         }
     }
 
+# POST - Import phòng hàng loạt
+@router.post("/bulk")
+async def bulk_import_rooms(
+    request: Request,
+    format: Optional[str] = Query(None, pattern="^(jsonl|csv)$"),
+    user: User = Depends(current_active_user),
+    session: AsyncSession = Depends(get_async_session)
+):
+    """
+    Import nhiều phòng trong 1 request (dành cho công ty môi giới / chủ trọ lớn)
+    
+    Body (stream):
+    - JSON lines (Content-Type: application/x-ndjson): mỗi dòng 1 object giống body POST /api/rooms/
+    - CSV (Content-Type: text/csv hoặc ?format=csv): dòng đầu là header, images ngăn cách bằng "|"
+    
+    Dòng lỗi không chặn các dòng khác; response trả về báo cáo lỗi theo số dòng.
+    """
+    if user.role != "landlord":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Chỉ chủ trọ mới được đăng phòng"
+        )
+    
+    if format is None:
+        format = "csv" if "csv" in request.headers.get("content-type", "") else "jsonl"
+    
+    inserted: List[dict] = []
+    errors: List[dict] = []
+    chunk = []
+    
+    async def flush(chunk):
+        chunk_inserted, chunk_errors = await import_chunk(session, chunk, user)
+        errors.extend(chunk_errors)
+        inserted.extend({"line": line_no, "id": str(room_id)} for line_no, room_id in chunk_inserted)
+    
+    async for record in iter_records(request.stream(), format):
+        chunk.append(record)
+        if len(chunk) >= IMPORT_CHUNK_SIZE:
+            await flush(chunk)
+            chunk = []
+    if chunk:
+        await flush(chunk)
+    
+    return {
+        "message": f"Đã import {len(inserted)} phòng, {len(errors)} dòng lỗi",
+        "inserted": len(inserted),
+        "failed": len(errors),
+        "rooms": inserted,
+        "errors": errors
+    }
+
+# PATCH - Cập nhật trạng thái / giá nhiều phòng cùng lúc
+BULK_UPDATE_MAX_ROOMS = 1000
+
+@router.patch("/bulk")
+async def bulk_update_rooms(
+    update_data: dict,
+    user: User = Depends(current_active_user),
+    session: AsyncSession = Depends(get_async_session)
+):
+    """
+    Cập nhật room_status và/hoặc price cho nhiều phòng bằng 1 câu UPDATE
+    
+    Body mẫu:
+    {
+        "room_ids": ["...", "..."],
+        "room_status": "rented",
+        "price": 3500000
+    }
+    Phòng không tồn tại / không thuộc chủ trọ hiện tại được trả về trong "skipped_ids".
+    """
+    if user.role != "landlord":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Chỉ chủ trọ mới được cập nhật phòng"
+        )
+    
+    # Validate danh sách id: phải là list các chuỗi UUID
+    raw_ids = update_data.get("room_ids")
+    if not isinstance(raw_ids, list) or not all(isinstance(room_id, str) for room_id in raw_ids):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="room_ids phải là danh sách id phòng"
+        )
+    try:
+        room_ids = list(dict.fromkeys(UUID(room_id) for room_id in raw_ids))
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="room_ids chứa id không hợp lệ"
+        )
+    if not room_ids:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Thiếu trường bắt buộc: room_ids"
+        )
+    if len(room_ids) > BULK_UPDATE_MAX_ROOMS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Tối đa {BULK_UPDATE_MAX_ROOMS} phòng mỗi lần"
+        )
+    
+    # Validate giá trị cập nhật
+    values = {}
+    if "room_status" in update_data:
+        values["room_status"] = validate_room_status(update_data["room_status"])
+    
+    if "price" in update_data:
+        values["price"] = parse_room_price(update_data["price"])
+    
+    if not values:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Cần ít nhất 1 trong các trường: room_status, price"
+        )
+    
+    # 1 câu UPDATE ... WHERE id = ANY(:ids) AND landlord_id = :uid RETURNING ...
+    result = await session.execute(
+        update(Room)
+        .where(
+            Room.id == any_(bindparam("ids", room_ids, type_=ARRAY(PG_UUID(as_uuid=True)))),
+            Room.landlord_id == user.id
+        )
+        .values(**values)
+        .returning(Room.id, Room.province, Room.district, Room.ward, Room.room_status, Room.price)
+        .execution_options(synchronize_session=False)
+    )
+    updated_rows = result.all()
+    
+    outbox_ids = []
+    if updated_rows:
+        outbox_ids = (await session.scalars(
+            insert(RoomIndexOutbox).returning(RoomIndexOutbox.id),
+            [{"room_id": row.id, "op": "index"} for row in updated_rows]
+        )).all()
+        await publish_invalidation(session, ["sql"], updated_rows, [row.id for row in updated_rows])
+    await session.commit()
+    
+    if updated_rows:
+        # Index ngay các dòng outbox vừa ghi (document đầy đủ + external version của outbox,
+        # giống worker) trong 1 bulk request; lỗi => dòng outbox giữ nguyên để worker retry
+        try:
+            await process_outbox_batch(session, entry_ids=list(outbox_ids))
+        except Exception as e:
+            print(f"🚨 Lỗi index ngay sau bulk update, để worker xử lý: {e}")
+            await session.rollback()
+    
+    updated_ids = {row.id for row in updated_rows}
+    return {
+        "message": f"Đã cập nhật {len(updated_rows)} phòng",
+        "updated": len(updated_rows),
+        "rooms": [
+            {"id": str(row.id), "status": row.room_status, "price": row.price}
+            for row in updated_rows
+        ],
+        "skipped_ids": [str(room_id) for room_id in room_ids if room_id not in updated_ids]
+    }
+
 # PUT - Cập nhật phòng
 @router.put("/{room_id}")
 async def update_room(
@@ -202,32 +493,16 @@ async def update_room(
     
     # Validate nếu update area/price
     if "area" in room_data:
-        try:
-            area = float(room_data["area"])
-            if area <= 0 or area > 1000:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="Diện tích phải > 0 và <= 1000"
-                )
-        except (ValueError, TypeError):
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Diện tích phải là số"
-            )
+        room_data["area"] = parse_room_area(room_data["area"])
     
     if "price" in room_data:
-        try:
-            price = float(room_data["price"])
-            if price <= 0:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="Giá phải > 0"
-                )
-        except (ValueError, TypeError):
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Giá phải là số"
-            )
+        room_data["price"] = parse_room_price(room_data["price"])
+    
+    if "room_status" in room_data:
+        validate_room_status(room_data["room_status"])
+    
+    # Giữ địa chỉ cũ để xóa cache của cả khu vực cũ nếu phòng đổi địa chỉ
+    previous_location = SimpleNamespace(province=room.province, district=room.district, ward=room.ward)
     
     # Update
     updatable_fields = ["title", "description", "province", "district", "ward", 
@@ -236,6 +511,8 @@ async def update_room(
         if field in room_data:
             setattr(room, field, room_data[field])
     
+    session.add(room_outbox_entry(room.id, "index"))
+    await publish_invalidation(session, ["sql"], [previous_location, room], [room.id])
     await session.commit()
     await session.refresh(room)
     
@@ -282,6 +559,8 @@ async def delete_room(
         )
     
     await session.delete(room)
+    session.add(room_outbox_entry(room.id, "delete"))
+    await publish_invalidation(session, ["sql"], [room], [room.id])
     await session.commit()
     
     return {"message": "Xóa phòng thành công"}
\ No newline at end of file
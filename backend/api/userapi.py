@@ -1,6 +1,9 @@
 # api/user_api.py
-from fastapi import APIRouter, Depends
-from sqlmodel import select
+import os
+import time
+
+from fastapi import APIRouter, Depends, Query
+from sqlmodel import select, func
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from core.database import get_async_session
@@ -9,16 +12,72 @@ from models.models import User
 
 router = APIRouter()
 
+# Snapshot thống kê user (dashboard admin poll liên tục => không cần đếm lại mỗi lần)
+USER_STATS_CACHE_TTL = float(os.getenv("USER_STATS_CACHE_TTL", "10"))  # giây, 0 = tắt cache
+_user_stats_snapshot = {"expires_at": 0.0, "data": None}
+
+
+async def count_users_by_group(session: AsyncSession) -> dict:
+    """1 query COUNT(*) ... GROUP BY role, is_active - không tải dòng user nào"""
+    result = await session.execute(
+        select(User.role, User.is_active, func.count())
+        .group_by(User.role, User.is_active)
+    )
+
+    total = 0
+    by_role = {}
+    by_active = {"active": 0, "inactive": 0}
+    for role, is_active, count in result.all():
+        total += count
+        by_role[role] = by_role.get(role, 0) + count
+        by_active["active" if is_active else "inactive"] += count
+
+    return {"total_users": total, "by_role": by_role, "by_active": by_active}
+
+
+async def get_user_stats(session: AsyncSession, fresh: bool = False) -> dict:
+    now = time.monotonic()
+    if not fresh and _user_stats_snapshot["data"] is not None and _user_stats_snapshot["expires_at"] > now:
+        return _user_stats_snapshot["data"]
+
+    data = await count_users_by_group(session)
+    data["generated_at"] = time.time()
+    _user_stats_snapshot.update(expires_at=now + USER_STATS_CACHE_TTL, data=data)
+    return data
+
 @router.get("/me")
 async def get_me(user: User = Depends(current_active_user)):
     return {"email": user.email, "role": user.role, "id": str(user.id)}
 
+@router.get("/stats")
+async def get_users_stats(
+    fresh: bool = Query(False, description="Bỏ qua snapshot, đếm lại ngay"),
+    session: AsyncSession = Depends(get_async_session)
+):
+    """Thống kê user: tổng, theo role, theo is_active (COUNT(*), có cache snapshot ngắn)"""
+    return await get_user_stats(session, fresh=fresh)
+
 @router.get("/count")
-async def get_users_count(session: AsyncSession = Depends(get_async_session)):
-    result = await session.execute(select(User))
-    users = result.scalars().all()
+async def get_users_count(
+    page: int = Query(1, ge=1),
+    limit: int = Query(50, ge=1, le=200),
+    session: AsyncSession = Depends(get_async_session)
+):
+    """Tổng số user (COUNT(*)) + danh sách user có phân trang"""
+    total = (await session.execute(select(func.count()).select_from(User))).scalar_one()
+
+    result = await session.execute(
+        select(User.id, User.email, User.role, User.is_active)
+        .order_by(User.email)
+        .offset((page - 1) * limit)
+        .limit(limit)
+    )
+    users = result.all()
     return {
-        "total_users": len(users),
+        "total_users": total,
+        "page": page,
+        "limit": limit,
+        "total_pages": (total + limit - 1) // limit if total > 0 else 0,
         "users": [
             {
                 "id": str(u.id),
@@ -42,8 +101,8 @@ async def debug_users(session: AsyncSession = Depends(get_async_session)):
         )
         table_exists = result.scalar()
         
-        result = await session.execute(select(User))
-        users_count = len(result.scalars().all())
+        result = await session.execute(select(func.count()).select_from(User))
+        users_count = result.scalar_one()
         
         return {
             "database_connected": db_ok,
@@ -0,0 +1,252 @@
+# api/wallet_api.py
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+from uuid import UUID
+from datetime import datetime
+
+from core.database import get_async_session
+from core.auth import current_active_user, current_superuser
+from core.cursor import encode_cursor, decode_cursor
+from models.models import User, Wallet
+from models.schemas import orjson_response
+from services.ledger_service import LedgerError, post_transactions
+from services.wallet_history import (
+    balance_at,
+    fetch_transaction_page,
+    get_wallet_of,
+    reconcile_wallet,
+    stream_transactions_csv,
+)
+
+router = APIRouter()
+
+MAX_POSTINGS_PER_REQUEST = 500
+
+
+# ===== HELPER FUNCTIONS =====
+
+def money(value) -> Optional[str]:
+    """Tiền trả về dạng chuỗi thập phân chính xác (JSON number là float)"""
+    return str(value) if value is not None else None
+
+
+async def get_my_wallet(
+    user: User = Depends(current_active_user),
+    session: AsyncSession = Depends(get_async_session)
+) -> Wallet:
+    wallet = await get_wallet_of(session, user.id)
+    if not wallet:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Bạn chưa có ví"
+        )
+    return wallet
+
+
+def validate_postings(wallet_id: UUID, body: dict) -> list:
+    """Body 1 giao dịch hoặc {"transactions": [...]} => danh sách posting cho ledger"""
+    items = body["transactions"] if "transactions" in body else [body]
+    if not isinstance(items, list) or not items:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="transactions phải là danh sách không rỗng"
+        )
+    if len(items) > MAX_POSTINGS_PER_REQUEST:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Tối đa {MAX_POSTINGS_PER_REQUEST} giao dịch mỗi lần"
+        )
+
+    postings = []
+    for i, item in enumerate(items):
+        if not isinstance(item, dict) or "amount" not in item:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Giao dịch {i}: thiếu amount"
+            )
+        if not isinstance(item.get("type"), str) or not item["type"].strip():
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Giao dịch {i}: type không hợp lệ"
+            )
+        description = item.get("description")
+        if description is not None and not isinstance(description, str):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Giao dịch {i}: description phải là chuỗi"
+            )
+        postings.append({
+            "wallet_id": wallet_id,
+            "amount": item["amount"],
+            "type": item["type"].strip(),
+            "description": description
+        })
+    return postings
+
+
+# ===== ENDPOINTS =====
+
+# GET - Số dư ví
+@router.get("/me")
+async def get_wallet(wallet: Wallet = Depends(get_my_wallet)):
+    return orjson_response({
+        "success": True,
+        "wallet_id": wallet.id,
+        "balance": money(wallet.balance),
+        "created_at": wallet.created_at
+    })
+
+
+# POST - Mở ví (số dư 0)
+@router.post("/me")
+async def create_wallet(
+    user: User = Depends(current_active_user),
+    session: AsyncSession = Depends(get_async_session)
+):
+    wallet = await get_wallet_of(session, user.id)
+    if wallet:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Bạn đã có ví"
+        )
+    wallet = Wallet(user_id=user.id)
+    session.add(wallet)
+    await session.commit()
+    await session.refresh(wallet)
+    return orjson_response({
+        "success": True,
+        "wallet_id": wallet.id,
+        "balance": money(wallet.balance),
+        "created_at": wallet.created_at
+    })
+
+
+# POST - Nạp / trừ tiền (admin)
+@router.post("/{wallet_id}/transactions")
+async def post_wallet_transactions(
+    wallet_id: UUID,
+    body: dict,
+    user: User = Depends(current_superuser),
+    session: AsyncSession = Depends(get_async_session)
+):
+    """
+    Ghi giao dịch qua ledger (services/ledger_service.py): số dư và lịch sử cập nhật
+    trong cùng 1 câu lệnh. amount dương = nạp, âm = trừ; truyền dạng chuỗi, ví dụ "150000.00".
+
+    Body: {"amount": "150000", "type": "top_up", "description": "..."}
+       hoặc {"transactions": [{...}, {...}]}
+    Cả nhóm giao dịch bị từ chối nếu số dư sau khi ghi < 0
+    """
+    postings = validate_postings(wallet_id, body)
+    try:
+        result = await post_transactions(session, postings)
+    except LedgerError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    if not result["posted"]:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Số dư không đủ hoặc ví không tồn tại"
+        )
+
+    return orjson_response({
+        "success": True,
+        "posted": [
+            {**row, "amount": money(row["amount"]), "balance_after": money(row["balance_after"])}
+            for row in result["posted"]
+        ],
+        "rejected": result["rejected"]
+    })
+
+
+# GET - Lịch sử giao dịch (keyset pagination)
+@router.get("/me/transactions")
+async def get_transactions(
+    cursor: Optional[str] = Query(None, description="next_cursor của trang trước"),
+    limit: int = Query(50, ge=1, le=200),
+    wallet: Wallet = Depends(get_my_wallet),
+    session: AsyncSession = Depends(get_async_session)
+):
+    """
+    Lịch sử giao dịch mới nhất trước.
+
+    GET /api/wallet/me/transactions?limit=50
+    GET /api/wallet/me/transactions?limit=50&cursor=<next_cursor>
+    """
+    after = decode_cursor(cursor) if cursor else None
+    rows, next_position = await fetch_transaction_page(session, wallet.id, after, limit)
+
+    return orjson_response({
+        "success": True,
+        "limit": limit,
+        "next_cursor": encode_cursor(*next_position) if next_position else None,
+        "has_more": next_position is not None,
+        "transactions": [
+            {
+                "id": row.id,
+                "created_at": row.created_at,
+                "type": row.type,
+                "amount": money(row.amount),
+                "balance_after": money(row.balance_after),
+                "description": row.description
+            }
+            for row in rows
+        ]
+    })
+
+
+# GET - Xuất CSV toàn bộ lịch sử (stream)
+@router.get("/me/transactions/export")
+async def export_transactions(wallet: Wallet = Depends(get_my_wallet)):
+    """Tải lịch sử giao dịch dạng CSV - đọc DB theo chunk và stream dần, không tải hết vào bộ nhớ"""
+    filename = f"transactions-{wallet.id}-{datetime.utcnow():%Y%m%d}.csv"
+    return StreamingResponse(
+        stream_transactions_csv(wallet.id),
+        media_type="text/csv; charset=utf-8",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
+# GET - Số dư tại 1 thời điểm
+@router.get("/me/balance-at")
+async def get_balance_at(
+    at: datetime = Query(..., description="Thời điểm (UTC), ví dụ 2026-01-31T23:59:59"),
+    wallet: Wallet = Depends(get_my_wallet),
+    session: AsyncSession = Depends(get_async_session)
+):
+    """Số dư tại thời điểm `at` = snapshot gần nhất + các giao dịch sau snapshot đó"""
+    if at.tzinfo is not None:
+        # DB lưu giờ UTC không kèm timezone
+        at = (at - at.utcoffset()).replace(tzinfo=None)
+    result = await balance_at(session, wallet.id, at)
+    return orjson_response({
+        "success": True,
+        "wallet_id": wallet.id,
+        **result,
+        "balance": money(result["balance"])
+    })
+
+
+# GET - Đối soát số dư
+@router.get("/me/reconcile")
+async def reconcile(
+    wallet: Wallet = Depends(get_my_wallet),
+    session: AsyncSession = Depends(get_async_session)
+):
+    """So sánh số dư lưu trong ví với snapshot + giao dịch sau snapshot"""
+    result = await reconcile_wallet(session, wallet.id)
+    if result is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Bạn chưa có ví"
+        )
+    return orjson_response({
+        "success": True,
+        **result,
+        "balance": money(result["balance"]),
+        "computed_balance": money(result["computed_balance"])
+    })
@@ -0,0 +1,109 @@
+# benchmarks/bench_ledger.py
+"""
+Tranh chấp ghi: hàng trăm giao dịch đồng thời vào CÙNG 1 ví (cần Postgres, dùng ASYNC_DATABASE_URL).
+- cách cũ: ORM đọc số dư -> cộng trong Python -> ghi lại (read-modify-write) => mất cập nhật
+- ledger: 1 câu UPDATE ... RETURNING + INSERT transactions (services/ledger_service.py)
+- ledger theo lô: nhiều giao dịch / round trip
+
+Tạo user + ví tạm, xóa sau khi chạy.
+Chạy: python -m benchmarks.bench_ledger
+"""
+import asyncio
+import time
+from decimal import Decimal
+from uuid import uuid4
+
+from sqlalchemy import delete
+
+from core.database import async_session_maker, create_db_and_tables
+from models.models import Transaction, User, Wallet
+from services.ledger_service import post_transaction, post_transactions
+
+POSTINGS = 500
+CONCURRENCY = 100
+BATCH_SIZE = 50
+AMOUNT = Decimal("1000.00")
+
+
+async def naive_post(wallet_id):
+    async with async_session_maker() as session:
+        wallet = await session.get(Wallet, wallet_id)
+        wallet.balance = wallet.balance + AMOUNT
+        session.add(Transaction(wallet_id=wallet_id, amount=AMOUNT, type="top_up", description="bench"))
+        await session.commit()
+
+
+async def ledger_post(wallet_id):
+    async with async_session_maker() as session:
+        await post_transaction(session, wallet_id, AMOUNT, "top_up", "bench")
+
+
+async def ledger_batch_post(wallet_id, size):
+    async with async_session_maker() as session:
+        await post_transactions(session, [
+            {"wallet_id": wallet_id, "amount": AMOUNT, "type": "top_up", "description": "bench"}
+            for _ in range(size)
+        ])
+
+
+async def run_concurrently(make_task, count):
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+
+    async def guarded():
+        async with semaphore:
+            await make_task()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(guarded() for _ in range(count)))
+    return time.perf_counter() - started
+
+
+async def reset_wallet(wallet_id):
+    async with async_session_maker() as session:
+        await session.execute(delete(Transaction).where(Transaction.wallet_id == wallet_id))
+        wallet = await session.get(Wallet, wallet_id)
+        wallet.balance = Decimal("0")
+        await session.commit()
+
+
+async def final_balance(wallet_id):
+    async with async_session_maker() as session:
+        wallet = await session.get(Wallet, wallet_id)
+        return wallet.balance
+
+
+async def main():
+    await asyncio.to_thread(create_db_and_tables)
+
+    user = User(email=f"bench-ledger-{uuid4()}@example.com", hashed_password="x")
+    wallet = Wallet(user_id=user.id)
+    async with async_session_maker() as session:
+        session.add(user)
+        await session.flush()
+        session.add(wallet)
+        await session.commit()
+
+    expected = AMOUNT * POSTINGS
+    try:
+        cases = [
+            ("ORM read-modify-write", lambda: naive_post(wallet.id), POSTINGS),
+            ("ledger, 1 giao dịch/lệnh", lambda: ledger_post(wallet.id), POSTINGS),
+            (f"ledger, lô {BATCH_SIZE}", lambda: ledger_batch_post(wallet.id, BATCH_SIZE), POSTINGS // BATCH_SIZE),
+        ]
+        print(f"{POSTINGS} giao dịch đồng thời (tối đa {CONCURRENCY} cùng lúc) vào 1 ví")
+        for name, make_task, count in cases:
+            await reset_wallet(wallet.id)
+            elapsed = await run_concurrently(make_task, count)
+            balance = await final_balance(wallet.id)
+            lost = (expected - balance) / AMOUNT
+            print(f"  {name:26}: {elapsed:6.2f} s, {POSTINGS / elapsed:8.0f} giao dịch/s, mất {lost:.0f} cập nhật")
+    finally:
+        async with async_session_maker() as session:
+            await session.execute(delete(Transaction).where(Transaction.wallet_id == wallet.id))
+            await session.execute(delete(Wallet).where(Wallet.id == wallet.id))
+            await session.execute(delete(User).where(User.id == user.id))
+            await session.commit()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
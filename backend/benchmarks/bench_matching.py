@@ -0,0 +1,126 @@
+# benchmarks/bench_matching.py
+"""
+Ghép bạn cùng phòng với 10k và 100k profile (dữ liệu giả, không cần DB):
+- vector hóa: encode habits + top-k theo block bằng NumPy (services/matching_service.py)
+- cách cũ: so từng cặp dict habits bằng Python, O(N²) không chia block
+  (đo trên 1 mẫu nhỏ rồi ngoại suy theo số cặp)
+
+Chạy: python -m benchmarks.bench_matching
+"""
+import random
+import time
+
+import numpy as np
+
+from services.matching_service import (
+    HABIT_FEATURES,
+    MAX_SQ_DISTANCE,
+    MatchBlock,
+    block_key,
+    encode_habits,
+    encode_profiles,
+    top_k_for_block,
+    _encode_value,
+)
+
+SIZES = [10_000, 100_000]
+SCHOOLS = 40
+MAX_MATCHES = 5
+NAIVE_SAMPLE = 1_000
+
+
+def make_profiles(n: int, seed: int = 42):
+    rng = random.Random(seed)
+    choices = {
+        "sleep_time": ["early", "normal", "late"],
+        "guests": ["rarely", "sometimes", "often"],
+    }
+    profiles = []
+    for i in range(n):
+        habits = {}
+        for key, encoding, _ in HABIT_FEATURES:
+            if rng.random() < 0.1:
+                continue  # thiếu thông tin
+            if key in choices:
+                habits[key] = rng.choice(choices[key])
+            elif encoding == "bool":
+                habits[key] = rng.random() < 0.5
+            else:
+                habits[key] = rng.randint(*encoding)
+        profiles.append({
+            "user_id": i,
+            "school": f"Đại học số {rng.randrange(SCHOOLS)}",
+            "gender": rng.choice(["male", "female"]),
+            "status": rng.choice(["needs_room", "has_room"]),
+            "habits": habits,
+        })
+    return profiles
+
+
+def naive_score(a: dict, b: dict) -> float:
+    """Cùng công thức với score_rows nhưng tính từng cặp dict"""
+    sq_distance = 0.0
+    for key, encoding, weight in HABIT_FEATURES:
+        diff = (_encode_value(a.get(key), encoding) - _encode_value(b.get(key), encoding)) * weight
+        sq_distance += diff * diff
+    return 1.0 - sq_distance / MAX_SQ_DISTANCE
+
+
+def naive_top_k(profiles):
+    result = []
+    for a in profiles:
+        scores = [(naive_score(a["habits"], b["habits"]), b["user_id"]) for b in profiles if b is not a]
+        scores.sort(reverse=True)
+        result.append(scores[:MAX_MATCHES])
+    return result
+
+
+def vectorized(profiles):
+    grouped = {}
+    for profile in profiles:
+        grouped.setdefault(block_key(profile["school"], profile["gender"], profile["status"]), []).append(profile)
+
+    pairs = 0
+    for key, rows in grouped.items():
+        block = MatchBlock(
+            key,
+            [row["user_id"] for row in rows],
+            encode_profiles([row["habits"] for row in rows]),
+            [MAX_MATCHES] * len(rows),
+        )
+        pairs += len(top_k_for_block(block, block.max_matches, {}))
+    return len(grouped), pairs
+
+
+def check_scores(profiles):
+    """Điểm vector hóa phải khớp điểm tính từng cặp"""
+    sample = profiles[:50]
+    matrix = np.stack([encode_habits(p["habits"]) for p in sample])
+    block = MatchBlock(("", "", ""), list(range(len(sample))), matrix, [MAX_MATCHES] * len(sample))
+    for i, j, score in top_k_for_block(block, block.max_matches, {}):
+        assert abs(score - naive_score(sample[i]["habits"], sample[j]["habits"])) < 1e-4
+
+
+def main():
+    check_scores(make_profiles(100))
+
+    sample = make_profiles(NAIVE_SAMPLE)
+    started = time.perf_counter()
+    naive_top_k(sample)
+    seconds_per_pair = (time.perf_counter() - started) / (NAIVE_SAMPLE * (NAIVE_SAMPLE - 1))
+
+    for n in SIZES:
+        profiles = make_profiles(n)
+        started = time.perf_counter()
+        blocks, pairs = vectorized(profiles)
+        elapsed = time.perf_counter() - started
+        naive_estimate = seconds_per_pair * n * (n - 1)
+
+        print(f"{n:,} profile ({blocks} block, {pairs:,} gợi ý)")
+        print(f"  NumPy + block          : {elapsed:10.2f} s")
+        print(f"  Python từng cặp (ước)  : {naive_estimate:10.0f} s")
+        print(f"  nhanh hơn              : {naive_estimate / elapsed:10.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+# benchmarks/bench_serialization.py
+"""
+So sánh serialize 1 trang 100 phòng:
+- cũ: dict dựng tay với str(id) / isoformat() + jsonable_encoder + json stdlib (đường mặc định của FastAPI)
+- mới: dict giữ nguyên UUID / datetime + orjson (ORJSONResponse)
+
+Chạy: python -m benchmarks.bench_serialization
+"""
+import json
+import timeit
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+
+PAGE_SIZE = 100
+ROUNDS = 2000
+
+
+def make_rooms(n: int = PAGE_SIZE):
+    now = datetime.utcnow()
+    return [
+        {
+            "id": uuid4(),
+            "title": f"Phòng trọ khép kín gần Đại học Quốc gia số {i}",
+            "province": "Thành phố Hà Nội",
+            "district": "Quận Cầu Giấy",
+            "ward": "Phường Dịch Vọng Hậu",
+            "area": 25.5,
+            "price": 3_500_000.0,
+            "images": [f"https://cdn.example.com/rooms/{i}/{j}.jpg" for j in range(5)],
+            "created_at": now - timedelta(minutes=i),
+            "landlord_email": f"landlord{i}@example.com",
+            "landlord_phone": "0912345678",
+        }
+        for i in range(n)
+    ]
+
+
+def old_path(rooms):
+    rooms_data = [
+        {**room, "id": str(room["id"]), "created_at": room["created_at"].isoformat()}
+        for room in rooms
+    ]
+    content = {"success": True, "total": 1000, "page": 1, "limit": PAGE_SIZE, "total_pages": 10, "rooms": rooms_data}
+    return json.dumps(
+        jsonable_encoder(content), ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def new_path(rooms):
+    content = {"success": True, "total": 1000, "page": 1, "limit": PAGE_SIZE, "total_pages": 10, "rooms": rooms}
+    return orjson.dumps(content)
+
+
+def main():
+    rooms = make_rooms()
+    assert orjson.loads(old_path(rooms)) == orjson.loads(new_path(rooms))
+
+    old = min(timeit.repeat(lambda: old_path(rooms), number=ROUNDS, repeat=3)) / ROUNDS
+    new = min(timeit.repeat(lambda: new_path(rooms), number=ROUNDS, repeat=3)) / ROUNDS
+    print(f"{PAGE_SIZE} phòng / response")
+    print(f"  jsonable_encoder + json : {old * 1e6:9.1f} µs")
+    print(f"  orjson                  : {new * 1e6:9.1f} µs")
+    print(f"  nhanh hơn               : {old / new:9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
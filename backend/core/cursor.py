@@ -0,0 +1,33 @@
+# core/cursor.py
+"""
+Cursor opaque cho keyset pagination theo (created_at, id) - dùng chung cho
+tìm phòng (api/findroom.py) và lịch sử giao dịch ví (api/walletapi.py).
+"""
+import base64
+import json
+from datetime import datetime
+from uuid import UUID
+
+from fastapi import HTTPException, status
+
+
+def encode_cursor(created_at: datetime, row_id: UUID) -> str:
+    """Mã hóa vị trí (created_at, id) của dòng cuối trang thành cursor opaque"""
+    raw = json.dumps({"ts": created_at.isoformat(), "id": str(row_id)})
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, UUID]:
+    """Giải mã cursor => (created_at, id). Cursor sai định dạng => 400"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        # Cursor do client gửi lên: kiểm tra kiểu trước khi parse (UUID(1) => AttributeError)
+        if not isinstance(data, dict) or not isinstance(data.get("ts"), str) or not isinstance(data.get("id"), str):
+            raise ValueError("cursor payload")
+        return datetime.fromisoformat(data["ts"]), UUID(data["id"])
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Cursor không hợp lệ"
+        )
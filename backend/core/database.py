@@ -1,5 +1,5 @@
 # core/database.py
-from sqlmodel import SQLModel, create_engine, Session
+from sqlmodel import SQLModel, create_engine, Session, select, text
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
 import os 
 
@@ -18,9 +18,125 @@ async_session_maker = async_sessionmaker(
     expire_on_commit=False
 )
 
+# Migrate schema + backfill: 1 process chạy, các process khác chờ (số tùy ý nhưng cố định)
+DB_MIGRATE_LOCK_ID = 72_011_001
+
+
 def create_db_and_tables():
+    """
+    Tạo bảng, bổ sung cột / index mới, backfill dữ liệu cũ.
+    Giữ advisory lock => nhiều uvicorn worker / container không chạy DDL cùng lúc
+    (index.create(checkfirst=True) không an toàn khi chạy song song); process chờ lock
+    vào sau thì các bước đều đã xong, chỉ còn kiểm tra lại.
+    Dữ liệu lớn: chạy trước khi deploy bằng `python migrate.py` và đặt DB_MIGRATE_ON_STARTUP=false.
+    """
+    with engine.connect() as conn:
+        locked = conn.execute(
+            text("SELECT pg_try_advisory_lock(:lock_id)"), {"lock_id": DB_MIGRATE_LOCK_ID}
+        ).scalar()
+        if not locked:
+            print("ℹ️ Process khác đang migrate database, chờ xong...")
+            conn.execute(text("SELECT pg_advisory_lock(:lock_id)"), {"lock_id": DB_MIGRATE_LOCK_ID})
+        # Lock theo session: kết thúc transaction đọc để không giữ "idle in transaction" khi migrate
+        conn.commit()
+        try:
+            _migrate_schema()
+        finally:
+            conn.execute(text("SELECT pg_advisory_unlock(:lock_id)"), {"lock_id": DB_MIGRATE_LOCK_ID})
+            conn.commit()
+
+
+def _migrate_schema():
+    # Extension cho GIN trigram index (lọc địa chỉ) - phải có trước khi tạo index
+    with engine.begin() as conn:
+        conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+    
     SQLModel.metadata.create_all(engine)
+    
+    # Bổ sung cột mới cho bảng đã tồn tại (create_all không ALTER TABLE)
+    with engine.begin() as conn:
+        for column in ("province_norm", "district_norm", "ward_norm"):
+            conn.execute(text(f"ALTER TABLE rooms ADD COLUMN IF NOT EXISTS {column} VARCHAR"))
+        conn.execute(text("ALTER TABLE user_profiles ADD COLUMN IF NOT EXISTS school_norm VARCHAR"))
+        conn.execute(text("ALTER TABLE transactions ADD COLUMN IF NOT EXISTS balance_after NUMERIC(18, 2)"))
+        # Tiền: float -> NUMERIC (chỉ đổi kiểu 1 lần, lần sau cột đã là numeric)
+        for table, column in (("wallets", "balance"), ("transactions", "amount")):
+            data_type = conn.execute(
+                text("SELECT data_type FROM information_schema.columns WHERE table_name = :table AND column_name = :column"),
+                {"table": table, "column": column}
+            ).scalar()
+            if data_type == "double precision":
+                conn.execute(text(f"ALTER TABLE {table} ALTER COLUMN {column} TYPE NUMERIC(18, 2) USING round({column}::numeric, 2)"))
+    backfill_room_location_norm()
+    backfill_profile_school_norm()
+    dedupe_matches()
+    
+    # create_all không thêm index mới vào bảng đã tồn tại => tạo bù các index còn thiếu
+    for table in SQLModel.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
 
 async def get_async_session():
     async with async_session_maker() as session:
-        yield session
\ No newline at end of file
+        yield session
+
+
+def backfill_room_location_norm(batch_size: int = 1000):
+    """Điền các cột *_norm còn NULL (dữ liệu cũ) - before_update listener tự tính giá trị"""
+    from models.models import Room
+    
+    while True:
+        with Session(engine) as db:
+            rooms = db.exec(
+                select(Room).where(Room.province_norm.is_(None)).limit(batch_size)
+            ).all()
+            if not rooms:
+                break
+            for room in rooms:
+                room.province_norm = ""  # đánh dấu dirty để kích hoạt before_update
+            db.commit()
+
+
+def dedupe_matches():
+    """
+    Xóa gợi ý trùng cặp (user1_id, user2_id) của dữ liệu cũ trước khi tạo unique index
+    ux_matches_user1_user2 (có dòng trùng => CREATE UNIQUE INDEX lỗi, app không khởi động được).
+    Mỗi cặp giữ 1 dòng: ưu tiên đã chốt (không pending/expired), sau đó dòng mới nhất.
+    Chỉ chạy khi index chưa có.
+    """
+    with engine.begin() as conn:
+        exists = conn.execute(
+            text("SELECT 1 FROM pg_indexes WHERE indexname = 'ux_matches_user1_user2'")
+        ).scalar()
+        if exists:
+            return
+        result = conn.execute(text("""
+            DELETE FROM matches m
+            USING (
+                SELECT id, row_number() OVER (
+                    PARTITION BY user1_id, user2_id
+                    ORDER BY CASE WHEN status IN ('pending', 'expired') THEN 1 ELSE 0 END,
+                             created_at DESC, id DESC
+                ) AS rn
+                FROM matches
+            ) ranked
+            WHERE m.id = ranked.id AND ranked.rn > 1
+        """))
+        if result.rowcount:
+            print(f"🧹 Đã xóa {result.rowcount} gợi ý trùng cặp trong matches")
+
+
+def backfill_profile_school_norm(batch_size: int = 1000):
+    """Điền school_norm còn NULL (dữ liệu cũ) - before_update listener tự tính giá trị"""
+    from models.models import UserProfile
+    
+    while True:
+        with Session(engine) as db:
+            profiles = db.exec(
+                select(UserProfile).where(UserProfile.school_norm.is_(None)).limit(batch_size)
+            ).all()
+            if not profiles:
+                break
+            for profile in profiles:
+                profile.school_norm = ""  # đánh dấu dirty để kích hoạt before_update
+            db.commit()
@@ -1,26 +1,82 @@
 # server/main.py
-from fastapi import FastAPI, Depends
+from fastapi import FastAPI, Depends, Response, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi_users import schemas
 import uuid
 from sqlmodel import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from core.database import create_db_and_tables, get_async_session, engine, Session
+from core.database import create_db_and_tables, get_async_session
 from core.auth import auth_backend, fastapi_users, current_active_user
 from models.models import User
 
-from services.elasticsearch_service import create_index_if_not_exists, initial_indexing
+from services.elasticsearch_service import ES_ASYNC_CLIENT, ROOM_INDEX_NAME, close_es_clients
+from services.es_sync_worker import run_outbox_worker, get_outbox_lag
+from services.search_bootstrap import run_bootstrap_in_background, BOOTSTRAP_STATE
+from services.search_cache import SEARCH_CACHE
+from services.cache_invalidation import run_invalidation_listener
+from services.room_detail_cache import ROOM_DETAIL_CACHE
+from services.match_worker import run_rematch_worker, run_match_expiry_sweeper, get_matching_metrics
+from services.wallet_history import run_snapshot_worker, SNAPSHOT_METRICS
+from contextlib import asynccontextmanager
+import asyncio
+import os
 
 
 from api.userapi import router as user_router  # THÊM DÒNG NÀY
 from api.roomapi import router as room_router
 from api.findroom import router as find_room_router
 from api.filterroom import router as filter_router
-
-
-
-app = FastAPI()
+from api.walletapi import router as wallet_router
+from api.profileapi import router as profile_router
+
+
+
+# Tắt nếu khởi tạo ES bằng lệnh riêng: python reindex.py --initial
+ES_BOOTSTRAP_ON_STARTUP = os.getenv("ES_BOOTSTRAP_ON_STARTUP", "true").lower() == "true"
+# Tắt nếu migrate / backfill bằng lệnh riêng trước khi deploy: python migrate.py
+DB_MIGRATE_ON_STARTUP = os.getenv("DB_MIGRATE_ON_STARTUP", "true").lower() == "true"
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if DB_MIGRATE_ON_STARTUP:
+        await asyncio.to_thread(create_db_and_tables)
+    
+    # Khởi tạo ES + worker đồng bộ chạy nền => API nhận request ngay
+    background_tasks = []
+    if ES_BOOTSTRAP_ON_STARTUP:
+        background_tasks.append(asyncio.create_task(run_bootstrap_in_background()))
+    else:
+        BOOTSTRAP_STATE["status"] = "disabled"
+    es_sync_stop = asyncio.Event()
+    es_sync_task = asyncio.create_task(run_outbox_worker(es_sync_stop))
+    matching_stop = asyncio.Event()
+    rematch_task = asyncio.create_task(run_rematch_worker(matching_stop))
+    expiry_task = asyncio.create_task(run_match_expiry_sweeper(matching_stop))
+    snapshot_stop = asyncio.Event()
+    snapshot_task = asyncio.create_task(run_snapshot_worker(snapshot_stop))
+    # Nhận invalidation cache từ các process khác (Postgres LISTEN)
+    cache_stop = asyncio.Event()
+    cache_listener_task = asyncio.create_task(run_invalidation_listener(cache_stop))
+    
+    yield
+    
+    es_sync_stop.set()
+    await es_sync_task
+    matching_stop.set()
+    await rematch_task
+    await expiry_task
+    snapshot_stop.set()
+    await snapshot_task
+    cache_stop.set()
+    await cache_listener_task
+    for task in background_tasks:
+        task.cancel()
+    await close_es_clients()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # CORS cho phép TẤT CẢ origins
 app.add_middleware(
@@ -93,22 +149,65 @@ app.include_router(
     tags=["filters"]
 )
 
-@app.on_event("startup")
-def on_startup():
-    create_db_and_tables()
+# api vi + lich su giao dich
 
+app.include_router(
+    wallet_router,
+    prefix="/api/wallet",
+    tags=["wallet"]
+)
+
+# api ho so ghep ban cung phong
+
+app.include_router(
+    profile_router,
+    prefix="/api/profiles",
+    tags=["profiles"]
+)
 
-    import time
-    for i in range(10):
+@app.get("/health/ready")
+async def readiness(response: Response):
+    """
+    Sẵn sàng phục vụ search khi bootstrap của process này đã xong (index đã có dữ liệu).
+    Bootstrap tắt (reindex.py --initial chạy riêng) => chỉ cần alias index ES đã tồn tại.
+    """
+    if BOOTSTRAP_STATE["status"] == "disabled":
         try:
-            create_index_if_not_exists()
-            with Session(engine) as db: 
-                initial_indexing(db)
-            print("✅ Elasticsearch initialized successfully")
-            break
-        except Exception as e:
-            print(f"🔄 Attempt {i+1}: ES not ready, retrying...")
-            time.sleep(5)
+            search_ready = bool(await ES_ASYNC_CLIENT.indices.exists_alias(name=ROOM_INDEX_NAME))
+        except Exception:
+            search_ready = False
+    else:
+        search_ready = BOOTSTRAP_STATE["status"] == "ready"
+    
+    if not search_ready:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    return {
+        "ready": search_ready,
+        "search_bootstrap": BOOTSTRAP_STATE
+    }
+
+@app.get("/metrics/es-sync")
+async def es_sync_metrics(session: AsyncSession = Depends(get_async_session)):
+    """Độ trễ đồng bộ ES: số thay đổi đang chờ + tuổi thay đổi cũ nhất"""
+    return await get_outbox_lag(session)
+
+@app.get("/metrics/search-cache")
+async def search_cache_metrics():
+    """Hit/miss của cache tìm kiếm + cache chi tiết phòng (worker hiện tại) - dùng để chỉnh TTL"""
+    return {
+        "search": SEARCH_CACHE.metrics(),
+        "room_detail": ROOM_DETAIL_CACHE.metrics()
+    }
+
+@app.get("/metrics/matching")
+async def matching_metrics(session: AsyncSession = Depends(get_async_session)):
+    """Hàng đợi re-match (số dòng chờ + độ trễ) + sweeper hết hạn + cache ma trận block (worker hiện tại)"""
+    return await get_matching_metrics(session)
+
+@app.get("/metrics/wallet-snapshots")
+async def wallet_snapshot_metrics():
+    """Lần tạo snapshot số dư gần nhất (worker hiện tại): thời điểm chạy, as_of, số snapshot tạo ra"""
+    return SNAPSHOT_METRICS
 
 @app.get("/")
 def root():
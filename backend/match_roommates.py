@@ -0,0 +1,23 @@
+# server/match_roommates.py
+"""
+Tính lại gợi ý bạn cùng phòng cho toàn bộ profile đang active (chạy định kỳ, ví dụ cron mỗi đêm).
+
+    python match_roommates.py
+"""
+import asyncio
+
+from core.database import async_session_maker
+from services.matching_service import run_full_matching
+
+
+async def main():
+    async with async_session_maker() as session:
+        stats = await run_full_matching(session)
+    print(
+        f"✅ Ghép xong {stats['profiles']} profile / {stats['blocks']} block: "
+        f"{stats['matches']} gợi ý trong {stats['seconds']:.1f}s"
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
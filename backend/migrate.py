@@ -0,0 +1,17 @@
+# server/migrate.py
+"""
+Tạo bảng, bổ sung cột / index mới, backfill dữ liệu cũ (có advisory lock).
+
+Chạy 1 lần khi deploy (thay cho migrate trong app, đặt DB_MIGRATE_ON_STARTUP=false):
+    python migrate.py
+"""
+from core.database import create_db_and_tables
+
+
+def main():
+    create_db_and_tables()
+    print("✅ Migrate database xong")
+
+
+if __name__ == "__main__":
+    main()
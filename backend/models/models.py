@@ -2,9 +2,25 @@
 from sqlmodel import SQLModel, Field, Relationship
 from typing import Optional, List
 from datetime import datetime
+from decimal import Decimal
 from uuid import UUID, uuid4
-from sqlalchemy import Column
+from sqlalchemy import Column, Index, Numeric, event, text
 from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.mutable import MutableDict
+import unicodedata
+
+
+def normalize_location(value: Optional[str]) -> Optional[str]:
+    """
+    Chuẩn hóa địa chỉ để so khớp: bỏ dấu, lower-case, gộp khoảng trắng.
+    "Thành phố  Hà Nội" -> "thanh pho ha noi"
+    """
+    if value is None:
+        return None
+    value = value.replace("đ", "d").replace("Đ", "D")
+    value = unicodedata.normalize("NFD", value)
+    value = "".join(ch for ch in value if not unicodedata.combining(ch))
+    return " ".join(value.lower().split())
 
 
 class User(SQLModel, table=True):
@@ -32,6 +48,10 @@ class User(SQLModel, table=True):
 
 class UserProfile(SQLModel, table=True):
     __tablename__ = "user_profiles"
+    __table_args__ = (
+        # Đọc 1 block ghép bạn cùng phòng: WHERE school_norm = ... AND gender = ... AND status = ...
+        Index("ix_user_profiles_school_norm_gender_status", "school_norm", "gender", "status"),
+    )
     
     id: UUID = Field(default_factory=uuid4, primary_key=True)
     user_id: UUID = Field(foreign_key="users.id")
@@ -39,17 +59,45 @@ class UserProfile(SQLModel, table=True):
     age: int
     gender: str
     school: str
-    habits: dict = Field(sa_column=Column(JSONB))
-    contact_info: dict = Field(sa_column=Column(JSONB))
+    # MutableDict: sửa tại chỗ (profile.habits["smoking"] = ...) cũng được ghi nhận là thay đổi
+    habits: dict = Field(sa_column=Column(MutableDict.as_mutable(JSONB)))
+    contact_info: dict = Field(sa_column=Column(MutableDict.as_mutable(JSONB)))
     status: str = Field(default="needs_room")
     is_active: bool = Field(default=True)
     max_matches: int = Field(default=5)
     created_at: datetime = Field(default_factory=datetime.utcnow)
+    # Bản chuẩn hóa (không dấu, lower-case) của school - tự cập nhật khi ghi
+    school_norm: Optional[str] = Field(default=None)
     
     user: User = Relationship(back_populates="profile")
 
+
+@event.listens_for(UserProfile, "before_insert")
+@event.listens_for(UserProfile, "before_update")
+def _sync_profile_school_norm(mapper, connection, profile: UserProfile):
+    profile.school_norm = normalize_location(profile.school)
+
+# Trạng thái phòng hợp lệ cho mọi đường ghi (tạo / sửa / import / cập nhật hàng loạt);
+# tìm kiếm chỉ trả phòng "available"
+ROOM_STATUSES = ["available", "rented"]
+# Giá lớn hơn không index được: ES map price là scaled_float (lưu dạng long)
+MAX_ROOM_PRICE = 10 ** 15
+
 class Room(SQLModel, table=True):
     __tablename__ = "rooms"
+    __table_args__ = (
+        # Keyset pagination: WHERE room_status = ... AND (created_at, id) < (...) ORDER BY created_at DESC, id DESC
+        Index("ix_rooms_status_created_at_id", "room_status", "created_at", "id"),
+        # Lọc địa chỉ LIKE '%...%' trên cột đã chuẩn hóa (cần extension pg_trgm)
+        Index("ix_rooms_province_norm_trgm", "province_norm", postgresql_using="gin", postgresql_ops={"province_norm": "gin_trgm_ops"}),
+        Index("ix_rooms_district_norm_trgm", "district_norm", postgresql_using="gin", postgresql_ops={"district_norm": "gin_trgm_ops"}),
+        Index("ix_rooms_ward_norm_trgm", "ward_norm", postgresql_using="gin", postgresql_ops={"ward_norm": "gin_trgm_ops"}),
+        # Lọc khoảng giá / diện tích trên phòng available
+        Index("ix_rooms_status_price", "room_status", "price"),
+        Index("ix_rooms_status_area", "room_status", "area"),
+        # Danh sách phòng của chủ trọ: WHERE landlord_id = ... ORDER BY created_at DESC, id DESC
+        Index("ix_rooms_landlord_created_at_id", "landlord_id", text("created_at DESC"), text("id DESC")),
+    )
     
     id: UUID = Field(default_factory=uuid4, primary_key=True)
     landlord_id: UUID = Field(foreign_key="users.id")
@@ -65,11 +113,30 @@ class Room(SQLModel, table=True):
     images: List[str] = Field(sa_column=Column(JSONB))
     created_at: datetime = Field(default_factory=datetime.utcnow)
     
+    # Bản chuẩn hóa (không dấu, lower-case) của province/district/ward - tự cập nhật khi ghi
+    province_norm: Optional[str] = Field(default=None)
+    district_norm: Optional[str] = Field(default=None)
+    ward_norm: Optional[str] = Field(default=None)
+    
     landlord: User = Relationship(back_populates="rooms")
     matches: List["Match"] = Relationship(back_populates="room")
 
+
+@event.listens_for(Room, "before_insert")
+@event.listens_for(Room, "before_update")
+def _sync_room_location_norm(mapper, connection, room: Room):
+    room.province_norm = normalize_location(room.province)
+    room.district_norm = normalize_location(room.district)
+    room.ward_norm = normalize_location(room.ward)
+
 class Match(SQLModel, table=True):
     __tablename__ = "matches"
+    __table_args__ = (
+        # 1 gợi ý cho mỗi cặp (user1 = người nhận gợi ý) - dùng cho ON CONFLICT khi ghi lại kết quả
+        Index("ux_matches_user1_user2", "user1_id", "user2_id", unique=True),
+        # Sweeper hết hạn chỉ quét các gợi ý pending
+        Index("ix_matches_pending_expires_at", "expires_at", postgresql_where=text("status = 'pending'")),
+    )
     
     id: UUID = Field(default_factory=uuid4, primary_key=True)
     user1_id: UUID = Field(foreign_key="users.id")
@@ -90,7 +157,8 @@ class Wallet(SQLModel, table=True):
     
     id: UUID = Field(default_factory=uuid4, primary_key=True)
     user_id: UUID = Field(foreign_key="users.id", unique=True)
-    balance: float = Field(default=0.0)
+    # Tiền dùng NUMERIC (chính xác), chỉ thay đổi qua services/ledger_service.py
+    balance: Decimal = Field(default=Decimal("0"), sa_column=Column(Numeric(18, 2), nullable=False, server_default="0"))
     created_at: datetime = Field(default_factory=datetime.utcnow)
     
     user: User = Relationship(back_populates="wallet")
@@ -98,12 +166,80 @@ class Wallet(SQLModel, table=True):
 
 class Transaction(SQLModel, table=True):
     __tablename__ = "transactions"
+    __table_args__ = (
+        # Lịch sử giao dịch: WHERE wallet_id = ... AND (created_at, id) < (...) ORDER BY created_at DESC, id DESC
+        Index("ix_transactions_wallet_created_at_id", "wallet_id", "created_at", "id"),
+    )
     
     id: UUID = Field(default_factory=uuid4, primary_key=True)
     wallet_id: UUID = Field(foreign_key="wallets.id")
-    amount: float
+    amount: Decimal = Field(sa_column=Column(Numeric(18, 2), nullable=False))
     type: str
     description: str
     created_at: datetime = Field(default_factory=datetime.utcnow)
+    # Số dư ví ngay sau giao dịch này (do ledger ghi cùng câu lệnh cập nhật số dư)
+    balance_after: Optional[Decimal] = Field(default=None, sa_column=Column(Numeric(18, 2)))
+    
+    wallet: Wallet = Relationship(back_populates="transactions")
+
+class WalletBalanceSnapshot(SQLModel, table=True):
+    """
+    Số dư ví tại thời điểm as_of (= tổng mọi giao dịch có created_at <= as_of).
+    Số dư tại ngày X = snapshot gần nhất trước X + tổng giao dịch sau snapshot đó
+    (services/wallet_history.py).
+    """
+    __tablename__ = "wallet_balance_snapshots"
+    __table_args__ = (
+        Index("ux_wallet_balance_snapshots_wallet_as_of", "wallet_id", "as_of", unique=True),
+    )
     
-    wallet: Wallet = Relationship(back_populates="transactions")
\ No newline at end of file
+    id: Optional[int] = Field(default=None, primary_key=True)
+    wallet_id: UUID = Field(foreign_key="wallets.id")
+    balance: Decimal = Field(sa_column=Column(Numeric(18, 2), nullable=False))
+    as_of: datetime
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+class RoomIndexOutbox(SQLModel, table=True):
+    """
+    Outbox đồng bộ Room -> Elasticsearch.
+    Ghi cùng transaction với thao tác create/update/delete phòng,
+    worker nền (services/es_sync_worker.py) đọc và đẩy sang ES bằng bulk API.
+    """
+    __tablename__ = "room_index_outbox"
+    __table_args__ = (
+        # Worker chỉ quét các dòng chưa xử lý
+        Index("ix_room_index_outbox_pending", "next_attempt_at", "id", postgresql_where=text("processed_at IS NULL")),
+        # Dọn các dòng đã xử lý quá hạn lưu giữ
+        Index("ix_room_index_outbox_processed_at", "processed_at", postgresql_where=text("processed_at IS NOT NULL")),
+    )
+    
+    id: Optional[int] = Field(default=None, primary_key=True)
+    room_id: UUID = Field(index=True)
+    op: str  # "index" | "delete"
+    attempts: int = Field(default=0)
+    last_error: Optional[str] = Field(default=None)
+    next_attempt_at: datetime = Field(default_factory=datetime.utcnow)
+    processed_at: Optional[datetime] = Field(default=None)
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class ProfileRematchOutbox(SQLModel, table=True):
+    """
+    Hàng đợi re-match khi UserProfile thay đổi.
+    Listener ORM (services/match_worker.py) ghi cùng transaction với thao tác ghi profile,
+    worker nền đọc và gọi rematch_profile.
+    """
+    __tablename__ = "profile_rematch_outbox"
+    __table_args__ = (
+        # Worker chỉ quét các dòng chưa xử lý
+        Index("ix_profile_rematch_outbox_pending", "next_attempt_at", "id", postgresql_where=text("processed_at IS NULL")),
+        Index("ix_profile_rematch_outbox_processed_at", "processed_at", postgresql_where=text("processed_at IS NOT NULL")),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    user_id: UUID = Field(index=True)
+    attempts: int = Field(default=0)
+    last_error: Optional[str] = Field(default=None)
+    next_attempt_at: datetime = Field(default_factory=datetime.utcnow)
+    processed_at: Optional[datetime] = Field(default=None)
+    created_at: datetime = Field(default_factory=datetime.utcnow)
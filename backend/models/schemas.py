@@ -0,0 +1,84 @@
+# models/schemas.py
+"""
+Schema response dùng chung cho các API danh sách phòng.
+
+Các endpoint khai báo response_model=... để có tài liệu OpenAPI, nhưng trả về thẳng
+ORJSONResponse => FastAPI bỏ qua bước validate + jsonable_encoder, orjson tự encode
+UUID / datetime trong 1 lượt.
+"""
+from datetime import datetime
+from typing import List, Optional
+from uuid import UUID
+
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel
+
+
+class RoomCard(BaseModel):
+    id: UUID
+    title: str
+    province: str
+    district: str
+    ward: str
+    area: float
+    price: float
+    images: List[str] = []
+    created_at: datetime
+    landlord_email: Optional[str] = None
+    landlord_phone: Optional[str] = None
+
+
+class RoomSearchResponse(BaseModel):
+    success: bool = True
+    keyword: Optional[str] = None
+    total: int
+    page: int
+    limit: int
+    total_pages: int
+    rooms: List[RoomCard]
+
+
+class RoomCursorResponse(BaseModel):
+    success: bool = True
+    limit: int
+    next_cursor: Optional[str] = None
+    has_more: bool
+    rooms: List[RoomCard]
+
+
+class LandlordRoom(BaseModel):
+    id: UUID
+    title: str
+    description: Optional[str] = None
+    province: str
+    district: str
+    ward: str
+    address_detail: str
+    area: float
+    price: float
+    room_status: str
+    images: List[str] = []
+    created_at: datetime
+
+
+class LandlordRoomSummary(BaseModel):
+    id: UUID
+    title: str
+    price: float
+    room_status: str
+    thumbnail: Optional[str] = None
+    created_at: datetime
+
+
+class LandlordRoomSummaryPage(BaseModel):
+    success: bool = True
+    total: int
+    page: int
+    limit: int
+    total_pages: int
+    rooms: List[LandlordRoomSummary]
+
+
+def orjson_response(content, status_code: int = 200, headers: Optional[dict] = None) -> ORJSONResponse:
+    """Trả response đã encode bằng orjson (không qua jsonable_encoder)"""
+    return ORJSONResponse(content=content, status_code=status_code, headers=headers)
@@ -0,0 +1,36 @@
+# server/reindex.py
+"""
+Reindex Elasticsearch không downtime (blue/green qua alias "rooms").
+
+Chạy khi đổi ROOM_MAPPING:
+    python reindex.py
+    python reindex.py --keep-old   # giữ lại toàn bộ index version cũ
+
+Khởi tạo 1 lần khi deploy (thay cho bootstrap trong app, đặt ES_BOOTSTRAP_ON_STARTUP=false):
+    python reindex.py --initial
+"""
+import argparse
+
+from core.database import engine, Session
+from services.elasticsearch_service import create_index_if_not_exists, blue_green_reindex
+from services.search_bootstrap import bootstrap_search_index
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Blue/green reindex rooms")
+    parser.add_argument("--keep-old", action="store_true", help="Không xóa các index version cũ")
+    parser.add_argument("--initial", action="store_true", help="Chỉ tạo index + initial indexing (có advisory lock)")
+    args = parser.parse_args()
+
+    if args.initial:
+        bootstrap_search_index()
+        return
+
+    create_index_if_not_exists()
+    with Session(engine) as db:
+        new_index = blue_green_reindex(db, delete_old=not args.keep_old)
+    print(f"✅ Reindex xong, alias đang trỏ tới '{new_index}'")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+# services/cache_invalidation.py
+"""
+Đồng bộ invalidation cache (search cache, chi tiết phòng) giữa các worker/process
+qua Postgres LISTEN/NOTIFY.
+
+- Thao tác ghi gọi publish_invalidation TRƯỚC commit: Postgres chỉ gửi NOTIFY khi
+  transaction commit (rollback => không gửi), nên cache không bị xóa cho thay đổi chưa có
+- Mỗi process giữ 1 connection LISTEN (run_invalidation_listener) và xóa cache cục bộ của mình
+- Process phát thông báo (origin) tăng generation ở backend dùng chung (Redis) đúng 1 lần
+- Mất kết nối LISTEN => có thể đã lỡ thông báo: khi kết nối lại xóa toàn bộ cache
+"""
+import asyncio
+import json
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+from uuid import UUID, uuid4
+
+from sqlalchemy import text
+
+from core.database import async_engine
+from services.room_detail_cache import ROOM_DETAIL_CACHE
+from services.search_cache import SEARCH_CACHE, SEARCH_CACHE_GROUPS, room_location
+
+CACHE_INVALIDATION_CHANNEL = "room_cache_invalidation"
+# Payload NOTIFY tối đa 8000 byte => nhiều địa chỉ hơn thì xóa cả nhóm,
+# id phòng (chi tiết phòng) chia thành nhiều thông báo
+MAX_NOTIFY_ROOMS = 40
+MAX_NOTIFY_DETAIL_IDS = 150
+LISTENER_HEALTHCHECK_INTERVAL = 30.0  # giây
+LISTENER_RETRY_INTERVAL = 5.0  # giây
+
+PROCESS_ID = uuid4().hex
+
+NOTIFY_SQL = text("SELECT pg_notify(:channel, :payload)")
+
+
+def invalidation_messages(
+    groups: Sequence[str],
+    rooms: Optional[Iterable[Any]] = None,
+    detail_ids: Sequence[Any] = ()
+) -> List[Dict[str, str]]:
+    """
+    Tham số cho NOTIFY_SQL (mỗi phần tử 1 thông báo).
+    groups: nhóm search cache cần xóa ("sql", "es"); rooms: các object có province/district/ward
+    (chỉ xóa entry có bộ lọc địa chỉ khớp), None => xóa cả nhóm;
+    detail_ids: id các phòng cần xóa khỏi cache chi tiết phòng
+    """
+    locations = None
+    if rooms is not None:
+        locations = [room_location(room) for room in rooms]
+        if len(locations) > MAX_NOTIFY_ROOMS:
+            locations = None
+    detail_ids = [str(room_id) for room_id in detail_ids]
+
+    payloads = [{"origin": PROCESS_ID, "groups": list(groups), "rooms": locations,
+                 "detail": detail_ids[:MAX_NOTIFY_DETAIL_IDS]}]
+    for start in range(MAX_NOTIFY_DETAIL_IDS, len(detail_ids), MAX_NOTIFY_DETAIL_IDS):
+        payloads.append({"origin": PROCESS_ID, "groups": [], "rooms": None,
+                         "detail": detail_ids[start:start + MAX_NOTIFY_DETAIL_IDS]})
+    return [
+        {"channel": CACHE_INVALIDATION_CHANNEL, "payload": json.dumps(payload)}
+        for payload in payloads
+    ]
+
+
+async def publish_invalidation(
+    session,
+    groups: Sequence[str],
+    rooms: Optional[Iterable[Any]] = None,
+    detail_ids: Sequence[Any] = ()
+):
+    """Gọi trước session.commit() của thao tác ghi"""
+    for params in invalidation_messages(groups, rooms, detail_ids):
+        await session.execute(NOTIFY_SQL, params)
+
+
+async def _invalidate_shared(groups: Sequence[str]):
+    try:
+        await SEARCH_CACHE.invalidate_shared(groups)
+    except Exception as e:
+        print(f"🚨 Lỗi search cache backend: {e}")
+
+
+def _on_notification(connection, pid, channel, raw_payload):
+    try:
+        payload = json.loads(raw_payload)
+    except ValueError:
+        return
+    groups = payload.get("groups") or []
+    SEARCH_CACHE.invalidate_local(groups, payload.get("rooms"))
+    for room_id in payload.get("detail") or []:
+        ROOM_DETAIL_CACHE.invalidate(UUID(room_id))
+    if payload.get("origin") == PROCESS_ID and groups:
+        asyncio.ensure_future(_invalidate_shared(groups))
+
+
+async def run_invalidation_listener(stop_event: asyncio.Event):
+    """Giữ 1 connection LISTEN tới khi stop_event được set, tự kết nối lại khi lỗi"""
+    while not stop_event.is_set():
+        try:
+            async with async_engine.connect() as conn:
+                raw = await conn.get_raw_connection()
+                driver = raw.driver_connection
+                await driver.add_listener(CACHE_INVALIDATION_CHANNEL, _on_notification)
+                # Thông báo gửi trong lúc chưa LISTEN đã mất
+                SEARCH_CACHE.invalidate_local(SEARCH_CACHE_GROUPS)
+                ROOM_DETAIL_CACHE.clear()
+                await _invalidate_shared(SEARCH_CACHE_GROUPS)
+                try:
+                    while not stop_event.is_set():
+                        try:
+                            await asyncio.wait_for(stop_event.wait(), timeout=LISTENER_HEALTHCHECK_INTERVAL)
+                        except asyncio.TimeoutError:
+                            # Connection chết thì add_listener không báo lỗi => kiểm tra định kỳ
+                            await driver.execute("SELECT 1")
+                finally:
+                    await driver.remove_listener(CACHE_INVALIDATION_CHANNEL, _on_notification)
+        except Exception as e:
+            print(f"🚨 Lỗi LISTEN invalidation cache: {e}")
+            try:
+                await asyncio.wait_for(stop_event.wait(), timeout=LISTENER_RETRY_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
@@ -1,7 +1,12 @@
-from elasticsearch import Elasticsearch
-from sqlmodel import Session, select
-from models.models import Room # Giả định Room model của bạn nằm ở đây
-from typing import List, Dict, Any
+from elasticsearch import Elasticsearch, AsyncElasticsearch
+from sqlmodel import Session, select, text
+from sqlalchemy.orm import selectinload
+from models.models import Room, User # Giả định Room model của bạn nằm ở đây
+from services.room_filters import RANGE_FIELDS, es_range_clause
+from typing import List, Dict, Any, Optional
+from uuid import UUID
+from datetime import datetime
+import copy
 import os
 
 ES_HOST = os.getenv("ELASTICSEARCH_URL", "http://elasticsearch:9200")
@@ -9,17 +14,41 @@ ES_HOST = os.getenv("ELASTICSEARCH_URL", "http://elasticsearch:9200")
 
 HEADERS = {'Content-Type': 'application/json', 'Accept': 'application/vnd.elasticsearch+json; compatible-with=7'}
 
+# Cấu hình kết nối dùng chung cho client sync và async
+ES_REQUEST_TIMEOUT = float(os.getenv("ES_REQUEST_TIMEOUT", "5"))
+ES_MAX_RETRIES = int(os.getenv("ES_MAX_RETRIES", "2"))
+ES_CONNECTIONS_PER_NODE = int(os.getenv("ES_CONNECTIONS_PER_NODE", "25"))
+
+# Client sync - chỉ dùng cho tác vụ nền / khởi động (indexing), KHÔNG gọi trong async handler
 ES_CLIENT = Elasticsearch(
     ES_HOST,
     # headers=HEADERS # Thêm header vào đây
+    request_timeout=ES_REQUEST_TIMEOUT,
+    max_retries=ES_MAX_RETRIES,
+    retry_on_timeout=True,
+)
 
+# Client async - dùng trong các API handler để không block event loop
+ES_ASYNC_CLIENT = AsyncElasticsearch(
+    ES_HOST,
+    request_timeout=ES_REQUEST_TIMEOUT,
+    max_retries=ES_MAX_RETRIES,
+    retry_on_timeout=True,
+    connections_per_node=ES_CONNECTIONS_PER_NODE,
 )
 
 
+# "rooms" là ALIAS trỏ tới index thật "rooms_vN".
+# Đổi mapping => build index version mới rồi chuyển alias (blue/green), search không bị gián đoạn.
 ROOM_INDEX_NAME = "rooms"
+ROOM_INDEX_PREFIX = f"{ROOM_INDEX_NAME}_v"
+ROOM_INDEX_REPLICAS = int(os.getenv("ES_ROOM_REPLICAS", "1"))
 
 
 
+# Tăng version mỗi khi sửa ROOM_MAPPING => lần khởi động sau tự blue/green reindex
+ROOM_MAPPING_VERSION = 2
+
 ROOM_MAPPING = {
     "settings": {
         "analysis": {
@@ -33,32 +62,81 @@ ROOM_MAPPING = {
         }
     },
     "mappings": {
+        "_meta": {"version": ROOM_MAPPING_VERSION},
         "properties": {
             "id": {"type": "keyword"},
 
             # ĐỊA CHỈ: SỬA TỪ keyword -> text ĐỂ SEARCH ĐƯỢC
-            "province": {"type": "text", "analyzer": "vi_analyzer"},  # BOOST CAO NHẤT
-            "district": {"type": "text", "analyzer": "vi_analyzer"},   # BOOST CAO
-            "ward": {"type": "text", "analyzer": "vi_analyzer"},       # BOOST CAO
+            # .raw (keyword) dùng cho aggregation theo tỉnh/quận
+            "province": {"type": "text", "analyzer": "vi_analyzer", "fields": {"raw": {"type": "keyword"}}},  # BOOST CAO NHẤT
+            "district": {"type": "text", "analyzer": "vi_analyzer", "fields": {"raw": {"type": "keyword"}}},   # BOOST CAO
+            "ward": {"type": "text", "analyzer": "vi_analyzer", "fields": {"raw": {"type": "keyword"}}},       # BOOST CAO
             
             "title": {"type": "text", "analyzer": "vi_analyzer"}, 
             "description": {"type": "text", "analyzer": "vi_analyzer"}, 
-            "search_combined": {"type": "text", "analyzer": "vi_analyzer"}
+            "search_combined": {"type": "text", "analyzer": "vi_analyzer"},
+            
+            # SỐ: để lọc range trong filter context (VNĐ chẵn đồng, diện tích lấy 2 số lẻ)
+            "price": {"type": "scaled_float", "scaling_factor": 1},
+            "area": {"type": "scaled_float", "scaling_factor": 100},
+            
+            # CÁC TRƯỜNG CHỈ ĐỂ HIỂN THỊ CARD (đọc từ _source, không cần search)
+            "room_status": {"type": "keyword"},
+            "created_at": {"type": "date"},
+            "images": {"type": "keyword", "index": False},
+            "landlord_email": {"type": "keyword", "index": False},
+            "landlord_phone": {"type": "keyword", "index": False}
         }
     }
 }
 
 
+def _room_index_versions() -> List[int]:
+    """Danh sách version của các index rooms_vN đang tồn tại"""
+    indices = ES_CLIENT.indices.get(index=f"{ROOM_INDEX_PREFIX}*", ignore_unavailable=True)
+    versions = []
+    for name in indices:
+        suffix = name[len(ROOM_INDEX_PREFIX):]
+        if suffix.isdigit():
+            versions.append(int(suffix))
+    return sorted(versions)
+
+
+def _is_legacy_room_index() -> bool:
+    """True nếu "rooms" vẫn là index thật (bản cũ, trước khi dùng alias)"""
+    return (
+        ES_CLIENT.indices.exists(index=ROOM_INDEX_NAME)
+        and not ES_CLIENT.indices.exists_alias(name=ROOM_INDEX_NAME)
+    )
+
+
+def _is_room_mapping_outdated() -> bool:
+    """True nếu index sau alias được tạo với ROOM_MAPPING version cũ hơn"""
+    mappings = ES_CLIENT.indices.get_mapping(index=ROOM_INDEX_NAME)
+    for index_mapping in mappings.values():
+        meta = index_mapping["mappings"].get("_meta", {})
+        if meta.get("version") != ROOM_MAPPING_VERSION:
+            return True
+    return False
 
 
+def is_room_index_populated() -> bool:
+    """True nếu alias đã trỏ tới index đúng ROOM_MAPPING và có dữ liệu => không cần index lại toàn bộ"""
+    if not ES_CLIENT.indices.exists_alias(name=ROOM_INDEX_NAME):
+        return False
+    if _is_room_mapping_outdated():
+        return False
+    return ES_CLIENT.count(index=ROOM_INDEX_NAME)["count"] > 0
 
 
 def create_index_if_not_exists():
-    """Kiểm tra và tạo Index nếu nó chưa tồn tại."""
+    """Kiểm tra và tạo Index (rooms_v1 + alias rooms) nếu nó chưa tồn tại."""
     try:
         if not ES_CLIENT.indices.exists(index=ROOM_INDEX_NAME):
-            ES_CLIENT.indices.create(index=ROOM_INDEX_NAME, body=ROOM_MAPPING)
-            print(f"Index '{ROOM_INDEX_NAME}' đã tạo thành công.")
+            index_name = f"{ROOM_INDEX_PREFIX}1"
+            body = {**ROOM_MAPPING, "aliases": {ROOM_INDEX_NAME: {}}}
+            ES_CLIENT.indices.create(index=index_name, body=body)
+            print(f"Index '{index_name}' (alias '{ROOM_INDEX_NAME}') đã tạo thành công.")
     except Exception as e:
         print(f"Lỗi khi khởi tạo Index: {e}")
 
@@ -66,8 +144,12 @@ def create_index_if_not_exists():
 # 2. ĐỒNG BỘ HÓA DỮ LIỆU (Indexing)
 # ----------------------------------------------------------------------
 
-def room_to_elastic_doc(room: Room) -> Dict[str, Any]:
-    """Chuyển đổi Room Model từ SQL sang Document cho Elasticsearch"""
+def room_to_elastic_doc(room: Room, landlord: Optional[User] = None) -> Dict[str, Any]:
+    """
+    Chuyển đổi Room Model từ SQL sang Document cho Elasticsearch.
+    Document chứa đủ dữ liệu của card danh sách (kèm liên hệ chủ trọ)
+    để search keyword trả kết quả thẳng từ _source.
+    """
     
     # Tạo trường kết hợp cho tìm kiếm vị trí và tiêu đề
     search_combined = (
@@ -83,12 +165,17 @@ def room_to_elastic_doc(room: Room) -> Dict[str, Any]:
         "ward": room.ward,
         "price": room.price,
         "area": room.area,
-        "search_combined": search_combined 
+        "search_combined": search_combined,
+        "room_status": room.room_status,
+        "created_at": room.created_at.isoformat() if room.created_at else None,
+        "images": room.images or [],
+        "landlord_email": landlord.email if landlord else None,
+        "landlord_phone": landlord.phone if landlord else None
     }
 
-def index_room(room: Room):
+def index_room(room: Room, landlord: Optional[User] = None):
     """Lưu trữ/Cập nhật một tài liệu Room vào Elasticsearch."""
-    doc = room_to_elastic_doc(room)
+    doc = room_to_elastic_doc(room, landlord)
     try:
         # id trong ES chính là UUID của Room trong SQL
         ES_CLIENT.index(index=ROOM_INDEX_NAME, id=doc["id"], document=doc)
@@ -107,7 +194,7 @@ def delete_room_doc(room_id: str):
 # 3. TRUY VẤN (Querying)
 
 
-def search_rooms(query_string: str, page: int = 1, page_size: int = 20) -> tuple[List[str], int]:
+def build_search_body(query_string: str, page: int = 1, page_size: int = 20) -> Dict[str, Any]:
     
     main_query = {
         "multi_match": {
@@ -124,7 +211,7 @@ def search_rooms(query_string: str, page: int = 1, page_size: int = 20) -> tuple
     
     start_from = (page - 1) * page_size
     
-    search_body = {
+    return {
         # Đảm bảo ES trả về tổng số hits chính xác
         "track_total_hits": True, 
         "query": main_query,
@@ -132,50 +219,452 @@ def search_rooms(query_string: str, page: int = 1, page_size: int = 20) -> tuple
         "size": page_size,
         "_source": ["id"],
     }
+
+
+def parse_search_ids(res) -> tuple[List[str], int]:
+    total_hits = res['hits']['total']['value']
+    room_ids = [hit['_id'] for hit in res['hits']['hits']]
+    return room_ids, total_hits
+
+
+def search_rooms(query_string: str, page: int = 1, page_size: int = 20) -> tuple[List[str], int]:
     
+    search_body = build_search_body(query_string, page, page_size)
     res = ES_CLIENT.search(index=ROOM_INDEX_NAME, body=search_body)
+    return parse_search_ids(res)
+
+
+# ----------------------------------------------------------------------
+# BẢN ASYNC (dùng trong API handler)
+# ----------------------------------------------------------------------
 
+async def search_rooms_async(query_string: str, page: int = 1, page_size: int = 20) -> tuple[List[str], int]:
+    """Giống search_rooms nhưng không block event loop"""
+    search_body = build_search_body(query_string, page, page_size)
+    res = await ES_ASYNC_CLIENT.search(index=ROOM_INDEX_NAME, body=search_body)
+    return parse_search_ids(res)
 
+
+# Các trường của card danh sách - đủ để render mà không cần query SQL
+CARD_SOURCE_FIELDS = [
+    "id", "title", "province", "district", "ward", "area", "price",
+    "images", "created_at", "landlord_email", "landlord_phone"
+]
+
+
+async def search_room_docs_async(query_string: str, page: int = 1, page_size: int = 20) -> tuple[List[Dict[str, Any]], int]:
+    """
+    Search keyword trả về luôn document (_source) của các phòng available,
+    theo đúng thứ tự xếp hạng => 1 lần gọi ES, không cần query Postgres.
+    """
+    search_body = build_search_body(query_string, page, page_size)
+    search_body["query"] = {
+        "bool": {
+            "must": [search_body["query"]],
+            "filter": [{"term": {"room_status": "available"}}]
+        }
+    }
+    search_body["_source"] = CARD_SOURCE_FIELDS
+    
+    res = await ES_ASYNC_CLIENT.search(index=ROOM_INDEX_NAME, body=search_body)
     total_hits = res['hits']['total']['value']
+    docs = [hit['_source'] for hit in res['hits']['hits']]
+    return docs, total_hits
+
+
+def build_range_clauses(search_data: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """Các clause range giá / diện tích (slug hoặc {"min","max"}), theo tên field"""
+    filters = search_data.get("filters") or {}
+    clauses = {}
+    for field in RANGE_FIELDS:
+        if filters.get(field):
+            clause = es_range_clause(field, filters[field])
+            if clause:
+                clauses[field] = clause
+    return clauses
+
+
+# Các field địa chỉ có facet: khi tính facet, bộ lọc của chúng cũng chuyển sang post_filter
+LOCATION_FACET_FIELDS = ("province", "district")
+
+
+def build_location_clauses(search_data: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """Các clause lọc province / district / ward, theo tên field"""
+    location = search_data.get("location") or {}
+    clauses = {}
+    for field in ("province", "district", "ward"):
+        if location.get(field):
+            # match_phrase qua vi_analyzer: bỏ dấu + khớp 1 đoạn liên tiếp (giống LIKE '%...%' bên SQL)
+            clauses[field] = {"match_phrase": {field: location[field]}}
+    return clauses
+
+
+def build_facet_filter_clauses(search_data: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """Bộ lọc của các facet (giá, diện tích, tỉnh, quận), theo tên facet"""
+    location = build_location_clauses(search_data)
+    clauses = build_range_clauses(search_data)
+    for field in LOCATION_FACET_FIELDS:
+        if field in location:
+            clauses[field] = location[field]
+    return clauses
+
+
+def build_filter_clauses(search_data: Dict[str, Any], include_facet_filters: bool = True) -> List[Dict[str, Any]]:
+    """
+    Chuyển body tìm kiếm (location + filters, giống API /search) thành các clause
+    trong filter context => không tính điểm, ES tự cache.
+    include_facet_filters=False: bỏ bộ lọc của các facet (để chúng ở post_filter).
+    """
+    clauses: List[Dict[str, Any]] = [{"term": {"room_status": "available"}}]
+    
+    for field, clause in build_location_clauses(search_data).items():
+        if include_facet_filters or field not in LOCATION_FACET_FIELDS:
+            clauses.append(clause)
     
+    if include_facet_filters:
+        clauses.extend(build_range_clauses(search_data).values())
+    
+    return clauses
 
-    room_ids = [hit['_id'] for hit in res['hits']['hits']]
 
-    return room_ids, total_hits
+def build_facet_aggs(
+    search_data: Dict[str, Any],
+    price_buckets: List[Dict[str, Any]],
+    area_buckets: List[Dict[str, Any]],
+    terms_size: int = 20
+) -> Dict[str, Any]:
+    """
+    Aggregation cho sidebar bộ lọc.
+    Mỗi facet áp bộ lọc của các facet còn lại, trừ chính nó (lọc chính nó sẽ làm mọi bucket khác = 0,
+    ví dụ chọn tỉnh => facet tỉnh chỉ còn đúng tỉnh đó).
+    buckets: [{"value": "1m-3m", "min": 1000000, "max": 3000000}, ...] (max không tính, giống range agg)
+    """
+    facet_filters = build_facet_filter_clauses(search_data)
+    
+    def _ranges(buckets):
+        result = []
+        for bucket in buckets:
+            item = {"key": bucket["value"]}
+            if bucket.get("min") is not None:
+                item["from"] = bucket["min"]
+            if bucket.get("max") is not None:
+                item["to"] = bucket["max"]
+            result.append(item)
+        return result
+    
+    def _filtered(exclude: str, aggs: Dict[str, Any]) -> Dict[str, Any]:
+        others = [clause for field, clause in facet_filters.items() if field != exclude]
+        return {
+            "filter": {"bool": {"filter": others}} if others else {"match_all": {}},
+            "aggs": aggs
+        }
+    
+    return {
+        "price": _filtered("price", {
+            "buckets": {"range": {"field": "price", "ranges": _ranges(price_buckets)}}
+        }),
+        "area": _filtered("area", {
+            "buckets": {"range": {"field": "area", "ranges": _ranges(area_buckets)}}
+        }),
+        "province": _filtered("province", {
+            "buckets": {"terms": {"field": "province.raw", "size": terms_size}}
+        }),
+        "district": _filtered("district", {
+            "buckets": {"terms": {"field": "district.raw", "size": terms_size}}
+        })
+    }
 
 
-# File: elasticsearch_service.py (Bổ sung)
+def parse_facet_aggs(aggregations: Dict[str, Any]) -> Dict[str, Dict[str, int]]:
+    """Kết quả aggregation -> {"price": {slug: count}, "area": {...}, "province": {tên: count}, "district": {...}}"""
+    return {
+        facet: {b["key"]: b["doc_count"] for b in aggregations[facet]["buckets"]["buckets"]}
+        for facet in ("price", "area", "province", "district")
+    }
 
-def initial_indexing(db: Session):
+
+async def search_rooms_combined_async(
+    query_string: Optional[str],
+    search_data: Dict[str, Any],
+    page: int = 1,
+    page_size: int = 20,
+    facet_aggs: Optional[Dict[str, Any]] = None
+) -> tuple[List[Dict[str, Any]], int, Optional[Dict[str, Any]]]:
     """
-    Đồng bộ hóa tất cả các phòng trọ hiện có từ PostgreSQL sang Elasticsearch.
-    Chỉ nên gọi một lần khi ứng dụng khởi động lần đầu hoặc sau khi setup.
+    Full-text + location/giá/diện tích trong 1 query ES duy nhất:
+    multi_match ở "must" (tính điểm), các điều kiện lọc ở "filter" (cache).
+    Không có keyword => chỉ lọc, sắp xếp phòng mới nhất trước.
+    facet_aggs (build_facet_aggs): tính facet cùng request với hits,
+    khi đó bộ lọc của các facet (giá, diện tích, tỉnh, quận) chuyển sang post_filter
+    để facet không bị lọc mất.
+    Trả về (docs, total, aggregations hoặc None).
     """
-    print("--- BẮT ĐẦU ĐỒNG BỘ HÓA DỮ LIỆU BAN ĐẦU ---")
+    if query_string:
+        search_body = build_search_body(query_string, page, page_size)
+        must = [search_body["query"]]
+    else:
+        search_body = build_search_body("", page, page_size)
+        must = [{"match_all": {}}]
+        search_body["sort"] = [{"created_at": "desc"}, {"id": "desc"}]
     
-    # 1. Truy vấn tất cả phòng trọ từ PostgreSQL
-    rooms = db.exec(select(Room)).all()
+    search_body["query"] = {
+        "bool": {
+            "must": must,
+            "filter": build_filter_clauses(search_data, include_facet_filters=facet_aggs is None)
+        }
+    }
+    if facet_aggs is not None:
+        post_filter_clauses = list(build_facet_filter_clauses(search_data).values())
+        if post_filter_clauses:
+            search_body["post_filter"] = {"bool": {"filter": post_filter_clauses}}
+        search_body["aggs"] = facet_aggs
+    search_body["_source"] = CARD_SOURCE_FIELDS
     
-    # 2. Chuẩn bị hàng loạt (Bulk Indexing) để tăng tốc độ
-    actions = []
-    for room in rooms:
-        doc = room_to_elastic_doc(room)
-        actions.append({
-            "_index": ROOM_INDEX_NAME,
+    res = await ES_ASYNC_CLIENT.search(index=ROOM_INDEX_NAME, body=search_body)
+    total_hits = res['hits']['total']['value']
+    docs = [hit['_source'] for hit in res['hits']['hits']]
+    return docs, total_hits, res.get('aggregations')
+
+
+async def index_room_async(room: Room, landlord: Optional[User] = None):
+    """Lưu trữ/Cập nhật một tài liệu Room vào Elasticsearch (async)."""
+    doc = room_to_elastic_doc(room, landlord)
+    try:
+        await ES_ASYNC_CLIENT.index(index=ROOM_INDEX_NAME, id=doc["id"], document=doc)
+    except Exception as e:
+        print(f"Lỗi khi index Room ID {doc['id']}: {e}")
+
+
+async def delete_room_doc_async(room_id: str):
+    """Xóa một tài liệu Room khỏi Elasticsearch (async)."""
+    try:
+        await ES_ASYNC_CLIENT.delete(index=ROOM_INDEX_NAME, id=room_id)
+    except Exception:
+        # Bỏ qua lỗi nếu document đã bị xóa trước đó (404 Not Found)
+        pass
+
+
+async def close_es_clients():
+    """Đóng connection pool khi tắt app"""
+    await ES_ASYNC_CLIENT.close()
+    ES_CLIENT.close()
+
+
+# File: elasticsearch_service.py (Bổ sung)
+
+REINDEX_CHUNK_SIZE = int(os.getenv("ES_REINDEX_CHUNK_SIZE", "500"))
+REINDEX_THREAD_COUNT = int(os.getenv("ES_REINDEX_THREAD_COUNT", "2"))
+REINDEX_CHECKPOINT_DIR = os.getenv("ES_REINDEX_CHECKPOINT_DIR", "/tmp")
+REINDEX_BULK_TIMEOUT = 60  # giây - 1 bulk request lớn hơn nhiều so với 1 lần search
+
+
+def _checkpoint_path(index_name: str) -> str:
+    return os.path.join(REINDEX_CHECKPOINT_DIR, f"es_reindex_{index_name}.checkpoint")
+
+
+def _load_checkpoint(index_name: str) -> Optional[str]:
+    try:
+        with open(_checkpoint_path(index_name)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def _save_checkpoint(index_name: str, last_room_id: Optional[str]):
+    path = _checkpoint_path(index_name)
+    if last_room_id is None:
+        if os.path.exists(path):
+            os.remove(path)
+        return
+    with open(path, "w") as f:
+        f.write(last_room_id)
+
+
+def _delete_stale_checkpoints(existing_indices: set):
+    """Xóa checkpoint của các index rooms_vN không còn tồn tại (build lỗi đã bị dọn / bị xóa tay)"""
+    prefix, suffix = f"es_reindex_{ROOM_INDEX_PREFIX}", ".checkpoint"
+    try:
+        names = os.listdir(REINDEX_CHECKPOINT_DIR)
+    except FileNotFoundError:
+        return
+    for name in names:
+        if name.startswith(prefix) and name.endswith(suffix):
+            index_name = name[len("es_reindex_"):-len(suffix)]
+            if index_name not in existing_indices:
+                _save_checkpoint(index_name, None)
+
+
+def _iter_room_actions(db: Session, index_name: str, chunk_size: int, after_id: Optional[str]):
+    """
+    Generator action cho bulk API.
+    yield_per => psycopg2 dùng server-side cursor, chỉ giữ 1 chunk phòng trong bộ nhớ.
+    Sắp xếp theo id để có thể resume bằng WHERE id > :checkpoint.
+    """
+    query = select(Room).options(selectinload(Room.landlord)).order_by(Room.id)
+    if after_id:
+        query = query.where(Room.id > UUID(after_id))
+    
+    for room in db.exec(query.execution_options(yield_per=chunk_size)):
+        doc = room_to_elastic_doc(room, room.landlord)
+        yield {
+            "_index": index_name,
             "_id": doc["id"],
             "_source": doc,
-        })
+        }
+
+
+def reindex_rooms(
+    db: Session,
+    index_name: str = ROOM_INDEX_NAME,
+    chunk_size: int = REINDEX_CHUNK_SIZE,
+    thread_count: int = REINDEX_THREAD_COUNT,
+    resume: bool = True,
+) -> tuple[int, int]:
+    """
+    Reindex toàn bộ phòng dạng streaming: bộ nhớ không tăng theo số phòng.
+    - chunk_size: số document mỗi bulk request (và số row mỗi lần fetch từ cursor)
+    - thread_count: số bulk request chạy song song (parallel_bulk)
+    - resume: tiếp tục từ checkpoint của lần chạy bị gián đoạn trước
+    Trả về (số thành công, số lỗi).
+    """
+    from elasticsearch.helpers import parallel_bulk
+    
+    after_id = _load_checkpoint(index_name) if resume else None
+    if after_id:
+        print(f"Tiếp tục reindex '{index_name}' từ room id > {after_id}")
+    
+    successes, errors = 0, 0
+    last_room_id = after_id
+    
+    # parallel_bulk trả kết quả theo đúng thứ tự action => checkpoint an toàn
+    for ok, item in parallel_bulk(
+        ES_CLIENT.options(request_timeout=REINDEX_BULK_TIMEOUT),
+        _iter_room_actions(db, index_name, chunk_size, after_id),
+        chunk_size=chunk_size,
+        thread_count=thread_count,
+        raise_on_error=False,
+    ):
+        if ok:
+            successes += 1
+        else:
+            errors += 1
+            print(f"Lỗi index document: {item}")
+        last_room_id = next(iter(item.values()))["_id"]
+        
+        # Lưu checkpoint + báo tiến độ sau mỗi chunk
+        if (successes + errors) % chunk_size == 0:
+            _save_checkpoint(index_name, last_room_id)
+            print(f"Reindex '{index_name}': đã xử lý {successes + errors} phòng ({errors} lỗi)")
+    
+    # Chạy xong => xóa checkpoint, lần sau reindex lại từ đầu
+    _save_checkpoint(index_name, None)
+    return successes, errors
+
+
+def _warm_index(index_name: str):
+    """Chạy vài query điển hình để nạp cache / segment trước khi nhận traffic thật"""
+    for query_string in ("phòng trọ", "sinh viên", "Hà Nội"):
+        body = build_search_body(query_string)
+        body["query"] = {
+            "bool": {
+                "must": [body["query"]],
+                "filter": [{"term": {"room_status": "available"}}]
+            }
+        }
+        ES_CLIENT.search(index=index_name, body=body)
+
+
+def blue_green_reindex(db: Session, delete_old: bool = True) -> str:
+    """
+    Reindex không downtime:
+    1. Tạo rooms_v(N+1) với ROOM_MAPPING hiện tại, tắt refresh + replicas=0 để bulk nhanh
+    2. Stream toàn bộ phòng vào index mới (search vẫn chạy trên index cũ qua alias)
+    3. Bật lại refresh/replicas, refresh, warm
+    4. Chuyển alias sang index mới trong 1 lệnh atomic
+    5. Index lại các phòng thay đổi trong lúc build (qua outbox)
+    Trả về tên index mới.
+    """
+    from models.models import RoomIndexOutbox
     
-    # Sử dụng helper bulk để gửi dữ liệu hàng loạt
-    from elasticsearch.helpers import bulk
+    started_at = datetime.utcnow()
+    versions = _room_index_versions()
+    new_index = f"{ROOM_INDEX_PREFIX}{(versions[-1] if versions else 0) + 1}"
+    
+    # 1. Tạo index mới, tối ưu cho bulk
+    body = copy.deepcopy(ROOM_MAPPING)
+    body["settings"].update({"number_of_replicas": 0, "refresh_interval": "-1"})
+    ES_CLIENT.indices.create(index=new_index, body=body)
+    print(f"--- BLUE/GREEN: build '{new_index}' ---")
+    
+    # 2. Stream dữ liệu. Index vừa tạo còn rỗng => không resume: checkpoint cùng tên (nếu có)
+    # là của 1 build lỗi trước đó đã bị xóa index, resume sẽ bỏ sót phòng
+    successes, errors = reindex_rooms(db, index_name=new_index, resume=False)
+    print(f"Build '{new_index}' xong. Thành công: {successes}, Lỗi: {errors}")
+    
+    # 3. Trả lại settings bình thường + warm
+    ES_CLIENT.indices.put_settings(
+        index=new_index,
+        settings={"index": {"refresh_interval": None, "number_of_replicas": ROOM_INDEX_REPLICAS}}
+    )
+    ES_CLIENT.indices.refresh(index=new_index)
+    ES_CLIENT.cluster.health(index=new_index, wait_for_status="yellow", timeout="60s")
+    _warm_index(new_index)
     
-    if actions:
-        try:
-            successes, errors = bulk(ES_CLIENT, actions)
-            print(f"Hoàn thành Indexing. Thành công: {successes}, Lỗi: {len(errors)}")
-        except Exception as e:
-            print(f"Lỗi Bulk Indexing: {e}")
+    # 4. Chuyển alias atomic (nhớ index alias đang trỏ tới để giữ lại khi dọn)
+    previous_indices = set()
+    if ES_CLIENT.indices.exists_alias(name=ROOM_INDEX_NAME):
+        previous_indices = set(ES_CLIENT.indices.get_alias(name=ROOM_INDEX_NAME))
+    actions = []
+    if _is_legacy_room_index():
+        # Bản cũ: "rooms" là index thật => xóa và thay bằng alias trong cùng 1 lệnh
+        actions.append({"remove_index": {"index": ROOM_INDEX_NAME}})
     else:
-        print("Không có phòng trọ nào để index.")
+        actions.append({"remove": {"index": f"{ROOM_INDEX_PREFIX}*", "alias": ROOM_INDEX_NAME, "must_exist": False}})
+    actions.append({"add": {"index": new_index, "alias": ROOM_INDEX_NAME}})
+    ES_CLIENT.indices.update_aliases(actions=actions)
+    print(f"Alias '{ROOM_INDEX_NAME}' -> '{new_index}'")
+    
+    # 5. Phòng thay đổi trong lúc build chỉ được ghi vào index cũ => đưa lại vào outbox
+    db.exec(
+        text(
+            f"INSERT INTO {RoomIndexOutbox.__tablename__} (room_id, op, attempts, next_attempt_at, created_at) "
+            f"SELECT DISTINCT room_id, 'index', 0, now() at time zone 'utc', now() at time zone 'utc' "
+            f"FROM {RoomIndexOutbox.__tablename__} WHERE created_at >= :started_at"
+        ).bindparams(started_at=started_at)
+    )
+    db.commit()
+    
+    # Xóa các version cũ, chỉ giữ index mới + index alias trỏ tới trước khi chuyển (để rollback);
+    # index dở dang của lần build lỗi trước cũng bị xóa
+    if delete_old:
+        keep = {new_index, *previous_indices}
+        for version in _room_index_versions():
+            index_name = f"{ROOM_INDEX_PREFIX}{version}"
+            if index_name not in keep:
+                ES_CLIENT.indices.delete(index=index_name, ignore_unavailable=True)
+    # Checkpoint của các build lỗi không bao giờ được resume (mỗi lần build 1 version mới) => dọn luôn
+    _delete_stale_checkpoints({f"{ROOM_INDEX_PREFIX}{version}" for version in _room_index_versions()})
+    
+    return new_index
+
+
+def initial_indexing(db: Session):
+    """
+    Đồng bộ hóa tất cả các phòng trọ hiện có từ PostgreSQL sang Elasticsearch.
+    Chỉ nên gọi một lần khi ứng dụng khởi động lần đầu hoặc sau khi setup.
+    """
+    print("--- BẮT ĐẦU ĐỒNG BỘ HÓA DỮ LIỆU BAN ĐẦU ---")
+    
+    # Index "rooms" bản cũ (chưa dùng alias) hoặc mapping đã đổi => build rooms_vN mới bằng blue/green
+    if _is_legacy_room_index() or _is_room_mapping_outdated():
+        blue_green_reindex(db)
+        print("--- KẾT THÚC ĐỒNG BỘ HÓA ---")
+        return
+    
+    try:
+        successes, errors = reindex_rooms(db)
+        print(f"Hoàn thành Indexing. Thành công: {successes}, Lỗi: {errors}")
+    except Exception as e:
+        print(f"Lỗi Bulk Indexing: {e}")
 
-    print("--- KẾT THÚC ĐỒNG BỘ HÓA ---")
\ No newline at end of file
+    print("--- KẾT THÚC ĐỒNG BỘ HÓA ---")
@@ -0,0 +1,259 @@
+# services/es_sync_worker.py
+"""
+Worker nền đồng bộ Room -> Elasticsearch qua bảng outbox (room_index_outbox).
+
+- API ghi phòng chỉ insert 1 dòng outbox cùng transaction (nhanh, không gọi ES).
+- Worker lấy theo lô (FOR UPDATE SKIP LOCKED => nhiều worker chạy song song an toàn),
+  gộp các thay đổi cùng phòng, đẩy sang ES bằng 1 bulk request.
+- Dùng thời điểm ghi outbox (micro giây) làm external version
+  => gửi lại / đến trễ không ghi đè bản mới hơn.
+- Lỗi => retry với exponential backoff.
+- Chủ trọ đổi email/số điện thoại => ghi outbox cho mọi phòng của họ trong cùng transaction
+  (doc ES có thông tin liên hệ của chủ trọ).
+- Bulk thành công (refresh=wait_for: đã tìm kiếm được) => xóa nhóm "es" của search cache
+  ở mọi process; xóa trước lúc đó thì request kế tiếp lại cache kết quả ES cũ.
+- Dòng đã xử lý được giữ OUTBOX_RETENTION rồi xóa theo lô.
+"""
+import asyncio
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Any, Optional
+
+from sqlmodel import select, func
+from sqlalchemy import event, inspect, text
+from sqlalchemy.orm import selectinload
+from sqlalchemy.ext.asyncio import AsyncSession
+from elasticsearch.helpers import async_streaming_bulk
+
+from core.database import async_session_maker
+from models.models import Room, RoomIndexOutbox, User
+from services.cache_invalidation import NOTIFY_SQL, invalidation_messages, publish_invalidation
+from services.elasticsearch_service import ES_ASYNC_CLIENT, ROOM_INDEX_NAME, room_to_elastic_doc
+
+OUTBOX_BATCH_SIZE = 500
+OUTBOX_POLL_INTERVAL = 1.0  # giây - nghỉ khi không còn việc
+OUTBOX_MAX_BACKOFF = 300  # giây
+OUTBOX_RETENTION = timedelta(days=int(os.getenv("OUTBOX_RETENTION_DAYS", "7")))
+OUTBOX_PURGE_BATCH_SIZE = 5000
+OUTBOX_PURGE_INTERVAL = 3600.0  # giây
+
+# Thông tin liên hệ của chủ trọ nằm trong doc ES của phòng
+LANDLORD_CONTACT_FIELDS = ("email", "phone")
+
+ENQUEUE_LANDLORD_ROOMS_SQL = text("""
+INSERT INTO room_index_outbox (room_id, op, attempts, next_attempt_at, created_at)
+SELECT id, 'index', 0, :now, :now FROM rooms WHERE landlord_id = :landlord_id
+RETURNING room_id
+""")
+
+# Xóa theo lô để không giữ lock / sinh WAL lớn trong 1 transaction
+PURGE_PROCESSED_SQL = text("""
+DELETE FROM room_index_outbox
+WHERE id IN (
+    SELECT id FROM room_index_outbox
+    WHERE processed_at IS NOT NULL AND processed_at < :cutoff
+    LIMIT :limit
+)
+""")
+
+# Số liệu cho /metrics/es-sync
+OUTBOX_METRICS: Dict[str, Any] = {
+    "processed": 0,
+    "failed": 0,
+    "last_run_at": None,
+    "purged": 0,
+}
+
+
+def room_outbox_entry(room_id, op: str) -> RoomIndexOutbox:
+    """Tạo dòng outbox - gọi session.add() trước commit của thao tác ghi phòng"""
+    return RoomIndexOutbox(room_id=room_id, op=op)
+
+
+@event.listens_for(User, "after_update")
+def _landlord_contact_updated(mapper, connection, user: User):
+    """Đổi email/số điện thoại => index lại các phòng của chủ trọ (cùng transaction với UPDATE users)"""
+    state = inspect(user)
+    if any(state.attrs[field].history.has_changes() for field in LANDLORD_CONTACT_FIELDS):
+        room_ids = connection.execute(
+            ENQUEUE_LANDLORD_ROOMS_SQL, {"now": datetime.utcnow(), "landlord_id": user.id}
+        ).scalars().all()
+        # Danh sách phòng đọc từ Postgres và chi tiết phòng cũng có thông tin liên hệ
+        for params in invalidation_messages(["sql"], detail_ids=room_ids):
+            connection.execute(NOTIFY_SQL, params)
+
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def _doc_version(entry: RoomIndexOutbox) -> int:
+    """
+    External version cho ES. Dùng micro giây thay vì id outbox để luôn lớn hơn
+    version nội bộ do bulk index toàn bộ (initial_indexing) tạo ra.
+    """
+    return int((entry.created_at - _EPOCH).total_seconds() * 1_000_000)
+
+
+def _backoff(attempts: int) -> timedelta:
+    return timedelta(seconds=min(2 ** attempts, OUTBOX_MAX_BACKOFF))
+
+
+async def process_outbox_batch(
+    session: AsyncSession,
+    batch_size: int = OUTBOX_BATCH_SIZE,
+    entry_ids: Optional[List[int]] = None
+) -> int:
+    """
+    Xử lý 1 lô outbox, trả về số dòng đã lấy ra.
+    entry_ids: chỉ xử lý ngay các dòng này (API ghi hàng loạt gọi sau commit) - cùng đường index
+    đầy đủ + external version như worker; dòng worker đang giữ (SKIP LOCKED) để worker xử lý.
+    """
+    now = datetime.utcnow()
+    conditions = [RoomIndexOutbox.processed_at.is_(None)]
+    if entry_ids is not None:
+        conditions.append(RoomIndexOutbox.id.in_(entry_ids))
+    else:
+        conditions.append(RoomIndexOutbox.next_attempt_at <= now)
+    result = await session.execute(
+        select(RoomIndexOutbox)
+        .where(*conditions)
+        .order_by(RoomIndexOutbox.id)
+        .limit(batch_size if entry_ids is None else len(entry_ids))
+        .with_for_update(skip_locked=True)
+    )
+    entries = list(result.scalars().all())
+    if not entries:
+        return 0
+
+    # Gộp theo phòng: chỉ thay đổi mới nhất (id lớn nhất) có hiệu lực
+    latest: Dict[str, RoomIndexOutbox] = {}
+    for entry in entries:
+        latest[str(entry.room_id)] = entry
+
+    # Load trạng thái hiện tại của các phòng trong 1 query:
+    # còn trong DB => index bản mới nhất, không còn => delete
+    room_result = await session.execute(
+        select(Room)
+        .options(selectinload(Room.landlord))
+        .where(Room.id.in_([entry.room_id for entry in latest.values()]))
+    )
+    rooms: Dict[str, Room] = {str(room.id): room for room in room_result.scalars().all()}
+
+    actions: List[Dict[str, Any]] = []
+    for room_id, entry in latest.items():
+        room = rooms.get(room_id)
+        if room is not None:
+            actions.append({
+                "_op_type": "index",
+                "_index": ROOM_INDEX_NAME,
+                "_id": room_id,
+                "version": _doc_version(entry),
+                "version_type": "external_gte",
+                "_source": room_to_elastic_doc(room, room.landlord),
+            })
+        else:
+            # Phòng đã bị xóa (op delete, hoặc bị xóa trước khi worker kịp index)
+            actions.append({
+                "_op_type": "delete",
+                "_index": ROOM_INDEX_NAME,
+                "_id": room_id,
+                "version": _doc_version(entry),
+                "version_type": "external_gte",
+            })
+
+    # Kết quả theo room_id: None = thành công, str = lỗi
+    outcome: Dict[str, Any] = {}
+    try:
+        async for ok, item in async_streaming_bulk(
+            ES_ASYNC_CLIENT,
+            actions,
+            raise_on_error=False,
+            raise_on_exception=False,
+            refresh="wait_for",
+        ):
+            op_result = next(iter(item.values()))
+            status_code = op_result.get("status")
+            # 404 khi delete: đã xóa rồi; 409: ES đã có version mới hơn => đều coi là xong
+            if ok or status_code in (404, 409):
+                outcome[op_result["_id"]] = None
+            else:
+                outcome[op_result["_id"]] = str(op_result.get("error"))
+    except Exception as e:
+        for room_id in latest:
+            outcome[room_id] = str(e)
+
+    for entry in entries:
+        error = outcome.get(str(entry.room_id), "Không có kết quả từ ES")
+        if error is None:
+            entry.processed_at = now
+            OUTBOX_METRICS["processed"] += 1
+        else:
+            entry.attempts += 1
+            entry.last_error = error[:1000]
+            entry.next_attempt_at = now + _backoff(entry.attempts)
+            OUTBOX_METRICS["failed"] += 1
+
+    if any(error is None for error in outcome.values()):
+        await publish_invalidation(session, ["es"])
+    await session.commit()
+    OUTBOX_METRICS["last_run_at"] = now.isoformat()
+    return len(entries)
+
+
+async def purge_processed_outbox(session: AsyncSession, before: Optional[datetime] = None) -> int:
+    """Xóa các dòng đã xử lý trước `before` (mặc định: quá OUTBOX_RETENTION), trả về số dòng đã xóa"""
+    cutoff = before or datetime.utcnow() - OUTBOX_RETENTION
+    purged = 0
+    while True:
+        result = await session.execute(PURGE_PROCESSED_SQL, {"cutoff": cutoff, "limit": OUTBOX_PURGE_BATCH_SIZE})
+        await session.commit()
+        purged += result.rowcount
+        if result.rowcount < OUTBOX_PURGE_BATCH_SIZE:
+            break
+    OUTBOX_METRICS["purged"] += purged
+    return purged
+
+
+async def get_outbox_lag(session: AsyncSession) -> Dict[str, Any]:
+    """Độ trễ đồng bộ: số dòng chờ + tuổi của dòng chờ lâu nhất"""
+    result = await session.execute(
+        select(func.count(), func.min(RoomIndexOutbox.created_at))
+        .where(RoomIndexOutbox.processed_at.is_(None))
+    )
+    pending, oldest = result.one()
+    lag_seconds = (datetime.utcnow() - oldest).total_seconds() if oldest else 0.0
+    return {
+        "pending": pending,
+        "lag_seconds": lag_seconds,
+        **OUTBOX_METRICS,
+    }
+
+
+async def run_outbox_worker(stop_event: asyncio.Event):
+    """Vòng lặp worker - chạy tới khi stop_event được set"""
+    last_purge = 0.0
+    while not stop_event.is_set():
+        if time.monotonic() - last_purge >= OUTBOX_PURGE_INTERVAL:
+            last_purge = time.monotonic()
+            try:
+                async with async_session_maker() as session:
+                    purged = await purge_processed_outbox(session)
+                if purged:
+                    print(f"🧹 Đã xóa {purged} dòng outbox đã xử lý")
+            except Exception as e:
+                print(f"🚨 Lỗi dọn outbox: {e}")
+
+        try:
+            async with async_session_maker() as session:
+                count = await process_outbox_batch(session)
+        except Exception as e:
+            print(f"🚨 Lỗi ES sync worker: {e}")
+            count = 0
+
+        # Còn việc => chạy tiếp ngay, hết việc => nghỉ
+        if count < OUTBOX_BATCH_SIZE:
+            try:
+                await asyncio.wait_for(stop_event.wait(), timeout=OUTBOX_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
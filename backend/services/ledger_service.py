@@ -0,0 +1,150 @@
+# services/ledger_service.py
+"""
+Sổ cái ví: mọi thay đổi Wallet.balance đi qua đây.
+
+- Mỗi lần ghi = 1 câu SQL: CTE UPDATE wallets SET balance = balance + tổng ... RETURNING
+  nối với INSERT INTO transactions => số dư và giao dịch luôn khớp, không có read-modify-write
+  từ ORM nên không mất cập nhật khi nhiều request cùng ghi 1 ví
+- Ghi nhiều giao dịch trong 1 round trip (mảng tham số + unnest), gộp theo ví
+- Khóa các ví theo thứ tự id trước khi cập nhật => các lô chạy song song không deadlock
+- Tiền dùng Decimal / NUMERIC(18, 2)
+"""
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from typing import Any, Dict, List, Optional
+from uuid import UUID, uuid4
+
+from sqlalchemy import Numeric, String, bindparam, text
+from sqlalchemy.exc import DataError
+from sqlalchemy.dialects.postgresql import ARRAY, UUID as PG_UUID
+from sqlalchemy.ext.asyncio import AsyncSession
+
+MONEY_QUANT = Decimal("0.01")
+# NUMERIC(18, 2): |giá trị| < 10^16
+MONEY_LIMIT = Decimal("1e16")
+
+# Không cho số dư âm: cả nhóm giao dịch của 1 ví trong lô bị từ chối nếu
+# số dư sau khi cộng tổng của nhóm < 0 (ví không tồn tại cũng bị từ chối)
+POST_TRANSACTIONS_SQL = text("""
+WITH postings AS (
+    SELECT *
+    FROM unnest(
+        CAST(:ids AS uuid[]),
+        CAST(:wallet_ids AS uuid[]),
+        CAST(:amounts AS numeric(18, 2)[]),
+        CAST(:types AS varchar[]),
+        CAST(:descriptions AS varchar[])
+    )
+         WITH ORDINALITY AS p(id, wallet_id, amount, type, description, ord)
+),
+totals AS (
+    SELECT wallet_id, sum(amount) AS total
+    FROM postings
+    GROUP BY wallet_id
+),
+locked AS (
+    SELECT w.id
+    FROM wallets w
+    JOIN totals t ON t.wallet_id = w.id
+    ORDER BY w.id
+    FOR UPDATE OF w
+),
+updated AS (
+    UPDATE wallets w
+    SET balance = w.balance + t.total
+    FROM totals t, locked l
+    WHERE w.id = t.wallet_id
+      AND l.id = w.id
+      AND w.balance + t.total >= 0
+    RETURNING w.id, w.balance
+)
+INSERT INTO transactions (id, wallet_id, amount, type, description, created_at, balance_after)
+SELECT p.id, p.wallet_id, p.amount, p.type, p.description, CAST(:created_at AS timestamp),
+       u.balance - t.total + sum(p.amount) OVER (PARTITION BY p.wallet_id ORDER BY p.ord)
+FROM postings p
+JOIN updated u ON u.id = p.wallet_id
+JOIN totals t ON t.wallet_id = p.wallet_id
+RETURNING id, wallet_id, amount, balance_after
+""").bindparams(
+    bindparam("ids", type_=ARRAY(PG_UUID(as_uuid=True))),
+    bindparam("wallet_ids", type_=ARRAY(PG_UUID(as_uuid=True))),
+    bindparam("amounts", type_=ARRAY(Numeric(18, 2))),
+    bindparam("types", type_=ARRAY(String)),
+    bindparam("descriptions", type_=ARRAY(String)),
+)
+
+
+class LedgerError(ValueError):
+    pass
+
+
+def to_money(value: Any) -> Decimal:
+    """Chuẩn hóa số tiền về Decimal 2 chữ số thập phân (không nhận float để tránh sai số)"""
+    # bool là lớp con của int (True => 1.00); Decimal nhận cả tuple/list dạng (dấu, chữ số, mũ)
+    # nên JSON [0, [1, 0, 0], 0] thành 100 => chỉ nhận str / int / float / Decimal
+    if isinstance(value, bool) or not isinstance(value, (str, int, float, Decimal)):
+        raise LedgerError(f"Số tiền không hợp lệ: {value!r}")
+    if isinstance(value, float):
+        value = repr(value)
+    try:
+        amount = Decimal(value).quantize(MONEY_QUANT)
+    except (InvalidOperation, TypeError):
+        raise LedgerError(f"Số tiền không hợp lệ: {value!r}")
+    if not amount.is_finite() or amount == 0 or abs(amount) >= MONEY_LIMIT:
+        raise LedgerError(f"Số tiền không hợp lệ: {value!r}")
+    return amount
+
+
+async def post_transactions(session: AsyncSession, postings: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Ghi nhiều giao dịch trong 1 câu lệnh (1 round trip) và commit.
+    postings: [{"wallet_id", "amount" (dương = nạp, âm = trừ), "type", "description"}]
+
+    Trả về {"posted": [{"id", "wallet_id", "amount", "balance_after"}], "rejected": [vị trí trong postings]}
+    LedgerError: số tiền không hợp lệ hoặc số dư vượt giới hạn (đã rollback)
+    """
+    if not postings:
+        return {"posted": [], "rejected": []}
+
+    ids = [uuid4() for _ in postings]
+    params = {
+        "ids": ids,
+        "wallet_ids": [UUID(str(posting["wallet_id"])) for posting in postings],
+        "amounts": [to_money(posting["amount"]) for posting in postings],
+        "types": [posting["type"] for posting in postings],
+        "descriptions": [posting.get("description") or "" for posting in postings],
+        "created_at": datetime.utcnow(),
+    }
+    try:
+        result = await session.execute(POST_TRANSACTIONS_SQL, params)
+    except DataError:
+        # Tổng của lô hoặc số dư sau khi cộng vượt NUMERIC(18, 2)
+        await session.rollback()
+        raise LedgerError("Số tiền vượt giới hạn của ví")
+    rows = result.all()
+    await session.commit()
+
+    posted_ids = {row.id for row in rows}
+    return {
+        "posted": [
+            {"id": row.id, "wallet_id": row.wallet_id, "amount": row.amount, "balance_after": row.balance_after}
+            for row in rows
+        ],
+        "rejected": [i for i, posting_id in enumerate(ids) if posting_id not in posted_ids],
+    }
+
+
+async def post_transaction(
+    session: AsyncSession,
+    wallet_id: UUID,
+    amount: Any,
+    transaction_type: str,
+    description: Optional[str] = None
+) -> Dict[str, Any]:
+    """Ghi 1 giao dịch, trả về {"id", "wallet_id", "amount", "balance_after"}"""
+    result = await post_transactions(
+        session, [{"wallet_id": wallet_id, "amount": amount, "type": transaction_type, "description": description}]
+    )
+    if not result["posted"]:
+        raise LedgerError("Số dư không đủ hoặc ví không tồn tại")
+    return result["posted"][0]
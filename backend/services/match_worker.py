@@ -0,0 +1,270 @@
+# services/match_worker.py
+"""
+Re-match tăng dần khi UserProfile thay đổi.
+
+- Listener ORM ghi 1 dòng vào profile_rematch_outbox cùng transaction với thao tác ghi profile
+  (rollback => không có dòng), hàng đợi nằm trong DB nên restart không mất
+- Worker nền đọc hàng đợi (FOR UPDATE SKIP LOCKED), gộp theo user và gọi rematch_profile
+  => thay đổi được phản ánh sau vài giây, chi phí theo 1 block
+- Chỉ 1 process xử lý hàng đợi tại 1 thời điểm (advisory lock giữ suốt thời gian làm leader):
+  cache ma trận block (MATCH_BLOCK_CACHE) chỉ được cập nhật ở process đó nên luôn khớp DB;
+  process mới giành được lock bắt đầu với cache rỗng
+- Lỗi => retry với exponential backoff; dòng đã xử lý được giữ MATCH_REMATCH_RETENTION rồi xóa
+
+Sweeper hết hạn: chuyển các gợi ý pending quá expires_at sang "expired" theo lô
+(FOR UPDATE SKIP LOCKED => nhiều worker chạy song song không tranh nhau cùng dòng).
+"""
+import asyncio
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+from uuid import UUID
+
+from sqlmodel import select, func
+from sqlalchemy import event, inspect, insert, text, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.database import async_engine, async_session_maker
+from models.models import Match, ProfileRematchOutbox, UserProfile
+from services.matching_service import (
+    MATCH_BLOCK_CACHE,
+    MATCH_EXPIRED_STATUS,
+    MATCH_PENDING_STATUS,
+    rematch_profile,
+)
+
+MATCH_REMATCH_INTERVAL = 2.0  # giây
+MATCH_REMATCH_BATCH_SIZE = 200
+MATCH_REMATCH_MAX_BACKOFF = 300  # giây
+MATCH_REMATCH_LOCK_ID = 72_011_003
+MATCH_REMATCH_RETENTION = timedelta(days=int(os.getenv("MATCH_REMATCH_RETENTION_DAYS", "7")))
+MATCH_REMATCH_PURGE_INTERVAL = 3600.0  # giây
+MATCH_EXPIRY_BATCH_SIZE = 1000
+MATCH_EXPIRY_MAX_BATCHES = 100  # mỗi lượt quét tối đa 100 lô, phần còn lại để lượt sau
+MATCH_EXPIRY_INTERVAL = 60.0  # giây
+
+# Các cột của UserProfile ảnh hưởng tới kết quả ghép
+MATCH_FIELDS = ("habits", "school", "gender", "status", "is_active", "max_matches")
+
+PURGE_PROCESSED_SQL = text("""
+DELETE FROM profile_rematch_outbox
+WHERE processed_at IS NOT NULL AND processed_at < :cutoff
+""")
+
+# Số liệu cho /metrics/matching
+MATCH_METRICS: Dict[str, Any] = {
+    "rematched": 0,
+    "failed": 0,
+    "last_run_at": None,
+    "leader": False,
+    "expired": 0,
+    "last_sweep_at": None,
+    "last_sweep_expired": 0,
+}
+
+
+def _enqueue_rematch(connection, user_id: UUID):
+    """Ghi hàng đợi bằng connection của flush hiện tại => cùng transaction với thay đổi profile"""
+    connection.execute(insert(ProfileRematchOutbox.__table__).values(
+        user_id=user_id, attempts=0, next_attempt_at=datetime.utcnow(), created_at=datetime.utcnow()
+    ))
+
+
+@event.listens_for(UserProfile, "after_insert")
+def _profile_inserted(mapper, connection, profile: UserProfile):
+    _enqueue_rematch(connection, profile.user_id)
+
+
+@event.listens_for(UserProfile, "after_update")
+def _profile_updated(mapper, connection, profile: UserProfile):
+    state = inspect(profile)
+    if any(state.attrs[field].history.has_changes() for field in MATCH_FIELDS):
+        _enqueue_rematch(connection, profile.user_id)
+
+
+@event.listens_for(UserProfile, "after_delete")
+def _profile_deleted(mapper, connection, profile: UserProfile):
+    _enqueue_rematch(connection, profile.user_id)
+
+
+def _backoff(attempts: int) -> timedelta:
+    return timedelta(seconds=min(2 ** attempts, MATCH_REMATCH_MAX_BACKOFF))
+
+
+async def process_rematch_batch(session: AsyncSession, batch_size: int = MATCH_REMATCH_BATCH_SIZE) -> int:
+    """
+    Xử lý 1 lô hàng đợi, trả về số dòng đã lấy ra.
+    Nhiều dòng cùng user chỉ re-match 1 lần (rematch_profile đọc profile mới nhất).
+    """
+    now = datetime.utcnow()
+    result = await session.execute(
+        select(ProfileRematchOutbox)
+        .where(ProfileRematchOutbox.processed_at.is_(None), ProfileRematchOutbox.next_attempt_at <= now)
+        .order_by(ProfileRematchOutbox.id)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )
+    entries = list(result.scalars().all())
+    if not entries:
+        return 0
+
+    by_user: Dict[UUID, List[ProfileRematchOutbox]] = {}
+    for entry in entries:
+        by_user.setdefault(entry.user_id, []).append(entry)
+
+    # rematch_profile dùng session riêng (tự commit) => session này giữ lock các dòng hàng đợi
+    for user_id, user_entries in by_user.items():
+        try:
+            async with async_session_maker() as rematch_session:
+                await rematch_profile(rematch_session, user_id)
+            error = None
+            MATCH_METRICS["rematched"] += 1
+        except Exception as e:
+            print(f"🚨 Lỗi re-match user {user_id}: {e}")
+            error = str(e)
+            MATCH_METRICS["failed"] += 1
+
+        for entry in user_entries:
+            if error is None:
+                entry.processed_at = datetime.utcnow()
+            else:
+                entry.attempts += 1
+                entry.last_error = error[:1000]
+                entry.next_attempt_at = datetime.utcnow() + _backoff(entry.attempts)
+
+    await session.commit()
+    MATCH_METRICS["last_run_at"] = now.isoformat()
+    return len(entries)
+
+
+async def purge_processed_rematches(session: AsyncSession) -> int:
+    result = await session.execute(PURGE_PROCESSED_SQL, {"cutoff": datetime.utcnow() - MATCH_REMATCH_RETENTION})
+    await session.commit()
+    return result.rowcount
+
+
+async def run_rematch_worker(stop_event: asyncio.Event):
+    """
+    Vòng lặp worker - chạy tới khi stop_event được set.
+    Process không giữ được advisory lock thì chờ và thử lại (process khác đang là leader).
+    """
+    while not stop_event.is_set():
+        try:
+            async with async_engine.connect() as lock_conn:
+                locked = (await lock_conn.execute(
+                    text("SELECT pg_try_advisory_lock(:lock_id)"), {"lock_id": MATCH_REMATCH_LOCK_ID}
+                )).scalar()
+                await lock_conn.commit()
+                if locked:
+                    try:
+                        await _lead_rematch(stop_event, lock_conn)
+                    finally:
+                        MATCH_METRICS["leader"] = False
+                        await lock_conn.execute(
+                            text("SELECT pg_advisory_unlock(:lock_id)"), {"lock_id": MATCH_REMATCH_LOCK_ID}
+                        )
+                        await lock_conn.commit()
+        except Exception as e:
+            print(f"🚨 Lỗi re-match worker: {e}")
+        try:
+            await asyncio.wait_for(stop_event.wait(), timeout=MATCH_REMATCH_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def _lead_rematch(stop_event: asyncio.Event, lock_conn):
+    # Leader trước có thể đã đổi các block => không dùng lại cache cũ của process này
+    MATCH_BLOCK_CACHE.clear()
+    MATCH_METRICS["leader"] = True
+    last_purge = 0.0
+    while not stop_event.is_set():
+        # Connection giữ lock bị đứt => lock đã mất, dừng làm leader
+        await lock_conn.execute(text("SELECT 1"))
+        await lock_conn.commit()
+
+        if time.monotonic() - last_purge >= MATCH_REMATCH_PURGE_INTERVAL:
+            last_purge = time.monotonic()
+            async with async_session_maker() as session:
+                await purge_processed_rematches(session)
+
+        async with async_session_maker() as session:
+            count = await process_rematch_batch(session)
+        if count < MATCH_REMATCH_BATCH_SIZE:
+            try:
+                await asyncio.wait_for(stop_event.wait(), timeout=MATCH_REMATCH_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+
+async def expire_pending_matches_batch(session: AsyncSession, batch_size: int = MATCH_EXPIRY_BATCH_SIZE) -> int:
+    """
+    1 lô: UPDATE matches SET status = 'expired'
+          WHERE id IN (SELECT id ... WHERE status = 'pending' AND expires_at < now
+                       ORDER BY expires_at LIMIT n FOR UPDATE SKIP LOCKED)
+    Trả về số dòng đã chuyển trạng thái.
+    """
+    stale_ids = (
+        select(Match.id)
+        .where(Match.status == MATCH_PENDING_STATUS, Match.expires_at < datetime.utcnow())
+        .order_by(Match.expires_at)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+    result = await session.execute(
+        update(Match)
+        .where(Match.id.in_(stale_ids))
+        .values(status=MATCH_EXPIRED_STATUS)
+        .execution_options(synchronize_session=False)
+    )
+    await session.commit()
+    return result.rowcount
+
+
+async def sweep_expired_matches(
+    batch_size: int = MATCH_EXPIRY_BATCH_SIZE,
+    max_batches: int = MATCH_EXPIRY_MAX_BATCHES
+) -> int:
+    """1 lượt quét: chạy từng lô (mỗi lô 1 transaction ngắn) tới khi hết, trả về tổng số dòng"""
+    total = 0
+    async with async_session_maker() as session:
+        for _ in range(max_batches):
+            count = await expire_pending_matches_batch(session, batch_size)
+            total += count
+            if count < batch_size:
+                break
+
+    MATCH_METRICS["expired"] += total
+    MATCH_METRICS["last_sweep_expired"] = total
+    MATCH_METRICS["last_sweep_at"] = datetime.utcnow().isoformat()
+    if total:
+        print(f"🧹 Đã chuyển {total} gợi ý ghép phòng sang expired")
+    return total
+
+
+async def run_match_expiry_sweeper(stop_event: asyncio.Event):
+    """Vòng lặp sweeper - chạy tới khi stop_event được set"""
+    while not stop_event.is_set():
+        try:
+            await sweep_expired_matches()
+        except Exception as e:
+            print(f"🚨 Lỗi sweeper hết hạn match: {e}")
+        try:
+            await asyncio.wait_for(stop_event.wait(), timeout=MATCH_EXPIRY_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def get_matching_metrics(session: AsyncSession) -> Dict[str, Any]:
+    result = await session.execute(
+        select(func.count(), func.min(ProfileRematchOutbox.created_at))
+        .where(ProfileRematchOutbox.processed_at.is_(None))
+    )
+    queued, oldest = result.one()
+    return {
+        **MATCH_METRICS,
+        "queued": queued,
+        "lag_seconds": (datetime.utcnow() - oldest).total_seconds() if oldest else 0.0,
+        "block_cache": MATCH_BLOCK_CACHE.metrics(),
+    }
@@ -0,0 +1,637 @@
+# services/matching_service.py
+"""
+Ghép bạn cùng phòng dựa trên UserProfile.habits.
+
+- Mỗi profile được mã hóa thành vector số cố định (HABIT_FEATURES), mỗi chiều trong [-1, 1]
+  nhân trọng số, thiếu thông tin = 0 (trung lập)
+- Chỉ so sánh trong cùng block (trường, giới tính, trạng thái) => bỏ phần lớn các cặp
+- Điểm của cả block tính bằng nhân ma trận NumPy theo từng lô dòng (giới hạn bộ nhớ),
+  top-k mỗi user lấy bằng argpartition
+- Ghi vào matches bằng INSERT nhiều dòng, mỗi user tối đa max_matches gợi ý
+- Re-match tăng dần (rematch_profile): 1 profile đổi => chỉ tính lại vector đó với ma trận
+  của block (cache trong MATCH_BLOCK_CACHE), chỉ sửa các dòng matches liên quan tới user đó
+  (và tính lại danh sách của những người có thể đổi top-k vì user đó), kết quả giống chạy lại toàn bộ
+
+Bảng matches lưu gợi ý theo chiều: user1 = người nhận gợi ý, user2 = người được gợi ý.
+Chỉ các dòng "pending" do pipeline tạo ra bị thay thế; dòng đã accepted / rejected / ...
+giữ nguyên và cặp đó không được gợi ý lại. Dòng "expired" (hết hạn, services/match_worker.py)
+được gợi ý lại nếu cặp đó vẫn lọt top-k.
+"""
+import asyncio
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Set, Tuple
+from uuid import UUID, uuid4
+
+import numpy as np
+from sqlmodel import select
+from sqlalchemy import delete, update, any_, bindparam
+from sqlalchemy.dialects.postgresql import ARRAY, UUID as PG_UUID, insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.models import Match, UserProfile, normalize_location
+
+MATCH_PENDING_STATUS = "pending"
+MATCH_ACCEPTED_STATUS = "accepted"
+MATCH_EXPIRED_STATUS = "expired"
+MATCH_TTL_DAYS = int(os.getenv("MATCH_TTL_DAYS", "7"))
+MATCH_INSERT_CHUNK_SIZE = 1000
+# Số ô tối đa của ma trận điểm tính trong 1 lô (float32: 16M ô ~ 64MB)
+MATCH_SCORE_CELLS = int(os.getenv("MATCH_SCORE_CELLS", str(16 * 1024 * 1024)))
+# Ma trận block cache lại để re-match tăng dần; hết hạn => đọc lại block từ DB
+# (giới hạn độ lệch với thay đổi do worker khác ghi)
+MATCH_BLOCK_CACHE_TTL = float(os.getenv("MATCH_BLOCK_CACHE_TTL", "600"))  # giây
+
+# (key trong habits, cách mã hóa, trọng số)
+# - dict: giá trị rời rạc -> số
+# - "bool": True -> 1, False -> -1
+# - (min, max): thang điểm, co giãn về [-1, 1]
+HABIT_FEATURES: List[Tuple[str, Any, float]] = [
+    ("sleep_time", {"early": -1.0, "normal": 0.0, "late": 1.0}, 1.5),
+    ("cleanliness", (1, 5), 2.0),
+    ("noise_tolerance", (1, 5), 1.0),
+    ("guests", {"rarely": -1.0, "sometimes": 0.0, "often": 1.0}, 1.0),
+    ("smoking", "bool", 2.0),
+    ("pets", "bool", 1.0),
+    ("cooking", "bool", 0.5),
+    ("study_at_home", "bool", 0.5),
+]
+HABIT_DIM = len(HABIT_FEATURES)
+HABIT_WEIGHTS = np.array([weight for _, _, weight in HABIT_FEATURES], dtype=np.float32)
+# Khoảng cách bình phương lớn nhất giữa 2 vector (mỗi chiều lệch tối đa 2 * trọng số)
+MAX_SQ_DISTANCE = float(np.sum((2 * HABIT_WEIGHTS) ** 2))
+
+TRUTHY = {"true", "yes", "1", "co", "có"}
+
+
+def _encode_value(value: Any, encoding: Any) -> float:
+    if value is None:
+        return 0.0
+    if encoding == "bool":
+        if isinstance(value, str):
+            value = value.strip().lower() in TRUTHY
+        return 1.0 if value else -1.0
+    if isinstance(encoding, dict):
+        return encoding.get(str(value).strip().lower(), 0.0)
+
+    low, high = encoding
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return 0.0
+    number = min(max(number, low), high)
+    return 2.0 * (number - low) / (high - low) - 1.0
+
+
+def encode_habits(habits: Optional[Dict[str, Any]]) -> np.ndarray:
+    """habits (JSONB) -> vector float32 độ dài HABIT_DIM, đã nhân trọng số"""
+    habits = habits or {}
+    vector = np.fromiter(
+        (_encode_value(habits.get(key), encoding) for key, encoding, _ in HABIT_FEATURES),
+        dtype=np.float32,
+        count=HABIT_DIM,
+    )
+    return vector * HABIT_WEIGHTS
+
+
+def encode_profiles(habits_list: List[Optional[Dict[str, Any]]]) -> np.ndarray:
+    matrix = np.zeros((len(habits_list), HABIT_DIM), dtype=np.float32)
+    for i, habits in enumerate(habits_list):
+        matrix[i] = encode_habits(habits)
+    return matrix
+
+
+def block_key(school: Optional[str], gender: Optional[str], status: Optional[str]) -> Tuple[str, str, str]:
+    """Chỉ ghép các profile cùng trường, cùng giới tính, cùng trạng thái"""
+    return (normalize_location(school) or "", gender or "", status or "")
+
+
+def score_rows(rows: np.ndarray, matrix: np.ndarray, sq_norms: np.ndarray) -> np.ndarray:
+    """
+    Điểm [0, 1] giữa từng dòng của `rows` và toàn bộ `matrix`:
+    1 - |a - b|² / MAX_SQ_DISTANCE, với |a - b|² = |a|² + |b|² - 2 a·b (1 phép nhân ma trận)
+    """
+    sq_distance = (rows * rows).sum(axis=1)[:, None] + sq_norms[None, :] - 2.0 * (rows @ matrix.T)
+    return 1.0 - np.clip(sq_distance, 0.0, None) / MAX_SQ_DISTANCE
+
+
+class MatchBlock:
+    """Các profile cùng 1 block: user_id, ma trận vector, max_matches"""
+
+    def __init__(self, key: Tuple[str, str, str], user_ids: List[UUID], matrix: np.ndarray, max_matches: List[int]):
+        self.key = key
+        self.user_ids = list(user_ids)
+        self.matrix = matrix
+        self.sq_norms = (matrix * matrix).sum(axis=1)
+        self.max_matches = np.asarray(max_matches, dtype=np.int64)
+        self.positions = {user_id: i for i, user_id in enumerate(self.user_ids)}
+
+    def __len__(self) -> int:
+        return len(self.user_ids)
+
+    def upsert(self, user_id: UUID, vector: np.ndarray, max_matches: int) -> int:
+        """Thêm / thay vector của 1 user, trả về vị trí dòng"""
+        i = self.positions.get(user_id)
+        if i is None:
+            i = len(self.user_ids)
+            self.user_ids.append(user_id)
+            self.positions[user_id] = i
+            self.matrix = np.vstack([self.matrix, vector[None, :]])
+            self.sq_norms = np.append(self.sq_norms, np.float32(vector @ vector))
+            self.max_matches = np.append(self.max_matches, max_matches)
+        else:
+            self.matrix[i] = vector
+            self.sq_norms[i] = vector @ vector
+            self.max_matches[i] = max_matches
+        return i
+
+    def remove(self, user_id: UUID):
+        """Bỏ 1 user khỏi block (đưa dòng cuối vào chỗ trống)"""
+        i = self.positions.pop(user_id, None)
+        if i is None:
+            return
+        last = len(self.user_ids) - 1
+        if i != last:
+            moved = self.user_ids[last]
+            self.user_ids[i] = moved
+            self.positions[moved] = i
+            self.matrix[i] = self.matrix[last]
+            self.sq_norms[i] = self.sq_norms[last]
+            self.max_matches[i] = self.max_matches[last]
+        self.user_ids.pop()
+        self.matrix = self.matrix[:last]
+        self.sq_norms = self.sq_norms[:last]
+        self.max_matches = self.max_matches[:last]
+
+
+class MatchBlockCache:
+    """Cache MatchBlock theo block key (trong process) + user -> block hiện tại"""
+
+    def __init__(self, ttl: float = MATCH_BLOCK_CACHE_TTL):
+        self.ttl = ttl
+        self._blocks: Dict[Tuple[str, str, str], Tuple[float, MatchBlock]] = {}
+        self._user_blocks: Dict[UUID, Tuple[str, str, str]] = {}
+        self.stats = {"hits": 0, "loads": 0}
+
+    def get(self, key: Tuple[str, str, str]) -> Optional[MatchBlock]:
+        entry = self._blocks.get(key)
+        if entry is None:
+            return None
+        expires_at, block = entry
+        if expires_at <= time.monotonic():
+            self.discard(key)
+            return None
+        return block
+
+    def put(self, block: MatchBlock):
+        self.discard(block.key)
+        self._blocks[block.key] = (time.monotonic() + self.ttl, block)
+        for user_id in block.user_ids:
+            self._user_blocks[user_id] = block.key
+
+    def discard(self, key: Tuple[str, str, str]):
+        entry = self._blocks.pop(key, None)
+        if entry is not None:
+            for user_id in entry[1].user_ids:
+                if self._user_blocks.get(user_id) == key:
+                    del self._user_blocks[user_id]
+
+    def clear(self):
+        self._blocks.clear()
+        self._user_blocks.clear()
+
+    def move_user(self, user_id: UUID, key: Optional[Tuple[str, str, str]]):
+        """Ghi nhận user đã chuyển sang block `key` (None = không còn active)"""
+        old_key = self._user_blocks.pop(user_id, None)
+        if old_key is not None and old_key != key:
+            old = self._blocks.get(old_key)
+            if old is not None:
+                old[1].remove(user_id)
+        if key is not None:
+            self._user_blocks[user_id] = key
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "blocks": len(self._blocks),
+            "profiles": len(self._user_blocks),
+            "ttl_seconds": self.ttl,
+        }
+
+
+MATCH_BLOCK_CACHE = MatchBlockCache()
+
+
+def top_k_for_block(
+    block: MatchBlock,
+    budgets: np.ndarray,
+    excluded: Dict[int, Set[int]],
+    rows: Optional[List[int]] = None
+) -> List[Tuple[int, int, float]]:
+    """
+    Top-k ứng viên cho mỗi user trong block, trả về [(dòng user, dòng ứng viên, điểm)].
+    budgets[i]: số gợi ý tối đa của user i; excluded[i]: các dòng không được gợi ý cho user i.
+    rows: chỉ tính cho các dòng này (mặc định: cả block).
+    """
+    size = len(block)
+    rows = np.arange(size) if rows is None else np.asarray(rows, dtype=np.int64)
+    k_max = int(min(budgets[rows].max(initial=0), size - 1))
+    if k_max <= 0:
+        return []
+
+    pairs: List[Tuple[int, int, float]] = []
+    batch_rows = max(1, MATCH_SCORE_CELLS // size)
+    for start in range(0, len(rows), batch_rows):
+        batch = rows[start:start + batch_rows]
+        scores = score_rows(block.matrix[batch], block.matrix, block.sq_norms)
+
+        local = np.arange(len(batch))
+        scores[local, batch] = -np.inf  # không tự ghép với chính mình
+        for row, i in enumerate(batch.tolist()):
+            columns = excluded.get(i)
+            if columns:
+                scores[row, list(columns)] = -np.inf
+
+        top = np.argpartition(-scores, k_max - 1, axis=1)[:, :k_max]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+
+        keep = (np.arange(k_max)[None, :] < budgets[batch, None]) & np.isfinite(top_scores)
+        kept_rows, kept_columns = np.nonzero(keep)
+        pairs.extend(zip(
+            batch[kept_rows].tolist(),
+            top[kept_rows, kept_columns].tolist(),
+            top_scores[kept_rows, kept_columns].tolist(),
+        ))
+    return pairs
+
+
+PROFILE_MATCH_COLUMNS = (
+    UserProfile.user_id,
+    UserProfile.school,
+    UserProfile.gender,
+    UserProfile.status,
+    UserProfile.max_matches,
+    UserProfile.habits,
+)
+
+
+async def load_match_blocks(session: AsyncSession, key: Optional[Tuple[str, str, str]] = None) -> Dict[Tuple[str, str, str], MatchBlock]:
+    """
+    Đọc các profile đang active (chỉ các cột cần), gom theo block và mã hóa.
+    key: chỉ đọc 1 block (dùng index school_norm, gender, status)
+    """
+    query = select(*PROFILE_MATCH_COLUMNS).where(UserProfile.is_active == True)
+    if key is not None:
+        query = query.where(
+            UserProfile.school_norm == key[0],
+            UserProfile.gender == key[1],
+            UserProfile.status == key[2]
+        )
+    result = await session.execute(query)
+
+    grouped: Dict[Tuple[str, str, str], List[Any]] = {}
+    for row in result.all():
+        grouped.setdefault(block_key(row.school, row.gender, row.status), []).append(row)
+
+    return {
+        key: MatchBlock(
+            key,
+            [row.user_id for row in rows],
+            encode_profiles([row.habits for row in rows]),
+            [row.max_matches for row in rows],
+        )
+        for key, rows in grouped.items()
+    }
+
+
+async def load_closed_matches(
+    session: AsyncSession,
+    user_ids: Optional[List[UUID]] = None
+) -> Tuple[Dict[UUID, Set[UUID]], Dict[UUID, int]]:
+    """
+    Với mỗi user: những người đã có match khác "pending" / "expired" (không gợi ý lại),
+    và số match accepted (được trừ vào max_matches).
+    user_ids: chỉ đọc các match liên quan tới những user này (mặc định: tất cả).
+    """
+    query = select(Match.user1_id, Match.user2_id, Match.status).where(
+        Match.status.not_in([MATCH_PENDING_STATUS, MATCH_EXPIRED_STATUS])
+    )
+    if user_ids is not None:
+        ids = bindparam("user_ids", user_ids, type_=ARRAY(PG_UUID(as_uuid=True)))
+        query = query.where((Match.user1_id == any_(ids)) | (Match.user2_id == any_(ids)))
+    result = await session.execute(query)
+
+    closed: Dict[UUID, Set[UUID]] = {}
+    accepted: Dict[UUID, int] = {}
+    for user1_id, user2_id, match_status in result.all():
+        closed.setdefault(user1_id, set()).add(user2_id)
+        closed.setdefault(user2_id, set()).add(user1_id)
+        if match_status == MATCH_ACCEPTED_STATUS:
+            accepted[user1_id] = accepted.get(user1_id, 0) + 1
+            accepted[user2_id] = accepted.get(user2_id, 0) + 1
+    return closed, accepted
+
+
+def block_constraints(
+    block: MatchBlock,
+    closed: Dict[UUID, Set[UUID]],
+    accepted: Dict[UUID, int]
+) -> Tuple[np.ndarray, Dict[int, Set[int]]]:
+    """budgets + excluded của block cho top_k_for_block"""
+    budgets = block.max_matches - np.array(
+        [accepted.get(user_id, 0) for user_id in block.user_ids], dtype=np.int64
+    )
+    excluded: Dict[int, Set[int]] = {}
+    for i, user_id in enumerate(block.user_ids):
+        columns = {block.positions[other] for other in closed.get(user_id, ()) if other in block.positions}
+        if columns:
+            excluded[i] = columns
+    return np.clip(budgets, 0, None), excluded
+
+
+def match_rows(block: MatchBlock, pairs: List[Tuple[int, int, float]]) -> List[Dict[str, Any]]:
+    now = datetime.utcnow()
+    expires_at = now + timedelta(days=MATCH_TTL_DAYS)
+    return [
+        {
+            "id": uuid4(),
+            "user1_id": block.user_ids[i],
+            "user2_id": block.user_ids[j],
+            "match_score": score,
+            "status": MATCH_PENDING_STATUS,
+            "expires_at": expires_at,
+            "created_at": now,
+        }
+        for i, j, score in pairs
+    ]
+
+
+async def insert_match_rows(session: AsyncSession, rows: List[Dict[str, Any]]):
+    """
+    INSERT ... VALUES (...), (...), ... theo chunk (giới hạn số tham số của Postgres).
+    Cặp đã có dòng "expired" => dùng lại dòng đó làm gợi ý pending mới.
+    """
+    for start in range(0, len(rows), MATCH_INSERT_CHUNK_SIZE):
+        statement = pg_insert(Match).values(rows[start:start + MATCH_INSERT_CHUNK_SIZE])
+        await session.execute(
+            statement.on_conflict_do_update(
+                index_elements=["user1_id", "user2_id"],
+                set_={
+                    "match_score": statement.excluded.match_score,
+                    "status": statement.excluded.status,
+                    "expires_at": statement.excluded.expires_at,
+                    "created_at": statement.excluded.created_at,
+                },
+                where=Match.status == MATCH_EXPIRED_STATUS,
+            )
+        )
+
+
+async def replace_block_matches(session: AsyncSession, block: MatchBlock, rows: List[Dict[str, Any]]):
+    """Thay toàn bộ gợi ý pending của block trong 1 transaction"""
+    await session.execute(
+        delete(Match)
+        .where(
+            Match.user1_id == any_(bindparam("user_ids", block.user_ids, type_=ARRAY(PG_UUID(as_uuid=True)))),
+            Match.status == MATCH_PENDING_STATUS
+        )
+        .execution_options(synchronize_session=False)
+    )
+    await insert_match_rows(session, rows)
+    await session.commit()
+
+
+async def run_full_matching(session: AsyncSession) -> Dict[str, Any]:
+    """Tính lại gợi ý cho toàn bộ profile đang active, trả về thống kê"""
+    started = datetime.utcnow()
+    blocks = await load_match_blocks(session)
+    closed, accepted = await load_closed_matches(session)
+
+    profiles = 0
+    matches = 0
+    for block in blocks.values():
+        profiles += len(block)
+        budgets, excluded = block_constraints(block, closed, accepted)
+        # Phần tính toán NumPy chạy ở thread khác => không chặn event loop
+        pairs = await asyncio.to_thread(top_k_for_block, block, budgets, excluded)
+        rows = match_rows(block, pairs)
+        await replace_block_matches(session, block, rows)
+        matches += len(rows)
+        MATCH_BLOCK_CACHE.put(block)
+
+    return {
+        "blocks": len(blocks),
+        "profiles": profiles,
+        "matches": matches,
+        "seconds": (datetime.utcnow() - started).total_seconds(),
+    }
+
+
+async def get_match_block(session: AsyncSession, key: Tuple[str, str, str]) -> MatchBlock:
+    block = MATCH_BLOCK_CACHE.get(key)
+    if block is not None:
+        MATCH_BLOCK_CACHE.stats["hits"] += 1
+        return block
+
+    MATCH_BLOCK_CACHE.stats["loads"] += 1
+    block = (await load_match_blocks(session, key)).get(key)
+    if block is None:
+        block = MatchBlock(key, [], np.zeros((0, HABIT_DIM), dtype=np.float32), [])
+    MATCH_BLOCK_CACHE.put(block)
+    return block
+
+
+async def delete_pending_matches_of(session: AsyncSession, user_id: UUID) -> Set[UUID]:
+    """
+    Xóa gợi ý pending của user (cả gợi ý cho user đó và gợi ý user đó cho người khác),
+    trả về những người vừa mất gợi ý user đó (danh sách của họ cần bù)
+    """
+    result = await session.execute(
+        delete(Match)
+        .where(
+            (Match.user1_id == user_id) | (Match.user2_id == user_id),
+            Match.status == MATCH_PENDING_STATUS
+        )
+        .returning(Match.user1_id, Match.user2_id)
+        .execution_options(synchronize_session=False)
+    )
+    return {user1_id for user1_id, user2_id in result.all() if user2_id == user_id}
+
+
+async def replace_pending_lists(
+    session: AsyncSession,
+    block: MatchBlock,
+    positions: List[int],
+    budgets: np.ndarray,
+    excluded: Dict[int, Set[int]]
+) -> int:
+    """Tính lại toàn bộ danh sách gợi ý pending của một số user trong block (giống run_full_matching)"""
+    if not positions:
+        return 0
+    pairs = top_k_for_block(block, budgets, excluded, rows=positions)
+    user_ids = [block.user_ids[i] for i in positions]
+    await session.execute(
+        delete(Match)
+        .where(
+            Match.user1_id == any_(bindparam("list_user_ids", user_ids, type_=ARRAY(PG_UUID(as_uuid=True)))),
+            Match.status == MATCH_PENDING_STATUS
+        )
+        .execution_options(synchronize_session=False)
+    )
+    rows = match_rows(block, pairs)
+    await insert_match_rows(session, rows)
+    return len(rows)
+
+
+async def refill_pending_matches(session: AsyncSession, user_ids: Set[UUID]) -> int:
+    """
+    Bù danh sách gợi ý của những người vừa mất 1 gợi ý (user được gợi ý đã rời block của họ):
+    tính lại danh sách của họ trong block hiện tại của từng người. Trả về số dòng đã ghi.
+    """
+    if not user_ids:
+        return 0
+    result = await session.execute(
+        select(UserProfile.user_id, UserProfile.school, UserProfile.gender, UserProfile.status)
+        .where(
+            UserProfile.user_id == any_(bindparam("refill_user_ids", list(user_ids), type_=ARRAY(PG_UUID(as_uuid=True)))),
+            UserProfile.is_active == True
+        )
+    )
+    grouped: Dict[Tuple[str, str, str], List[UUID]] = {}
+    for row in result.all():
+        grouped.setdefault(block_key(row.school, row.gender, row.status), []).append(row.user_id)
+
+    written = 0
+    for key, ids in grouped.items():
+        block = await get_match_block(session, key)
+        positions = [block.positions[user_id] for user_id in ids if user_id in block.positions]
+        closed, accepted = await load_closed_matches(session, block.user_ids)
+        budgets, excluded = block_constraints(block, closed, accepted)
+        written += await replace_pending_lists(session, block, positions, budgets, excluded)
+    return written
+
+
+async def rematch_profile(session: AsyncSession, user_id: UUID) -> Dict[str, Any]:
+    """
+    Re-match tăng dần sau khi profile của user_id thay đổi - chi phí theo kích thước 1 block:
+    - tính điểm vector mới với ma trận block (1 phép nhân ma trận-vector)
+    - thay danh sách gợi ý pending của user đó
+    - với người khác trong block: cập nhật điểm dòng (X, user) đã có; nếu user giờ lọt
+      top-k của X thì thêm (X, user) và bỏ gợi ý điểm thấp nhất của X
+    - X có thể có ứng viên tốt hơn user (điểm (X, user) giảm khi danh sách X đã đủ, hoặc user
+      rời block của X) => tính lại danh sách của riêng X
+    Kết quả giống hệt chạy lại run_full_matching; các dòng matches không liên quan giữ nguyên.
+    """
+    result = await session.execute(
+        select(*PROFILE_MATCH_COLUMNS, UserProfile.is_active).where(UserProfile.user_id == user_id)
+    )
+    profile = result.first()
+
+    if profile is None or not profile.is_active:
+        # Không còn active => bỏ khỏi block + bỏ các gợi ý pending liên quan
+        MATCH_BLOCK_CACHE.move_user(user_id, None)
+        lost = await delete_pending_matches_of(session, user_id)
+        await refill_pending_matches(session, lost)
+        await session.commit()
+        return {"user_id": user_id, "active": False}
+
+    key = block_key(profile.school, profile.gender, profile.status)
+    MATCH_BLOCK_CACHE.move_user(user_id, key)
+    block = await get_match_block(session, key)
+    position = block.upsert(user_id, encode_habits(profile.habits), profile.max_matches)
+    block_ids = bindparam("user_ids", block.user_ids, type_=ARRAY(PG_UUID(as_uuid=True)))
+
+    # Đổi block (đổi trường / trạng thái ...) => gợi ý user này cho người ở block cũ không còn hợp lệ
+    result = await session.execute(
+        delete(Match)
+        .where(
+            Match.user2_id == user_id,
+            ~(Match.user1_id == any_(block_ids)),
+            Match.status == MATCH_PENDING_STATUS
+        )
+        .returning(Match.user1_id)
+        .execution_options(synchronize_session=False)
+    )
+    await refill_pending_matches(session, set(result.scalars().all()))
+
+    closed, accepted = await load_closed_matches(session, block.user_ids)
+    budgets, excluded = block_constraints(block, closed, accepted)
+
+    scores = score_rows(block.matrix[position:position + 1], block.matrix, block.sq_norms)[0]
+    scores[position] = -np.inf
+    blocked = excluded.get(position, set())
+    if blocked:
+        scores[list(blocked)] = -np.inf
+
+    # 1) Danh sách gợi ý của chính user
+    own_matches = await replace_pending_lists(session, block, [position], budgets, excluded)
+
+    # 2) Các dòng (X, user) của người khác trong block
+    pending = await session.execute(
+        select(Match.id, Match.user1_id, Match.user2_id, Match.match_score)
+        .where(
+            Match.user1_id == any_(block_ids),
+            Match.user1_id != user_id,
+            Match.status == MATCH_PENDING_STATUS
+        )
+    )
+    lists: Dict[UUID, List[Any]] = {}
+    for row in pending.all():
+        lists.setdefault(row.user1_id, []).append(row)
+
+    score_updates: List[Dict[str, Any]] = []
+    new_pairs: List[Tuple[int, int, float]] = []
+    dropped_ids: List[UUID] = []
+    recompute: List[int] = []
+    for other_id, other in block.positions.items():
+        if other == position or other in blocked:
+            continue
+        score = float(scores[other])
+        rows = lists.get(other_id, [])
+        budget = int(budgets[other])
+        existing = next((row for row in rows if row.user2_id == user_id), None)
+        if existing is not None:
+            if score < existing.match_score and len(rows) >= budget:
+                # Danh sách đã đủ, user tụt điểm => có thể bị ứng viên ngoài danh sách vượt qua
+                recompute.append(other)
+            else:
+                score_updates.append({"id": existing.id, "match_score": score})
+            continue
+
+        if budget <= 0:
+            continue
+        if len(rows) < budget:
+            new_pairs.append((other, position, score))
+            continue
+        weakest = min(rows, key=lambda row: row.match_score)
+        if score > weakest.match_score:
+            new_pairs.append((other, position, score))
+            dropped_ids.append(weakest.id)
+
+    if score_updates:
+        # UPDATE theo khóa chính cho từng dòng bị ảnh hưởng (executemany)
+        await session.execute(update(Match), score_updates)
+    if dropped_ids:
+        await session.execute(
+            delete(Match)
+            .where(Match.id == any_(bindparam("match_ids", dropped_ids, type_=ARRAY(PG_UUID(as_uuid=True)))))
+            .execution_options(synchronize_session=False)
+        )
+    await insert_match_rows(session, match_rows(block, new_pairs))
+    await replace_pending_lists(session, block, recompute, budgets, excluded)
+    await session.commit()
+
+    return {
+        "user_id": user_id,
+        "active": True,
+        "block_size": len(block),
+        "own_matches": own_matches,
+        "updated": len(score_updates),
+        "inserted": len(new_pairs),
+        "dropped": len(dropped_ids),
+        "recomputed": len(recompute),
+    }
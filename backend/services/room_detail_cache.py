@@ -0,0 +1,107 @@
+# services/room_detail_cache.py
+"""
+Cache chi tiết phòng (GET /api/find-rooms/{room_id}).
+
+- Lưu sẵn JSON đã serialize (bytes) + ETag => cache hit không tốn công encode
+- Single-flight: nhiều request cùng miss 1 phòng chỉ tạo 1 lần đọc DB, các request khác chờ kết quả
+- Bị xóa khi sửa / xóa phòng hoặc chủ trọ đổi thông tin liên hệ, ở mọi process
+  (services/cache_invalidation.py)
+"""
+import asyncio
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from uuid import UUID
+
+import orjson
+
+ROOM_DETAIL_CACHE_MAXSIZE = int(os.getenv("ROOM_DETAIL_CACHE_MAXSIZE", "5000"))
+ROOM_DETAIL_CACHE_TTL = float(os.getenv("ROOM_DETAIL_CACHE_TTL", "60"))  # giây
+
+
+def make_etag(body: bytes) -> str:
+    return '"' + hashlib.sha1(body).hexdigest() + '"'
+
+
+class RoomDetailCache:
+    def __init__(self, maxsize: int = ROOM_DETAIL_CACHE_MAXSIZE, ttl: float = ROOM_DETAIL_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        # room_id -> (hết hạn lúc, body, etag)
+        self._entries: "OrderedDict[UUID, Tuple[float, bytes, str]]" = OrderedDict()
+        self._inflight: Dict[UUID, asyncio.Future] = {}
+        self.stats = {"hits": 0, "misses": 0, "coalesced": 0, "invalidations": 0}
+
+    def _get_fresh(self, room_id: UUID) -> Optional[Tuple[bytes, str]]:
+        entry = self._entries.get(room_id)
+        if entry is None:
+            return None
+        expires_at, body, etag = entry
+        if expires_at <= time.monotonic():
+            del self._entries[room_id]
+            return None
+        self._entries.move_to_end(room_id)
+        return body, etag
+
+    async def get_or_load(
+        self,
+        room_id: UUID,
+        loader: Callable[[UUID], Awaitable[Optional[Dict[str, Any]]]]
+    ) -> Optional[Tuple[bytes, str]]:
+        """
+        Trả về (body JSON, etag) hoặc None nếu không có phòng.
+        loader(room_id) -> dict response | None, chỉ được gọi 1 lần cho mỗi đợt miss.
+        """
+        cached = self._get_fresh(room_id)
+        if cached is not None:
+            self.stats["hits"] += 1
+            return cached
+
+        future = self._inflight.get(room_id)
+        if future is not None:
+            self.stats["coalesced"] += 1
+            return await asyncio.shield(future)
+
+        self.stats["misses"] += 1
+        future = asyncio.ensure_future(self._load(room_id, loader))
+        self._inflight[room_id] = future
+        future.add_done_callback(lambda done: self._clear_inflight(room_id, done))
+        # shield: request đầu bị hủy (client ngắt) thì các request đang chờ vẫn nhận kết quả
+        return await asyncio.shield(future)
+
+    def _clear_inflight(self, room_id: UUID, future: asyncio.Future):
+        if self._inflight.get(room_id) is future:
+            del self._inflight[room_id]
+
+    async def _load(self, room_id: UUID, loader) -> Optional[Tuple[bytes, str]]:
+        data = await loader(room_id)
+        if data is None:
+            return None
+
+        body = orjson.dumps(data)
+        etag = make_etag(body)
+
+        # Bị invalidate trong lúc đang load => không lưu kết quả có thể đã cũ
+        if self._inflight.get(room_id) is asyncio.current_task():
+            self._entries[room_id] = (time.monotonic() + self.ttl, body, etag)
+            self._entries.move_to_end(room_id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return body, etag
+
+    def invalidate(self, room_id: UUID):
+        self._entries.pop(room_id, None)
+        self._inflight.pop(room_id, None)
+        self.stats["invalidations"] += 1
+
+    def clear(self):
+        self._entries.clear()
+        self._inflight.clear()
+
+    def metrics(self) -> Dict[str, Any]:
+        return {**self.stats, "size": len(self._entries), "ttl_seconds": self.ttl}
+
+
+ROOM_DETAIL_CACHE = RoomDetailCache()
@@ -0,0 +1,121 @@
+# services/room_filters.py
+"""
+Registry bộ lọc khoảng giá / diện tích - định nghĩa 1 lần, dùng chung cho:
+- api/filterroom.py: danh sách option + facet count
+- api/findroom.py: điều kiện SQL
+- services/elasticsearch_service.py: range clause của ES
+
+Search request nhận được cả slug lẫn khoảng tùy ý:
+    "filters": {"price": "3m-5m", "area": {"min": 20, "max": 30}}
+Slug: min tính, max không tính (giống range aggregation). Khoảng tùy ý: cả 2 đầu đều tính.
+"""
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import and_
+
+from models.models import Room
+
+PRICE_RANGES = [
+    {"label": "Dưới 1 triệu", "value": "under-1m", "min": None, "max": 1_000_000},
+    {"label": "1 - 3 triệu", "value": "1m-3m", "min": 1_000_000, "max": 3_000_000},
+    {"label": "3 - 5 triệu", "value": "3m-5m", "min": 3_000_000, "max": 5_000_000},
+    {"label": "5 - 7 triệu", "value": "5m-7m", "min": 5_000_000, "max": 7_000_000},
+    {"label": "Trên 7 triệu", "value": "over-7m", "min": 7_000_000, "max": None},
+]
+
+AREA_RANGES = [
+    {"label": "Dưới 20m²", "value": "under-20", "min": None, "max": 20},
+    {"label": "20 - 30m²", "value": "20-30", "min": 20, "max": 30},
+    {"label": "30 - 40m²", "value": "30-40", "min": 30, "max": 40},
+    {"label": "40 - 50m²", "value": "40-50", "min": 40, "max": 50},
+    {"label": "Trên 50m²", "value": "over-50", "min": 50, "max": None},
+]
+
+RANGE_FIELDS = ("price", "area")
+
+
+def _compile(field: str, ranges: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Dựng sẵn predicate SQL + clause ES cho từng slug (chỉ chạy 1 lần lúc import)"""
+    column = getattr(Room, field)
+    registry = {}
+    for item in ranges:
+        sql_parts = []
+        es_bounds = {}
+        if item["min"] is not None:
+            sql_parts.append(column >= item["min"])
+            es_bounds["gte"] = item["min"]
+        if item["max"] is not None:
+            sql_parts.append(column < item["max"])
+            es_bounds["lt"] = item["max"]
+        registry[item["value"]] = {
+            **item,
+            "sql": and_(*sql_parts),
+            "es": {"range": {field: es_bounds}},
+        }
+    return registry
+
+
+# field -> slug -> {"label", "value", "min", "max", "sql", "es"}
+FILTER_REGISTRY = {
+    "price": _compile("price", PRICE_RANGES),
+    "area": _compile("area", AREA_RANGES),
+}
+
+
+def parse_range_bounds(spec: Any) -> Dict[str, float]:
+    """{"min": .., "max": ..} -> {"gte": .., "lte": ..}, bỏ qua giá trị không phải số"""
+    bounds = {}
+    if not isinstance(spec, dict):
+        return bounds
+    for key, op in (("min", "gte"), ("max", "lte")):
+        if spec.get(key) is not None:
+            try:
+                bounds[op] = float(spec[key])
+            except (ValueError, TypeError):
+                pass
+    return bounds
+
+
+def sql_range_conditions(field: str, spec: Any) -> list:
+    """Điều kiện WHERE cho 1 field (slug hoặc {"min","max"}); slug lạ / giá trị sai => bỏ qua"""
+    if isinstance(spec, str):
+        entry = FILTER_REGISTRY[field].get(spec)
+        return [entry["sql"]] if entry else []
+
+    column = getattr(Room, field)
+    bounds = parse_range_bounds(spec)
+    conditions = []
+    if "gte" in bounds:
+        conditions.append(column >= bounds["gte"])
+    if "lte" in bounds:
+        conditions.append(column <= bounds["lte"])
+    return conditions
+
+
+def es_range_clause(field: str, spec: Any) -> Optional[Dict[str, Any]]:
+    """Range clause ES cho 1 field (slug hoặc {"min","max"}), None nếu không lọc"""
+    if isinstance(spec, str):
+        entry = FILTER_REGISTRY[field].get(spec)
+        return entry["es"] if entry else None
+
+    bounds = parse_range_bounds(spec)
+    return {"range": {field: bounds}} if bounds else None
+
+
+def normalize_range_filters(filters: Optional[Dict[str, Any]]) -> Tuple:
+    """
+    Dạng chuẩn (hashable) của bộ lọc giá/diện tích - dùng làm cache key.
+    Slug giữ nguyên, khoảng tùy ý chuyển về (gte, lte) dạng float.
+    """
+    filters = filters or {}
+    normalized = []
+    for field in RANGE_FIELDS:
+        spec = filters.get(field)
+        if isinstance(spec, str):
+            if spec in FILTER_REGISTRY[field]:
+                normalized.append((field, spec))
+        else:
+            bounds = parse_range_bounds(spec)
+            if bounds:
+                normalized.append((field, bounds.get("gte"), bounds.get("lte")))
+    return tuple(normalized)
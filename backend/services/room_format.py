@@ -0,0 +1,54 @@
+# services/room_format.py
+"""
+Format card phòng cho response danh sách - dùng chung cho api/findroom.py và api/filterroom.py.
+Phòng đọc từ Postgres (format_room_items) và document ES (format_room_docs) ra cùng 1 shape.
+"""
+from typing import List
+
+from models.models import Room
+
+
+def format_room_items(rooms: List[Room]) -> List[dict]:
+    """
+    Format danh sách phòng cho response (kèm thông tin liên hệ chủ trọ).
+    Yêu cầu query đã load sẵn room.landlord (options(LANDLORD_CONTACT) trong api/findroom.py).
+    id / created_at giữ nguyên kiểu UUID / datetime - orjson encode trực tiếp.
+    """
+    rooms_data = []
+    for room in rooms:
+        landlord = room.landlord
+        
+        rooms_data.append({
+            "id": room.id,
+            "title": room.title,
+            "province": room.province,
+            "district": room.district,
+            "ward": room.ward,
+            "area": room.area,
+            "price": room.price,
+            "images": room.images or [],
+            "created_at": room.created_at,
+            "landlord_email": landlord.email if landlord else None,
+            "landlord_phone": landlord.phone if landlord else None
+        })
+    return rooms_data
+
+
+def format_room_docs(docs: List[dict]) -> List[dict]:
+    """Format card phòng trực tiếp từ _source của Elasticsearch (cùng shape với format_room_items)"""
+    return [
+        {
+            "id": doc.get("id"),
+            "title": doc.get("title"),
+            "province": doc.get("province"),
+            "district": doc.get("district"),
+            "ward": doc.get("ward"),
+            "area": doc.get("area"),
+            "price": doc.get("price"),
+            "images": doc.get("images") or [],
+            "created_at": doc.get("created_at"),
+            "landlord_email": doc.get("landlord_email"),
+            "landlord_phone": doc.get("landlord_phone")
+        }
+        for doc in docs
+    ]
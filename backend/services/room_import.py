@@ -0,0 +1,322 @@
+# services/room_import.py
+"""
+Import phòng hàng loạt cho chủ trọ / công ty môi giới (POST /api/rooms/bulk).
+
+- Đọc body dạng stream (JSON lines hoặc CSV), xử lý theo từng chunk => bộ nhớ không tăng theo file
+- CSV đọc bằng csv.reader theo từng bản ghi (ô trong ngoặc kép được phép xuống dòng)
+- Mỗi chunk: 1 transaction
+  1. COPY các dòng vào bảng tạm room_import_stage
+  2. validate cả chunk bằng 1 câu SQL, xóa dòng lỗi khỏi bảng tạm (trả về số dòng + lỗi)
+  3. INSERT ... SELECT vào rooms + room_index_outbox
+  sau commit index sang ES qua đường outbox (process_outbox_batch)
+- Lỗi DB ở 1 chunk: rollback chunk đó, các dòng của nó vào báo cáo lỗi, các chunk khác vẫn chạy
+"""
+import codecs
+import csv
+import json
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Any, AsyncIterator, Dict, List, Tuple
+from uuid import UUID, uuid4
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.models import MAX_ROOM_PRICE, ROOM_STATUSES, User, normalize_location
+from services.cache_invalidation import publish_invalidation
+from services.es_sync_worker import process_outbox_batch
+
+IMPORT_CHUNK_SIZE = 500
+
+REQUIRED_FIELDS = ["title", "province", "district", "ward", "address_detail", "area", "price"]
+TEXT_FIELDS = ["title", "description", "province", "district", "ward", "address_detail", "room_status"]
+
+IMPORT_DB_ERROR = "Lỗi lưu dữ liệu, hãy import lại dòng này"
+# 1 bản ghi CSV tối đa bấy nhiêu dòng vật lý (ngoặc kép không đóng => không gom cả file vào bộ nhớ)
+CSV_MAX_RECORD_LINES = 100
+
+# Thứ tự cột khi COPY vào bảng tạm (khớp tuple do stage_records tạo)
+STAGE_COLUMNS = [
+    "line_no", "id", *TEXT_FIELDS, "area", "price", "images",
+    "province_norm", "district_norm", "ward_norm",
+]
+
+CREATE_STAGE_SQL = text("""
+CREATE TEMP TABLE room_import_stage (
+    line_no integer PRIMARY KEY,
+    id uuid NOT NULL,
+    title text,
+    description text,
+    province text,
+    district text,
+    ward text,
+    address_detail text,
+    room_status text,
+    area text,
+    price text,
+    images jsonb,
+    province_norm text,
+    district_norm text,
+    ward_norm text
+) ON COMMIT DROP
+""")
+
+# Cùng luật với create_room, kiểm tra cả chunk 1 lượt; CASE dừng ở lỗi đầu tiên của mỗi dòng
+# (chỉ CAST khi đã khớp định dạng số). Mọi lỗi phải bắt ở đây thành lỗi của từng dòng:
+# lỗi lúc INSERT làm hỏng cả chunk
+# - số mũ tối đa 3 chữ số: '1e400000' làm CAST numeric lỗi ngay trong câu này
+# - <= 1e-300 coi như 0: số nhỏ hơn nữa CAST sang double precision bị lỗi underflow
+REJECT_INVALID_SQL = text(r"""
+WITH checked AS (
+    SELECT line_no,
+        CASE
+            WHEN missing <> '' THEN 'Thiếu trường bắt buộc: ' || missing
+            WHEN area !~ '^\s*[+-]?(\d+(\.\d*)?|\.\d+)([eE][+-]?\d{1,3})?\s*$'
+              OR price !~ '^\s*[+-]?(\d+(\.\d*)?|\.\d+)([eE][+-]?\d{1,3})?\s*$'
+                THEN 'Diện tích và giá phải là số'
+            WHEN CAST(area AS numeric) <= 1e-300 OR CAST(area AS numeric) > 1000
+                THEN 'Diện tích phải > 0 và <= 1000'
+            WHEN CAST(price AS numeric) <= 1e-300 THEN 'Giá phải > 0'
+            WHEN CAST(price AS numeric) >= CAST(:max_price AS numeric) THEN 'Giá quá lớn'
+            WHEN NOT (NULLIF(room_status, '') = ANY(CAST(:statuses AS text[])))
+                THEN 'room_status phải là một trong: ' || array_to_string(CAST(:statuses AS text[]), ', ')
+        END AS error
+    FROM (
+        SELECT *, concat_ws(', ', MISSING_FIELDS) AS missing
+        FROM room_import_stage
+    ) stage
+)
+DELETE FROM room_import_stage s
+USING checked c
+WHERE s.line_no = c.line_no AND c.error IS NOT NULL
+RETURNING c.line_no, c.error
+""".replace("MISSING_FIELDS", ", ".join(
+    f"CASE WHEN COALESCE({field}, '') = '' THEN '{field}' END" for field in REQUIRED_FIELDS
+)))
+
+# Bulk INSERT không chạy listener before_insert => cột *_norm đã tính sẵn khi stage
+INSERT_STAGED_SQL = text("""
+WITH inserted AS (
+    INSERT INTO rooms (
+        id, landlord_id, title, description, province, district, ward, address_detail,
+        area, price, room_status, images, created_at, province_norm, district_norm, ward_norm
+    )
+    SELECT id, CAST(:landlord_id AS uuid), title, description, province, district, ward, address_detail,
+           CAST(area AS double precision), CAST(price AS double precision),
+           COALESCE(NULLIF(room_status, ''), 'available'), COALESCE(images, '[]'::jsonb),
+           CAST(:now AS timestamp), province_norm, district_norm, ward_norm
+    FROM room_import_stage
+    ORDER BY line_no
+    RETURNING id
+)
+INSERT INTO room_index_outbox (room_id, op, attempts, next_attempt_at, created_at)
+SELECT id, 'index', 0, CAST(:now AS timestamp), CAST(:now AS timestamp) FROM inserted
+RETURNING id
+""")
+
+
+async def iter_text(stream: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Giải mã UTF-8 từng phần (ký tự nhiều byte bị cắt giữa 2 chunk vẫn đúng), bỏ BOM"""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    async for chunk in stream:
+        decoded = decoder.decode(chunk)
+        if decoded:
+            yield decoded
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+async def iter_lines(stream: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """
+    Tách body stream thành từng dòng (giữ ký tự xuống dòng), không cần đọc hết body vào bộ nhớ.
+    Phần dở dang giữ trong list, chỉ nối 1 lần khi đủ dòng.
+    """
+    pending: List[str] = []
+    async for decoded in iter_text(stream):
+        start = 0
+        while True:
+            end = decoded.find("\n", start)
+            if end < 0:
+                break
+            pending.append(decoded[start:end + 1])
+            yield "".join(pending)
+            pending = []
+            start = end + 1
+        if start < len(decoded):
+            pending.append(decoded[start:])
+    if pending:
+        yield "".join(pending)
+
+
+async def iter_csv_rows(stream: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, Any]]:
+    """
+    (số dòng bắt đầu, các cột) cho từng bản ghi CSV - hoặc (số dòng, csv.Error).
+    Bản ghi kết thúc khi số dấu " đã gặp là chẵn => ô trong ngoặc kép có thể chứa xuống dòng.
+    """
+    record: List[str] = []
+    quotes = 0
+    line_no = 0
+    start_line = 0
+    async for line in iter_lines(stream):
+        line_no += 1
+        if not record:
+            start_line = line_no
+        record.append(line)
+        quotes += line.count('"')
+        if quotes % 2:
+            if len(record) >= CSV_MAX_RECORD_LINES:
+                yield start_line, csv.Error(f"Ngoặc kép chưa đóng sau {CSV_MAX_RECORD_LINES} dòng")
+                record = []
+                quotes = 0
+            continue
+        raw = "".join(record)
+        record = []
+        quotes = 0
+        if not raw.strip():
+            continue
+        try:
+            yield start_line, next(csv.reader([raw]))
+        except csv.Error as e:
+            yield start_line, e
+    if record:
+        yield start_line, csv.Error("Ngoặc kép chưa đóng tới cuối file")
+
+
+async def iter_records(stream: AsyncIterator[bytes], fmt: str) -> AsyncIterator[Tuple[int, Any]]:
+    """
+    Trả về (số dòng, dict) - hoặc (số dòng, Exception) nếu dòng không parse được.
+    fmt: "jsonl" | "csv" (CSV: dòng đầu là header, images ngăn cách bằng "|")
+    """
+    if fmt == "csv":
+        header = None
+        async for line_no, values in iter_csv_rows(stream):
+            if isinstance(values, Exception):
+                yield line_no, values
+                continue
+            if header is None:
+                header = [name.strip() for name in values]
+                continue
+            if len(values) != len(header):
+                yield line_no, ValueError(f"Số cột ({len(values)}) khác header ({len(header)})")
+                continue
+            record = dict(zip(header, values))
+            if record.get("images"):
+                record["images"] = [url.strip() for url in record["images"].split("|") if url.strip()]
+            yield line_no, record
+        return
+
+    line_no = 0
+    async for line in iter_lines(stream):
+        line_no += 1
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield line_no, e
+            continue
+        if not isinstance(record, dict):
+            yield line_no, ValueError("Mỗi dòng phải là 1 object JSON")
+            continue
+        yield line_no, record
+
+
+def stage_records(records: List[Tuple[int, Any]]) -> Tuple[List[tuple], List[Dict[str, Any]]]:
+    """
+    Chuyển các bản ghi đã parse thành tuple theo STAGE_COLUMNS để COPY vào bảng tạm.
+    Chỉ kiểm tra những gì SQL không kiểm được (dòng không parse được, kiểu JSON);
+    trả về (các tuple, danh sách lỗi).
+    """
+    staged: List[tuple] = []
+    errors: List[Dict[str, Any]] = []
+
+    for line_no, record in records:
+        if isinstance(record, Exception):
+            errors.append({"line": line_no, "error": f"Không đọc được dòng: {record}"})
+            continue
+
+        images = record.get("images") or []
+        if not isinstance(images, list) or not all(isinstance(url, str) for url in images):
+            errors.append({"line": line_no, "error": "images phải là danh sách URL"})
+            continue
+
+        values = {}
+        for field in [*TEXT_FIELDS, "area", "price"]:
+            value = record.get(field)
+            if isinstance(value, (dict, list, bool)):
+                value = ""  # sai kiểu => SQL báo thiếu trường
+            values[field] = str(value) if value is not None else None
+
+        staged.append((
+            line_no,
+            uuid4(),
+            *(values[field] for field in TEXT_FIELDS),
+            values["area"],
+            values["price"],
+            json.dumps(images),
+            normalize_location(values["province"]),
+            normalize_location(values["district"]),
+            normalize_location(values["ward"]),
+        ))
+
+    return staged, errors
+
+
+async def import_chunk(
+    session: AsyncSession,
+    records: List[Tuple[int, Any]],
+    landlord: User
+) -> Tuple[List[Tuple[int, UUID]], List[Dict[str, Any]]]:
+    """
+    Validate + INSERT 1 chunk trong 1 transaction, sau đó index sang ES.
+    Trả về ([(số dòng, room id) đã insert], danh sách lỗi theo thứ tự dòng).
+    """
+    staged, errors = stage_records(records)
+    if not staged:
+        return [], errors
+
+    province, district, ward = (STAGE_COLUMNS.index(field) for field in ("province", "district", "ward"))
+    try:
+        await session.execute(CREATE_STAGE_SQL)
+        connection = await session.connection()
+        raw = await connection.get_raw_connection()
+        await raw.driver_connection.copy_records_to_table(
+            "room_import_stage", records=staged, columns=STAGE_COLUMNS
+        )
+
+        rejected = (await session.execute(
+            REJECT_INVALID_SQL, {"statuses": ROOM_STATUSES, "max_price": MAX_ROOM_PRICE}
+        )).all()
+        outbox_ids = (await session.execute(
+            INSERT_STAGED_SQL, {"landlord_id": landlord.id, "now": datetime.utcnow()}
+        )).scalars().all()
+
+        rejected_lines = {line_no for line_no, _ in rejected}
+        inserted = [row for row in staged if row[0] not in rejected_lines]
+        if inserted:
+            locations = {(row[province], row[district], row[ward]) for row in inserted}
+            await publish_invalidation(session, ["sql"], [
+                SimpleNamespace(province=p, district=d, ward=w) for p, d, w in locations
+            ])
+        await session.commit()
+    except Exception as e:
+        await session.rollback()
+        print(f"🚨 Lỗi import chunk dòng {staged[0][0]}-{staged[-1][0]}: {e}")
+        errors.extend({"line": row[0], "error": IMPORT_DB_ERROR} for row in staged)
+        errors.sort(key=lambda error: error["line"])
+        return [], errors
+
+    errors.extend({"line": line_no, "error": error} for line_no, error in rejected)
+    errors.sort(key=lambda error: error["line"])
+
+    # Index ngay cả chunk qua outbox (document đầy đủ + external version của outbox) trong
+    # 1 bulk request; lỗi => dòng outbox giữ nguyên để worker nền retry
+    if outbox_ids:
+        try:
+            await process_outbox_batch(session, entry_ids=list(outbox_ids))
+        except Exception as e:
+            print(f"🚨 Lỗi index ngay sau import, để worker xử lý: {e}")
+            await session.rollback()
+
+    return [(row[0], row[1]) for row in inserted], errors
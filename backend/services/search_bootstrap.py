@@ -0,0 +1,93 @@
+# services/search_bootstrap.py
+"""
+Khởi tạo Elasticsearch (tạo index + index toàn bộ phòng) NGOÀI luồng phục vụ request.
+
+- Chạy nền trong lifespan của app (API nhận request ngay), hoặc chạy 1 lần bằng CLI:
+      python reindex.py --initial
+- Postgres advisory lock => nhiều uvicorn worker / nhiều container chỉ có 1 process index,
+  các process khác chờ lock rồi kiểm tra lại.
+- Alias đã có dữ liệu (đúng mapping) => bỏ qua index toàn bộ: các thay đổi trong lúc app dừng
+  vẫn nằm trong outbox và được ES sync worker đẩy sang.
+"""
+import asyncio
+import time
+from typing import Any, Dict
+
+from sqlmodel import Session, text
+
+from core.database import engine
+from services.elasticsearch_service import (
+    ES_CLIENT,
+    create_index_if_not_exists,
+    initial_indexing,
+    is_room_index_populated,
+)
+
+# Khóa dùng chung cho mọi process cùng DB (số tùy ý nhưng cố định)
+ES_BOOTSTRAP_LOCK_ID = 74100001
+ES_WAIT_ATTEMPTS = 10
+ES_WAIT_DELAY = 5  # giây
+
+# Trạng thái cho /health/ready: pending | waiting_lock | waiting_es | indexing | ready | failed
+# (disabled: không bootstrap trong app, khởi tạo bằng reindex.py --initial)
+BOOTSTRAP_STATE: Dict[str, Any] = {"status": "pending", "error": None}
+
+
+def wait_for_elasticsearch(attempts: int = ES_WAIT_ATTEMPTS, delay: float = ES_WAIT_DELAY) -> bool:
+    for i in range(attempts):
+        try:
+            if ES_CLIENT.ping():
+                return True
+        except Exception:
+            pass
+        print(f"🔄 Attempt {i+1}: ES not ready, retrying...")
+        time.sleep(delay)
+    return False
+
+
+def bootstrap_search_index() -> bool:
+    """
+    Tạo index + initial indexing khi giữ advisory lock; process khác đang làm thì chờ xong.
+    Trả về False nếu index đã có dữ liệu (bỏ qua index toàn bộ).
+    """
+    with engine.connect() as conn:
+        locked = conn.execute(
+            text("SELECT pg_try_advisory_lock(:lock_id)"), {"lock_id": ES_BOOTSTRAP_LOCK_ID}
+        ).scalar()
+        if not locked:
+            print("ℹ️ Process khác đang khởi tạo Elasticsearch, chờ xong...")
+            BOOTSTRAP_STATE["status"] = "waiting_lock"
+            conn.execute(text("SELECT pg_advisory_lock(:lock_id)"), {"lock_id": ES_BOOTSTRAP_LOCK_ID})
+
+        try:
+            BOOTSTRAP_STATE["status"] = "waiting_es"
+            if not wait_for_elasticsearch():
+                raise RuntimeError("Elasticsearch không sẵn sàng")
+
+            if is_room_index_populated():
+                BOOTSTRAP_STATE["status"] = "ready"
+                print("✅ Elasticsearch đã có dữ liệu, bỏ qua index toàn bộ")
+                return False
+
+            BOOTSTRAP_STATE["status"] = "indexing"
+            create_index_if_not_exists()
+            with Session(engine) as db:
+                initial_indexing(db)
+
+            BOOTSTRAP_STATE["status"] = "ready"
+            print("✅ Elasticsearch initialized successfully")
+            return True
+        finally:
+            conn.execute(
+                text("SELECT pg_advisory_unlock(:lock_id)"), {"lock_id": ES_BOOTSTRAP_LOCK_ID}
+            )
+
+
+async def run_bootstrap_in_background():
+    """Chạy bootstrap trong thread riêng => không block event loop"""
+    try:
+        await asyncio.to_thread(bootstrap_search_index)
+    except Exception as e:
+        BOOTSTRAP_STATE["status"] = "failed"
+        BOOTSTRAP_STATE["error"] = str(e)
+        print(f"🚨 Lỗi khởi tạo Elasticsearch: {e}")
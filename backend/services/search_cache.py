@@ -0,0 +1,186 @@
+# services/search_cache.py
+"""
+Cache kết quả tìm kiếm phòng (/search, /search/page, /search-keyword, /search-combined).
+
+- Key = tham số tìm kiếm đã chuẩn hóa (bỏ dấu, lower-case, slug/khoảng giá dạng chuẩn)
+- Mỗi scope thuộc 1 nhóm theo nguồn dữ liệu:
+  "sql" (/search, /search/page đọc Postgres) - xóa khi thao tác ghi phòng commit,
+  "es" (/search-keyword, /search-combined đọc ES) - xóa khi ES sync worker đã đẩy thay đổi sang ES
+  (xóa sớm hơn thì request kế tiếp lại cache kết quả ES cũ)
+- In-process LRU + TTL, mỗi entry gắn bộ lọc địa chỉ của nó; xóa các entry có bộ lọc địa chỉ
+  khớp phòng thay đổi (cùng logic "chứa chuỗi" như SQL), entry không lọc địa chỉ luôn bị xóa
+- Invalidation được phát tới mọi process qua Postgres NOTIFY (services/cache_invalidation.py)
+- Backend dùng chung (tùy chọn, SEARCH_CACHE_REDIS_URL): các worker dùng chung cache,
+  invalidation bằng generation counter theo nhóm (tăng 1 => toàn bộ key cũ của nhóm hết hiệu lực)
+"""
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import orjson
+
+from models.models import normalize_location
+from services.room_filters import normalize_range_filters
+
+SEARCH_CACHE_MAXSIZE = int(os.getenv("SEARCH_CACHE_MAXSIZE", "2048"))
+SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", "30"))  # giây
+SEARCH_CACHE_REDIS_URL = os.getenv("SEARCH_CACHE_REDIS_URL")
+
+LOCATION_FIELDS = ("province", "district", "ward")
+
+# scope -> nhóm invalidation
+SEARCH_CACHE_SCOPES = {
+    "search": "sql",
+    "keyword": "es",
+    "combined": "es",
+}
+SEARCH_CACHE_GROUPS = ("sql", "es")
+
+
+def room_location(room) -> Dict[str, str]:
+    """Địa chỉ đã chuẩn hóa của phòng (object có province/district/ward)"""
+    return {field: normalize_location(getattr(room, field)) or "" for field in LOCATION_FIELDS}
+
+
+def key_group(key: str) -> str:
+    return key.split(":", 1)[0]
+
+
+class RedisCacheBackend:
+    """Backend dùng chung giữa các worker (cần package redis)"""
+
+    GENERATION_KEY = "search_cache:generation:{group}"
+
+    def __init__(self, url: str, ttl: float):
+        import redis.asyncio as redis  # optional dependency
+
+        self.client = redis.from_url(url)
+        self.ttl = int(ttl)
+
+    async def _versioned_key(self, key: str) -> str:
+        generation = int(await self.client.get(self.GENERATION_KEY.format(group=key_group(key))) or 0)
+        return f"search_cache:{generation}:{key}"
+
+    async def get(self, key: str) -> Optional[Any]:
+        raw = await self.client.get(await self._versioned_key(key))
+        return orjson.loads(raw) if raw is not None else None
+
+    async def set(self, key: str, value: Any):
+        await self.client.set(await self._versioned_key(key), orjson.dumps(value), ex=self.ttl)
+
+    async def invalidate(self, groups: Iterable[str]):
+        for group in groups:
+            await self.client.incr(self.GENERATION_KEY.format(group=group))
+
+
+class SearchCache:
+    def __init__(self, maxsize: int = SEARCH_CACHE_MAXSIZE, ttl: float = SEARCH_CACHE_TTL, backend=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.backend = backend
+        # key -> (hết hạn lúc, bộ lọc địa chỉ đã chuẩn hóa, response)
+        self._entries: "OrderedDict[str, Tuple[float, Tuple, Any]]" = OrderedDict()
+        self.stats = {"hits": 0, "misses": 0, "shared_hits": 0, "invalidations": 0, "evictions": 0}
+
+    @staticmethod
+    def normalize_location_filter(search_data: Optional[Dict[str, Any]]) -> Tuple:
+        location = (search_data or {}).get("location") or {}
+        return tuple(
+            (field, normalize_location(location[field]))
+            for field in LOCATION_FIELDS
+            if location.get(field)
+        )
+
+    def make_key(self, scope: str, search_data: Optional[Dict[str, Any]] = None, **params) -> Tuple[str, Tuple]:
+        """
+        Trả về (cache key, bộ lọc địa chỉ) - các request tương đương cho ra cùng key.
+        Key có tiền tố nhóm của scope ("sql:...", "es:...").
+        """
+        location = self.normalize_location_filter(search_data)
+        filters = normalize_range_filters((search_data or {}).get("filters"))
+        raw = json.dumps([scope, location, filters, sorted(params.items())], default=str)
+        return f"{SEARCH_CACHE_SCOPES[scope]}:{hashlib.sha1(raw.encode()).hexdigest()}", location
+
+    async def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, _, value = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return value
+            del self._entries[key]
+
+        if self.backend is not None:
+            try:
+                value = await self.backend.get(key)
+            except Exception as e:
+                print(f"🚨 Lỗi search cache backend: {e}")
+                value = None
+            if value is not None:
+                self.stats["shared_hits"] += 1
+                return value
+
+        self.stats["misses"] += 1
+        return None
+
+    async def set(self, key: str, location: Tuple, value: Any):
+        self._entries[key] = (time.monotonic() + self.ttl, location, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.stats["evictions"] += 1
+
+        if self.backend is not None:
+            try:
+                await self.backend.set(key, value)
+            except Exception as e:
+                print(f"🚨 Lỗi search cache backend: {e}")
+
+    def invalidate_local(self, groups: Iterable[str], room_locations: Optional[List[Dict[str, str]]] = None):
+        """
+        Xóa entry cục bộ của các nhóm có thể chứa phòng vừa thay đổi.
+        room_locations: room_location() của các phòng (cả bản trước và sau khi sửa nếu đổi địa chỉ),
+        None => xóa toàn bộ entry của nhóm
+        """
+        groups = set(groups)
+
+        def _affected(location_filter: Tuple) -> bool:
+            if room_locations is None:
+                return True
+            return any(
+                all(value in location[field] for field, value in location_filter)
+                for location in room_locations
+            )
+
+        stale = [
+            key for key, (_, location, _) in self._entries.items()
+            if key_group(key) in groups and _affected(location)
+        ]
+        for key in stale:
+            del self._entries[key]
+        self.stats["invalidations"] += len(stale)
+
+    async def invalidate_shared(self, groups: Iterable[str]):
+        """Tăng generation của các nhóm ở backend dùng chung (nếu có)"""
+        if self.backend is not None:
+            await self.backend.invalidate(groups)
+
+    def metrics(self) -> Dict[str, Any]:
+        lookups = self.stats["hits"] + self.stats["shared_hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "ttl_seconds": self.ttl,
+            "hit_ratio": (self.stats["hits"] + self.stats["shared_hits"]) / lookups if lookups else 0.0,
+            "shared_backend": self.backend is not None,
+        }
+
+
+SEARCH_CACHE = SearchCache(
+    backend=RedisCacheBackend(SEARCH_CACHE_REDIS_URL, SEARCH_CACHE_TTL) if SEARCH_CACHE_REDIS_URL else None
+)
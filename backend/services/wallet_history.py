@@ -0,0 +1,267 @@
+# services/wallet_history.py
+"""
+Lịch sử giao dịch ví + snapshot số dư.
+
+- Trang lịch sử: keyset pagination trên (wallet_id, created_at, id)
+  => dùng index ix_transactions_wallet_created_at_id, trang sâu cũng không chậm
+- Xuất CSV: đọc theo từng chunk keyset, stream ra client (không giữ cả lịch sử trong bộ nhớ)
+- Snapshot định kỳ (wallet_balance_snapshots): số dư tại ngày X / đối soát chỉ cộng
+  các giao dịch sau snapshot gần nhất thay vì toàn bộ lịch sử
+"""
+import asyncio
+import csv
+import io
+import os
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from uuid import UUID
+
+from sqlmodel import select, func
+from sqlalchemy import text, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.database import async_session_maker
+from models.models import Transaction, Wallet, WalletBalanceSnapshot
+
+HISTORY_EXPORT_CHUNK_SIZE = 1000
+WALLET_SNAPSHOT_INTERVAL = float(os.getenv("WALLET_SNAPSHOT_INTERVAL", str(24 * 3600)))  # giây
+# Snapshot tới (now - lag): giao dịch có created_at trước đó chắc chắn đã commit
+WALLET_SNAPSHOT_LAG = timedelta(seconds=int(os.getenv("WALLET_SNAPSHOT_LAG", "300")))
+WALLET_SNAPSHOT_LOCK_ID = 72_011_002
+
+TRANSACTION_COLUMNS = (
+    Transaction.id,
+    Transaction.created_at,
+    Transaction.type,
+    Transaction.amount,
+    Transaction.balance_after,
+    Transaction.description,
+)
+CSV_HEADER = ["id", "created_at", "type", "amount", "balance_after", "description"]
+
+# 1 dòng snapshot cho mỗi ví có giao dịch mới kể từ snapshot trước:
+# snapshot trước + tổng giao dịch (as_of trước, as_of] - mỗi ví 1 lần quét index
+CREATE_SNAPSHOTS_SQL = text("""
+INSERT INTO wallet_balance_snapshots (wallet_id, balance, as_of, created_at)
+SELECT w.id, COALESCE(last.balance, 0) + delta.total, CAST(:as_of AS timestamp), CAST(:now AS timestamp)
+FROM wallets w
+LEFT JOIN LATERAL (
+    SELECT s.balance, s.as_of
+    FROM wallet_balance_snapshots s
+    WHERE s.wallet_id = w.id
+    ORDER BY s.as_of DESC
+    LIMIT 1
+) last ON true
+CROSS JOIN LATERAL (
+    SELECT SUM(t.amount) AS total, COUNT(*) AS n
+    FROM transactions t
+    WHERE t.wallet_id = w.id
+      AND t.created_at > COALESCE(last.as_of, '-infinity'::timestamp)
+      AND t.created_at <= CAST(:as_of AS timestamp)
+) delta
+WHERE delta.n > 0
+ON CONFLICT (wallet_id, as_of) DO NOTHING
+""")
+
+# Đối soát trong 1 câu lệnh (1 snapshot dữ liệu): số dư lưu trong ví, snapshot gần nhất và
+# tổng giao dịch sau snapshot đó. Đọc riêng từng phần (READ COMMITTED) thì giao dịch commit
+# xen giữa các lần đọc làm lệch kết quả dù dữ liệu vẫn khớp
+RECONCILE_WALLET_SQL = text("""
+SELECT w.id AS wallet_id,
+       w.balance,
+       COALESCE(last.balance, 0) + COALESCE(delta.total, 0) AS computed_balance,
+       last.as_of AS snapshot_as_of,
+       delta.n AS transactions_summed
+FROM wallets w
+LEFT JOIN LATERAL (
+    SELECT s.balance, s.as_of
+    FROM wallet_balance_snapshots s
+    WHERE s.wallet_id = w.id
+    ORDER BY s.as_of DESC
+    LIMIT 1
+) last ON true
+CROSS JOIN LATERAL (
+    SELECT SUM(t.amount) AS total, COUNT(*) AS n
+    FROM transactions t
+    WHERE t.wallet_id = w.id
+      AND t.created_at > COALESCE(last.as_of, '-infinity'::timestamp)
+) delta
+WHERE w.id = :wallet_id
+""")
+
+# Số liệu cho /metrics/wallet-snapshots
+SNAPSHOT_METRICS: Dict[str, Any] = {
+    "last_run_at": None,
+    "last_as_of": None,
+    "last_created": 0,
+}
+
+
+async def get_wallet_of(session: AsyncSession, user_id: UUID) -> Optional[Wallet]:
+    result = await session.execute(select(Wallet).where(Wallet.user_id == user_id))
+    return result.scalars().first()
+
+
+async def fetch_transaction_page(
+    session: AsyncSession,
+    wallet_id: UUID,
+    after: Optional[Tuple[datetime, UUID]],
+    limit: int
+) -> Tuple[List[Any], Optional[Tuple[datetime, UUID]]]:
+    """
+    1 trang lịch sử (mới nhất trước): WHERE wallet_id = :w AND (created_at, id) < (:ts, :id).
+    Trả về (các dòng, vị trí để lấy trang sau | None nếu hết).
+    """
+    conditions = [Transaction.wallet_id == wallet_id]
+    if after is not None:
+        conditions.append(tuple_(Transaction.created_at, Transaction.id) < tuple_(*after))
+
+    # Lấy dư 1 dòng để biết còn trang sau hay không
+    result = await session.execute(
+        select(*TRANSACTION_COLUMNS)
+        .where(*conditions)
+        .order_by(Transaction.created_at.desc(), Transaction.id.desc())
+        .limit(limit + 1)
+    )
+    rows = result.all()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_position = (rows[-1].created_at, rows[-1].id) if has_more else None
+    return rows, next_position
+
+
+async def iter_transactions(
+    wallet_id: UUID,
+    chunk_size: int = HISTORY_EXPORT_CHUNK_SIZE
+) -> AsyncIterator[List[Any]]:
+    """Toàn bộ lịch sử theo thứ tự thời gian, từng chunk keyset (session riêng - dùng khi stream response)"""
+    after: Optional[Tuple[datetime, UUID]] = None
+    async with async_session_maker() as session:
+        while True:
+            conditions = [Transaction.wallet_id == wallet_id]
+            if after is not None:
+                conditions.append(tuple_(Transaction.created_at, Transaction.id) > tuple_(*after))
+            result = await session.execute(
+                select(*TRANSACTION_COLUMNS)
+                .where(*conditions)
+                .order_by(Transaction.created_at, Transaction.id)
+                .limit(chunk_size)
+            )
+            rows = result.all()
+            if not rows:
+                return
+            yield rows
+            if len(rows) < chunk_size:
+                return
+            after = (rows[-1].created_at, rows[-1].id)
+
+
+async def stream_transactions_csv(wallet_id: UUID) -> AsyncIterator[bytes]:
+    """CSV lịch sử giao dịch, mỗi chunk keyset => 1 phần body"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # BOM để Excel đọc đúng tiếng Việt
+    buffer.write("\ufeff")
+    writer.writerow(CSV_HEADER)
+
+    async for rows in iter_transactions(wallet_id):
+        for row in rows:
+            writer.writerow([
+                row.id,
+                row.created_at.isoformat(),
+                row.type,
+                row.amount,
+                row.balance_after if row.balance_after is not None else "",
+                row.description,
+            ])
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+async def balance_at(session: AsyncSession, wallet_id: UUID, at: datetime) -> Dict[str, Any]:
+    """
+    Số dư ví tại thời điểm `at` = snapshot gần nhất (as_of <= at)
+    + tổng giao dịch trong (snapshot.as_of, at] - chỉ quét phần sau snapshot.
+    """
+    result = await session.execute(
+        select(WalletBalanceSnapshot.balance, WalletBalanceSnapshot.as_of)
+        .where(WalletBalanceSnapshot.wallet_id == wallet_id, WalletBalanceSnapshot.as_of <= at)
+        .order_by(WalletBalanceSnapshot.as_of.desc())
+        .limit(1)
+    )
+    snapshot = result.first()
+
+    conditions = [Transaction.wallet_id == wallet_id, Transaction.created_at <= at]
+    if snapshot is not None:
+        conditions.append(Transaction.created_at > snapshot.as_of)
+    result = await session.execute(
+        select(func.coalesce(func.sum(Transaction.amount), 0), func.count()).where(*conditions)
+    )
+    total, counted = result.one()
+
+    base = snapshot.balance if snapshot is not None else Decimal("0")
+    return {
+        "balance": base + Decimal(total),
+        "at": at,
+        "snapshot_as_of": snapshot.as_of if snapshot is not None else None,
+        "transactions_summed": counted,
+    }
+
+
+async def reconcile_wallet(session: AsyncSession, wallet_id: UUID) -> Optional[Dict[str, Any]]:
+    """Đối soát: số dư lưu trong wallets so với snapshot + giao dịch sau snapshot (None nếu không có ví)"""
+    row = (await session.execute(RECONCILE_WALLET_SQL, {"wallet_id": wallet_id})).first()
+    if row is None:
+        return None
+    return {
+        "wallet_id": row.wallet_id,
+        "balance": row.balance,
+        "computed_balance": row.computed_balance,
+        "consistent": row.balance == row.computed_balance,
+        "snapshot_as_of": row.snapshot_as_of,
+        "transactions_summed": row.transactions_summed,
+    }
+
+
+async def create_balance_snapshots(session: AsyncSession, as_of: Optional[datetime] = None) -> int:
+    """
+    Tạo snapshot cho mọi ví có giao dịch mới. Advisory lock => nhiều worker chỉ 1 process chạy.
+    Trả về số snapshot đã tạo (-1 nếu process khác đang chạy).
+    """
+    as_of = as_of or datetime.utcnow() - WALLET_SNAPSHOT_LAG
+    locked = (await session.execute(
+        text("SELECT pg_try_advisory_xact_lock(:lock_id)"), {"lock_id": WALLET_SNAPSHOT_LOCK_ID}
+    )).scalar()
+    if not locked:
+        await session.rollback()
+        return -1
+
+    result = await session.execute(CREATE_SNAPSHOTS_SQL, {"as_of": as_of, "now": datetime.utcnow()})
+    await session.commit()
+
+    SNAPSHOT_METRICS["last_run_at"] = datetime.utcnow().isoformat()
+    SNAPSHOT_METRICS["last_as_of"] = as_of.isoformat()
+    SNAPSHOT_METRICS["last_created"] = result.rowcount
+    return result.rowcount
+
+
+async def run_snapshot_worker(stop_event: asyncio.Event):
+    """Vòng lặp tạo snapshot định kỳ - chạy tới khi stop_event được set"""
+    while not stop_event.is_set():
+        try:
+            async with async_session_maker() as session:
+                created = await create_balance_snapshots(session)
+            if created > 0:
+                print(f"📸 Đã tạo {created} snapshot số dư ví")
+        except Exception as e:
+            print(f"🚨 Lỗi tạo snapshot số dư ví: {e}")
+        try:
+            await asyncio.wait_for(stop_event.wait(), timeout=WALLET_SNAPSHOT_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
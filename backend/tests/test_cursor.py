@@ -0,0 +1,40 @@
+# tests/test_cursor.py
+import base64
+import json
+from datetime import datetime
+from uuid import uuid4
+
+import pytest
+
+cursor_module = pytest.importorskip("core.cursor")
+from fastapi import HTTPException  # noqa: E402
+
+
+def b64(payload) -> str:
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+
+
+def test_cursor_round_trip():
+    created_at, row_id = datetime(2026, 1, 31, 23, 59, 59, 123456), uuid4()
+    cursor = cursor_module.encode_cursor(created_at, row_id)
+
+    assert "=" not in cursor
+    assert cursor_module.decode_cursor(cursor) == (created_at, row_id)
+
+
+@pytest.mark.parametrize("cursor", [
+    "",
+    "???",
+    "không-phải-base64",
+    b64({}),
+    b64([1, 2]),
+    b64({"ts": 1, "id": str(uuid4())}),
+    b64({"ts": "2024-01-01T00:00:00", "id": 1}),
+    b64({"ts": "2024-01-01T00:00:00", "id": "không-phải-uuid"}),
+    b64({"ts": "hôm qua", "id": str(uuid4())}),
+])
+def test_invalid_cursor_is_400(cursor):
+    with pytest.raises(HTTPException) as error:
+        cursor_module.decode_cursor(cursor)
+    assert error.value.status_code == 400
+
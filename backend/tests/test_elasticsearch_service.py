@@ -0,0 +1,81 @@
+# tests/test_elasticsearch_service.py
+import asyncio
+
+import pytest
+
+es_service = pytest.importorskip("services.elasticsearch_service")
+from services.room_filters import AREA_RANGES, PRICE_RANGES  # noqa: E402
+
+SEARCH_DATA = {
+    "location": {"province": "Hà Nội", "district": "Đống Đa", "ward": "Láng"},
+    "filters": {"price": "3m-5m"},
+}
+
+
+def facet_filters(aggs: dict, facet: str) -> list:
+    query = aggs[facet]["filter"]
+    return query["bool"]["filter"] if "bool" in query else []
+
+
+def fields_of(clauses: list) -> set:
+    return {field for clause in clauses for query in clause.values() for field in query}
+
+
+# ===== FACET =====
+
+def test_each_facet_ignores_only_its_own_filter():
+    aggs = es_service.build_facet_aggs(SEARCH_DATA, PRICE_RANGES, AREA_RANGES)
+
+    assert fields_of(facet_filters(aggs, "province")) == {"district", "price"}
+    assert fields_of(facet_filters(aggs, "district")) == {"province", "price"}
+    assert fields_of(facet_filters(aggs, "price")) == {"province", "district"}
+    assert fields_of(facet_filters(aggs, "area")) == {"province", "district", "price"}
+
+
+def test_facet_filters_move_to_post_filter(monkeypatch):
+    requests = []
+
+    class FakeClient:
+        async def search(self, index, body):
+            requests.append(body)
+            return {"hits": {"total": {"value": 0}, "hits": []}, "aggregations": {}}
+
+    monkeypatch.setattr(es_service, "ES_ASYNC_CLIENT", FakeClient())
+    aggs = es_service.build_facet_aggs(SEARCH_DATA, PRICE_RANGES, AREA_RANGES)
+    asyncio.run(es_service.search_rooms_combined_async(None, SEARCH_DATA, facet_aggs=aggs))
+    asyncio.run(es_service.search_rooms_combined_async(None, SEARCH_DATA))
+
+    with_facets, without_facets = requests
+    # Ward không có facet => vẫn lọc ở query (áp cho cả hits lẫn facet)
+    assert fields_of(with_facets["query"]["bool"]["filter"]) == {"room_status", "ward"}
+    assert fields_of(with_facets["post_filter"]["bool"]["filter"]) == {"province", "district", "price"}
+    assert fields_of(without_facets["query"]["bool"]["filter"]) == {"room_status", "province", "district", "ward", "price"}
+    assert "post_filter" not in without_facets
+
+
+def test_parse_facet_aggs():
+    aggregations = {
+        facet: {"buckets": {"buckets": [{"key": f"{facet}-a", "doc_count": 3}]}}
+        for facet in ("price", "area", "province", "district")
+    }
+    counts = es_service.parse_facet_aggs(aggregations)
+    assert counts["province"] == {"province-a": 3}
+    assert counts["area"] == {"area-a": 3}
+
+
+# ===== REINDEX CHECKPOINT =====
+
+def test_delete_stale_checkpoints(tmp_path, monkeypatch):
+    monkeypatch.setattr(es_service, "REINDEX_CHECKPOINT_DIR", str(tmp_path))
+    prefix = es_service.ROOM_INDEX_PREFIX
+    for index_name in (f"{prefix}1", f"{prefix}2", f"{prefix}3", "other_v1"):
+        es_service._save_checkpoint(index_name, "room-id")
+
+    es_service._delete_stale_checkpoints({f"{prefix}2"})
+
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        "es_reindex_other_v1.checkpoint",
+        f"es_reindex_{prefix}2.checkpoint",
+    ]
+    assert es_service._load_checkpoint(f"{prefix}2") == "room-id"
+    assert es_service._load_checkpoint(f"{prefix}1") is None
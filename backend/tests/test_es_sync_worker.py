@@ -0,0 +1,100 @@
+# tests/test_es_sync_worker.py
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+import pytest
+
+es_sync_worker = pytest.importorskip("services.es_sync_worker")
+from models.models import Room, RoomIndexOutbox, User  # noqa: E402
+
+
+def fake_bulk(actions_seen: list, statuses: dict):
+    """async_streaming_bulk giả: ghi lại action, trả status theo _id (mặc định 200)"""
+    async def bulk(client, actions, **kwargs):
+        for action in actions:
+            actions_seen.append(action)
+            status_code = statuses.get(action["_id"], 200)
+            result = {"_id": action["_id"], "status": status_code}
+            if status_code >= 300:
+                result["error"] = {"type": f"error_{status_code}"}
+            yield status_code < 300, {action["_op_type"]: result}
+    return bulk
+
+
+def test_doc_version_follows_created_at():
+    first = RoomIndexOutbox(room_id=uuid4(), op="index", created_at=datetime(2026, 1, 1, 0, 0, 0, 1))
+    second = RoomIndexOutbox(room_id=uuid4(), op="index", created_at=datetime(2026, 1, 1, 0, 0, 0, 2))
+    assert es_sync_worker._doc_version(second) == es_sync_worker._doc_version(first) + 1
+
+
+def seed(add_all, landlord_email: str):
+    landlord = User(email=landlord_email, hashed_password="x", role="landlord")
+    room = Room(
+        landlord=landlord, title="Phòng 1", province="Hà Nội", district="Đống Đa",
+        ward="Láng Thượng", address_detail="Số 1", area=20, price=3000000, images=[]
+    )
+    add_all([landlord, room])
+    return room
+
+
+def test_batch_coalesces_per_room_with_external_versions(pg_session_run, monkeypatch):
+    actions = []
+    monkeypatch.setattr(es_sync_worker, "async_streaming_bulk", fake_bulk(actions, {}))
+    base = datetime.utcnow() - timedelta(minutes=1)
+
+    async def run(session):
+        room = seed(session.add_all, "outbox-coalesce@example.com")
+        deleted_room_id = uuid4()
+        entries = [
+            RoomIndexOutbox(room_id=room.id, op="index", created_at=base),
+            RoomIndexOutbox(room_id=deleted_room_id, op="index", created_at=base + timedelta(seconds=1)),
+            RoomIndexOutbox(room_id=room.id, op="index", created_at=base + timedelta(seconds=2)),
+            RoomIndexOutbox(room_id=deleted_room_id, op="delete", created_at=base + timedelta(seconds=3)),
+        ]
+        session.add_all(entries)
+        await session.flush()
+
+        count = await es_sync_worker.process_outbox_batch(session)
+        return room, deleted_room_id, entries, count
+
+    room, deleted_room_id, entries, count = pg_session_run(run)
+
+    assert count == 4
+    # 1 action cho mỗi phòng, version = thời điểm ghi outbox mới nhất của phòng đó
+    by_id = {action["_id"]: action for action in actions}
+    assert len(actions) == 2
+    assert by_id[str(room.id)]["_op_type"] == "index"
+    assert by_id[str(room.id)]["version"] == es_sync_worker._doc_version(entries[2])
+    assert by_id[str(room.id)]["_source"]["title"] == "Phòng 1"
+    assert by_id[str(deleted_room_id)]["_op_type"] == "delete"
+    assert by_id[str(deleted_room_id)]["version"] == es_sync_worker._doc_version(entries[3])
+    assert {action["version_type"] for action in actions} == {"external_gte"}
+    assert all(entry.processed_at is not None for entry in entries)
+
+
+def test_version_conflict_is_done_and_errors_are_retried(pg_session_run, monkeypatch):
+    async def run(session):
+        room = seed(session.add_all, "outbox-retry@example.com")
+        missing_room_id = uuid4()
+        entries = [
+            RoomIndexOutbox(room_id=room.id, op="index"),
+            RoomIndexOutbox(room_id=missing_room_id, op="delete"),
+        ]
+        session.add_all(entries)
+        await session.flush()
+
+        # 409: ES đã có version mới hơn => coi là xong; 500 => giữ lại để retry
+        monkeypatch.setattr(es_sync_worker, "async_streaming_bulk", fake_bulk(
+            [], {str(room.id): 409, str(missing_room_id): 500}
+        ))
+        before = datetime.utcnow()
+        await es_sync_worker.process_outbox_batch(session)
+        return entries, before
+
+    (done, failed), before = pg_session_run(run)
+
+    assert done.processed_at is not None and done.attempts == 0
+    assert failed.processed_at is None
+    assert failed.attempts == 1
+    assert "error_500" in failed.last_error
+    assert failed.next_attempt_at > before
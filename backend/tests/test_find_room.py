@@ -0,0 +1,76 @@
+# tests/test_find_room.py
+import pytest
+
+findroom = pytest.importorskip("api.findroom")
+postgresql = pytest.importorskip("sqlalchemy.dialects.postgresql")
+
+
+def compile_all(conditions: list) -> list:
+    return [condition.compile(dialect=postgresql.dialect()) for condition in conditions]
+
+
+def sql_of(conditions: list) -> str:
+    return " AND ".join(str(compiled) for compiled in compile_all(conditions))
+
+
+def params_of(conditions: list) -> list:
+    return [value for compiled in compile_all(conditions) for value in compiled.params.values()]
+
+
+# ===== build_room_filters =====
+
+def test_only_available_rooms_by_default():
+    conditions = findroom.build_room_filters({})
+    assert len(conditions) == 1
+    assert "rooms.room_status = " in sql_of(conditions)
+    assert params_of(conditions) == ["available"]
+
+
+def test_location_filters_use_normalized_columns():
+    conditions = findroom.build_room_filters({
+        "location": {"province": "Thành phố  Hà Nội", "district": "Đống Đa", "ward": ""}
+    })
+    sql = sql_of(conditions)
+
+    assert "rooms.province_norm LIKE" in sql
+    assert "rooms.district_norm LIKE" in sql
+    assert "ward_norm" not in sql
+    assert "thanh pho ha noi" in params_of(conditions)
+    assert "dong da" in params_of(conditions)
+
+
+def test_location_filter_escapes_like_wildcards():
+    conditions = findroom.build_room_filters({"location": {"ward": "50%_x"}})
+    assert "ESCAPE '/'" in sql_of(conditions)
+    assert "50/%/_x" in params_of(conditions)
+
+
+def test_range_filters_slug_and_custom_bounds():
+    conditions = findroom.build_room_filters({
+        "filters": {"price": "3m-5m", "area": {"min": "20", "max": 30}}
+    })
+    sql = sql_of(conditions)
+    params = params_of(conditions)
+
+    assert "rooms.price >= " in sql and "rooms.price < " in sql
+    assert "rooms.area >= " in sql and "rooms.area <= " in sql
+    assert {3_000_000, 5_000_000, 20.0, 30.0} <= set(params)
+
+
+def test_unknown_slug_and_bad_bounds_are_ignored():
+    conditions = findroom.build_room_filters({
+        "filters": {"price": "1-ty", "area": {"min": "abc"}}
+    })
+    assert len(conditions) == 1
+
+
+def test_es_range_clause_matches_sql_bounds():
+    room_filters = pytest.importorskip("services.room_filters")
+
+    # Slug: min tính, max không tính (giống range aggregation); khoảng tùy ý: tính cả 2 đầu
+    assert room_filters.es_range_clause("price", "3m-5m") == {"range": {"price": {"gte": 3_000_000, "lt": 5_000_000}}}
+    assert room_filters.es_range_clause("area", {"max": "30"}) == {"range": {"area": {"lte": 30.0}}}
+    assert room_filters.es_range_clause("price", "1-ty") is None
+    assert room_filters.normalize_range_filters({"price": "3m-5m", "area": {"min": 20}}) == (
+        ("price", "3m-5m"), ("area", 20.0, None)
+    )
@@ -0,0 +1,179 @@
+# tests/test_matching.py
+from uuid import uuid4
+
+import pytest
+
+np = pytest.importorskip("numpy")
+matching_service = pytest.importorskip("services.matching_service")
+
+
+def make_block(size: int, max_matches: int = 3, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    matrix = (rng.uniform(-1, 1, (size, matching_service.HABIT_DIM)) * matching_service.HABIT_WEIGHTS).astype(np.float32)
+    return matching_service.MatchBlock(("truong", "female", "needs_room"), [uuid4() for _ in range(size)], matrix, [max_matches] * size)
+
+
+def brute_force_top_k(block, budgets, excluded):
+    expected = {}
+    for i in range(len(block)):
+        candidates = []
+        for j in range(len(block)):
+            if j == i or j in excluded.get(i, set()):
+                continue
+            distance = float(np.sum((block.matrix[i] - block.matrix[j]) ** 2))
+            candidates.append((1.0 - distance / matching_service.MAX_SQ_DISTANCE, j))
+        candidates.sort(reverse=True)
+        expected[i] = candidates[:budgets[i]]
+    return expected
+
+
+# ===== encode / score =====
+
+def test_encode_habits():
+    assert not matching_service.encode_habits(None).any()
+
+    vector = matching_service.encode_habits({"sleep_time": "LATE", "cleanliness": 5, "smoking": "không", "pets": True})
+    features = [key for key, _, _ in matching_service.HABIT_FEATURES]
+    weights = dict(zip(features, matching_service.HABIT_WEIGHTS))
+    assert vector[features.index("sleep_time")] == pytest.approx(weights["sleep_time"])
+    assert vector[features.index("cleanliness")] == pytest.approx(weights["cleanliness"])
+    assert vector[features.index("smoking")] == pytest.approx(-weights["smoking"])
+    assert vector[features.index("pets")] == pytest.approx(weights["pets"])
+    assert vector[features.index("guests")] == 0
+
+
+def test_score_rows_range_and_identity():
+    high = matching_service.HABIT_WEIGHTS[None, :]
+    matrix = np.vstack([high, -high, np.zeros_like(high)]).astype(np.float32)
+    scores = matching_service.score_rows(matrix, matrix, (matrix * matrix).sum(axis=1))
+
+    assert scores.shape == (3, 3)
+    assert np.allclose(np.diag(scores), 1.0)
+    assert scores[0, 1] == pytest.approx(0.0, abs=1e-6)
+    assert scores[0, 2] == pytest.approx(0.75, abs=1e-6)
+    assert ((scores >= 0) & (scores <= 1 + 1e-6)).all()
+
+
+# ===== top_k_for_block =====
+
+@pytest.mark.parametrize("score_cells", [7, 16 * 1024 * 1024])
+def test_top_k_matches_brute_force(monkeypatch, score_cells):
+    # score_cells nhỏ => chấm điểm theo nhiều lô dòng
+    monkeypatch.setattr(matching_service, "MATCH_SCORE_CELLS", score_cells)
+    block = make_block(25)
+    budgets = np.array([i % 5 for i in range(len(block))])
+    excluded = {0: {1, 2, 3}, 7: set(range(25)) - {7, 8}}
+
+    pairs = matching_service.top_k_for_block(block, budgets, excluded)
+    expected = brute_force_top_k(block, budgets, excluded)
+
+    got = {}
+    for i, j, score in pairs:
+        got.setdefault(i, []).append((score, j))
+    for i in range(len(block)):
+        assert [j for _, j in got.get(i, [])] == [j for _, j in expected[i]]
+        assert [score for score, _ in got.get(i, [])] == pytest.approx([score for score, _ in expected[i]], abs=1e-5)
+    assert got[7] == [] or [j for _, j in got[7]] == [8]
+
+
+def test_top_k_small_blocks():
+    block = make_block(1)
+    assert matching_service.top_k_for_block(block, block.max_matches, {}) == []
+    block = make_block(4)
+    assert matching_service.top_k_for_block(block, np.zeros(4, dtype=np.int64), {}) == []
+
+
+# ===== rematch_profile (cần Postgres) =====
+
+MATCH_SCHOOL = "ĐH Bách Khoa"
+
+
+def random_habits(rng) -> dict:
+    # Thang điểm liên tục => gần như không có 2 cặp trùng điểm (thứ tự top-k xác định)
+    return {
+        "sleep_time": str(rng.choice(["early", "normal", "late"])),
+        "cleanliness": float(rng.uniform(1, 5)),
+        "noise_tolerance": float(rng.uniform(1, 5)),
+        "guests": str(rng.choice(["rarely", "sometimes", "often"])),
+        "smoking": bool(rng.integers(2)),
+        "pets": bool(rng.integers(2)),
+    }
+
+
+async def seed_profiles(session, rng, count: int):
+    from models.models import Match, User, UserProfile
+
+    profiles = []
+    for i in range(count):
+        user = User(email=f"match-{i}@example.com", hashed_password="x")
+        profiles.append(UserProfile(
+            user=user, full_name=f"Sinh viên {i}", age=20, gender="female" if i % 5 else "male",
+            school=MATCH_SCHOOL, habits=random_habits(rng), contact_info={}, max_matches=3,
+        ))
+    session.add_all(profiles)
+    await session.flush()
+    # Cặp đã accepted: không gợi ý lại, trừ vào max_matches
+    session.add(Match(user1_id=profiles[1].user_id, user2_id=profiles[2].user_id, status="accepted"))
+    await session.flush()
+    return profiles
+
+
+async def pending_matches(session) -> dict:
+    from models.models import Match
+    from sqlmodel import select
+
+    result = await session.execute(
+        select(Match.user1_id, Match.user2_id, Match.match_score).where(Match.status == "pending")
+    )
+    return {(user1_id, user2_id): score for user1_id, user2_id, score in result.all()}
+
+
+def change_habits(profile, rng):
+    profile.habits = random_habits(rng)
+
+
+def invert_habits(profile, rng):
+    # Điểm với những người đang gợi ý profile này giảm mạnh => danh sách của họ phải đổi
+    habits = dict(profile.habits)
+    habits["cleanliness"] = 6 - habits["cleanliness"]
+    habits["noise_tolerance"] = 6 - habits["noise_tolerance"]
+    habits["smoking"] = not habits["smoking"]
+    habits["pets"] = not habits["pets"]
+    profile.habits = habits
+
+
+def deactivate(profile, rng):
+    profile.is_active = False
+
+
+def change_block(profile, rng):
+    profile.status = "has_room"
+
+
+def change_max_matches(profile, rng):
+    profile.max_matches = 1
+
+
+@pytest.mark.parametrize("change", [change_habits, invert_habits, deactivate, change_block, change_max_matches])
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_rematch_profile_matches_full_recompute(pg_session_run, monkeypatch, change, seed):
+    monkeypatch.setattr(matching_service, "MATCH_BLOCK_CACHE", matching_service.MatchBlockCache())
+    rng = np.random.default_rng(seed)
+
+    async def run(session):
+        profiles = await seed_profiles(session, rng, 30)
+        await matching_service.run_full_matching(session)
+
+        for profile in profiles[:4]:
+            change(profile, rng)
+            await session.flush()
+            await matching_service.rematch_profile(session, profile.user_id)
+        incremental = await pending_matches(session)
+
+        await matching_service.run_full_matching(session)
+        return incremental, await pending_matches(session)
+
+    incremental, full = pg_session_run(run)
+
+    assert sorted(incremental) == sorted(full)
+    assert [incremental[pair] for pair in sorted(full)] == pytest.approx([full[pair] for pair in sorted(full)], abs=1e-5)
@@ -0,0 +1,113 @@
+# tests/test_room_api.py
+import asyncio
+from types import SimpleNamespace
+from uuid import uuid4
+
+import pytest
+
+roomapi = pytest.importorskip("api.roomapi")
+from fastapi import HTTPException  # noqa: E402
+
+
+# ===== room_status =====
+
+@pytest.mark.parametrize("value", ["available", "rented"])
+def test_validate_room_status(value):
+    assert roomapi.validate_room_status(value) == value
+
+
+@pytest.mark.parametrize("value", ["sold", "", "Available", None, 1, ["available"]])
+def test_validate_room_status_rejects(value):
+    with pytest.raises(HTTPException) as error:
+        roomapi.validate_room_status(value)
+    assert error.value.status_code == 400
+
+
+# ===== area / price =====
+
+@pytest.mark.parametrize("value, expected", [(3500000, 3500000.0), ("1.5e6", 1500000.0), (0.01, 0.01)])
+def test_parse_room_price(value, expected):
+    assert roomapi.parse_room_price(value) == expected
+
+
+@pytest.mark.parametrize("value", ["nan", "inf", "-inf", float("nan"), 0, -1, 10 ** 15, "abc", None, True, {}])
+def test_parse_room_price_rejects(value):
+    with pytest.raises(HTTPException) as error:
+        roomapi.parse_room_price(value)
+    assert error.value.status_code == 400
+
+
+@pytest.mark.parametrize("value", ["nan", "inf", 0, 1000.5, "25m2"])
+def test_parse_room_area_rejects(value):
+    with pytest.raises(HTTPException) as error:
+        roomapi.parse_room_area(value)
+    assert error.value.status_code == 400
+
+
+# ===== PATCH /rooms/bulk =====
+
+def test_bulk_update_rejects_invalid_values():
+    landlord = SimpleNamespace(id=uuid4(), role="landlord")
+    for body in (
+        {"room_ids": [str(uuid4())], "room_status": "sold"},
+        {"room_ids": [str(uuid4())], "price": "nan"},
+        {"room_ids": [str(uuid4())], "price": "inf"},
+    ):
+        with pytest.raises(HTTPException) as error:
+            asyncio.run(roomapi.bulk_update_rooms(body, user=landlord, session=None))
+        assert error.value.status_code == 400
+
+
+def test_bulk_update_only_touches_own_rooms(pg_session_run, monkeypatch):
+    from models.models import Room, RoomIndexOutbox, User
+    from sqlmodel import select
+
+    indexed = []
+
+    async def fake_process_outbox_batch(session, entry_ids):
+        indexed.extend(entry_ids)
+
+    # Không cần ES: chỉ kiểm tra dòng outbox được đẩy đi index ngay
+    monkeypatch.setattr(roomapi, "process_outbox_batch", fake_process_outbox_batch)
+
+    async def run(session):
+        owner = User(email="bulk-owner@example.com", hashed_password="x", role="landlord")
+        other = User(email="bulk-other@example.com", hashed_password="x", role="landlord")
+        session.add_all([owner, other])
+        await session.flush()
+        rooms = [
+            Room(
+                landlord_id=landlord.id, title=f"Phòng {i}", province="Hà Nội", district="Đống Đa",
+                ward="Láng Thượng", address_detail=f"Số {i}", area=20, price=3000000, images=[]
+            )
+            for i, landlord in enumerate([owner, owner, other])
+        ]
+        session.add_all(rooms)
+        await session.flush()
+        missing_id = uuid4()
+
+        response = await roomapi.bulk_update_rooms(
+            {
+                "room_ids": [str(room.id) for room in rooms] + [str(rooms[0].id), str(missing_id)],
+                "room_status": "rented",
+                "price": "3500000",
+            },
+            user=owner,
+            session=session,
+        )
+
+        statuses = dict((await session.execute(
+            select(Room.id, Room.room_status).where(Room.id.in_([room.id for room in rooms]))
+        )).all())
+        outbox = (await session.scalars(
+            select(RoomIndexOutbox.room_id).where(RoomIndexOutbox.id.in_(indexed))
+        )).all()
+        return rooms, missing_id, response, statuses, outbox
+
+    rooms, missing_id, response, statuses, outbox = pg_session_run(run)
+
+    assert response["updated"] == 2
+    assert {room["id"] for room in response["rooms"]} == {str(rooms[0].id), str(rooms[1].id)}
+    assert response["skipped_ids"] == [str(rooms[2].id), str(missing_id)]
+    assert statuses == {rooms[0].id: "rented", rooms[1].id: "rented", rooms[2].id: "available"}
+    assert sorted(outbox) == sorted([rooms[0].id, rooms[1].id])
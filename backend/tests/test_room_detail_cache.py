@@ -0,0 +1,109 @@
+# tests/test_room_detail_cache.py
+import asyncio
+from uuid import uuid4
+
+import pytest
+
+room_detail_cache = pytest.importorskip("services.room_detail_cache")
+
+
+def counting_loader(calls: list, data=None, delay: float = 0.01):
+    async def loader(room_id):
+        calls.append(room_id)
+        await asyncio.sleep(delay)
+        return data if data is not None else {"id": str(room_id), "title": "Phòng 1"}
+    return loader
+
+
+# ===== SINGLE-FLIGHT =====
+
+def test_concurrent_misses_load_once():
+    cache = room_detail_cache.RoomDetailCache()
+    room_id = uuid4()
+    calls = []
+
+    async def run():
+        loader = counting_loader(calls)
+        return await asyncio.gather(*(cache.get_or_load(room_id, loader) for _ in range(10)))
+
+    results = asyncio.run(run())
+
+    assert calls == [room_id]
+    assert len(set(results)) == 1
+    assert cache.stats["misses"] == 1 and cache.stats["coalesced"] == 9
+
+    # Lần sau đọc từ cache, không gọi loader
+    asyncio.run(cache.get_or_load(room_id, counting_loader(calls)))
+    assert len(calls) == 1 and cache.stats["hits"] == 1
+
+
+def test_invalidate_during_load_is_not_cached():
+    cache = room_detail_cache.RoomDetailCache()
+    room_id = uuid4()
+    calls = []
+
+    async def run():
+        loading = asyncio.ensure_future(cache.get_or_load(room_id, counting_loader(calls, delay=0.05)))
+        await asyncio.sleep(0.01)
+        cache.invalidate(room_id)
+        await loading
+        # Kết quả đọc trước lúc phòng bị sửa không được lưu => đọc lại
+        return await cache.get_or_load(room_id, counting_loader(calls, delay=0))
+
+    asyncio.run(run())
+    assert len(calls) == 2
+
+
+def test_missing_room_is_not_cached():
+    cache = room_detail_cache.RoomDetailCache()
+    room_id = uuid4()
+    calls = []
+
+    async def missing(room_id):
+        calls.append(room_id)
+        return None
+
+    assert asyncio.run(cache.get_or_load(room_id, missing)) is None
+    assert asyncio.run(cache.get_or_load(room_id, missing)) is None
+    assert len(calls) == 2
+
+
+# ===== ETAG / 304 =====
+
+@pytest.fixture
+def findroom(monkeypatch):
+    findroom = pytest.importorskip("api.findroom")
+    monkeypatch.setattr(findroom, "ROOM_DETAIL_CACHE", room_detail_cache.RoomDetailCache())
+    return findroom
+
+
+def test_room_detail_etag_and_304(findroom, monkeypatch):
+    monkeypatch.setattr(findroom, "load_room_detail", counting_loader([]))
+    room_id = uuid4()
+
+    response = asyncio.run(findroom.get_room_detail(room_id, if_none_match=None))
+    etag = response.headers["etag"]
+    assert response.status_code == 200
+    assert etag == room_detail_cache.make_etag(response.body)
+    assert "private" in response.headers["cache-control"]
+
+    for if_none_match in (etag, f'"khac", {etag}'):
+        response = asyncio.run(findroom.get_room_detail(room_id, if_none_match=if_none_match))
+        assert response.status_code == 304
+        assert response.headers["etag"] == etag
+        assert not response.body
+
+    response = asyncio.run(findroom.get_room_detail(room_id, if_none_match='"khac"'))
+    assert response.status_code == 200
+
+
+def test_room_detail_404(findroom, monkeypatch):
+    from fastapi import HTTPException
+
+    async def missing(room_id):
+        return None
+
+    monkeypatch.setattr(findroom, "load_room_detail", missing)
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(findroom.get_room_detail(uuid4(), if_none_match=None))
+    assert error.value.status_code == 404
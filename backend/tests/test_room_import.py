@@ -0,0 +1,164 @@
+# tests/test_room_import.py
+import asyncio
+import json
+from datetime import datetime
+
+import pytest
+
+room_import = pytest.importorskip("services.room_import")
+sqlalchemy = pytest.importorskip("sqlalchemy")
+
+
+def collect(data: bytes, fmt: str, chunk_size: int = 7) -> list:
+    """Chạy iter_records trên body chia thành các chunk nhỏ (cắt cả giữa ký tự UTF-8 nhiều byte)"""
+    async def stream():
+        for start in range(0, len(data), chunk_size):
+            yield data[start:start + chunk_size]
+
+    async def run():
+        return [item async for item in room_import.iter_records(stream(), fmt)]
+
+    return asyncio.run(run())
+
+
+def valid_record(**overrides) -> dict:
+    record = {
+        "title": "Phòng trọ gần ĐH Bách Khoa",
+        "province": "Hà Nội",
+        "district": "Hai Bà Trưng",
+        "ward": "Bách Khoa",
+        "address_detail": "Số 1 Tạ Quang Bửu",
+        "area": 25,
+        "price": 3500000,
+    }
+    record.update(overrides)
+    return record
+
+
+# ===== PARSE =====
+
+def test_jsonl_records_keep_line_numbers():
+    data = "\n".join([
+        json.dumps(valid_record(), ensure_ascii=False),
+        "",
+        "{not json",
+        "[1, 2]",
+        json.dumps(valid_record(title="Phòng 2"), ensure_ascii=False),
+    ]).encode()
+    records = collect(data, "jsonl")
+
+    assert [line_no for line_no, _ in records] == [1, 3, 4, 5]
+    assert records[0][1]["province"] == "Hà Nội"
+    assert isinstance(records[1][1], ValueError)
+    assert isinstance(records[2][1], ValueError)
+    assert records[3][1]["title"] == "Phòng 2"
+
+
+def test_csv_quoted_newline_and_bom():
+    data = (
+        "\ufefftitle,province,district,ward,address_detail,area,price,images\n"
+        '"Phòng ""đẹp""\nview hồ",Hà Nội,Ba Đình,Kim Mã,Số 2,20,3000000,a.jpg| b.jpg\n'
+        "Phòng 2,Hà Nội,Ba Đình,Kim Mã,Số 3,18\n"
+    ).encode("utf-8")
+    records = collect(data, "csv")
+
+    assert [line_no for line_no, _ in records] == [2, 4]
+    record = records[0][1]
+    assert record["title"] == 'Phòng "đẹp"\nview hồ'
+    assert record["images"] == ["a.jpg", "b.jpg"]
+    assert isinstance(records[1][1], ValueError)
+
+
+def test_csv_unclosed_quote_is_bounded(monkeypatch):
+    monkeypatch.setattr(room_import, "CSV_MAX_RECORD_LINES", 3)
+    data = ('title,price\n"mở ngoặc,1\n' + "x,2\n" * 5).encode()
+    records = collect(data, "csv")
+
+    assert isinstance(records[0][1], Exception)
+    assert records[0][0] == 2
+    assert len(records) < 6
+
+
+# ===== STAGE =====
+
+def test_stage_records_types_and_norm_columns():
+    staged, errors = room_import.stage_records([
+        (1, valid_record(images=["a.jpg"])),
+        (2, ValueError("hỏng")),
+        (3, valid_record(images="a.jpg")),
+        (4, valid_record(price={"value": 1}, room_status=True)),
+    ])
+
+    assert [error["line"] for error in errors] == [2, 3]
+    assert [row[0] for row in staged] == [1, 4]
+
+    row = dict(zip(room_import.STAGE_COLUMNS, staged[0]))
+    assert row["area"] == "25" and row["price"] == "3500000"
+    assert json.loads(row["images"]) == ["a.jpg"]
+    assert row["province_norm"] == "ha noi"
+    assert row["district_norm"] == "hai ba trung"
+
+    # Sai kiểu JSON => chuỗi rỗng, SQL báo thiếu trường
+    row = dict(zip(room_import.STAGE_COLUMNS, staged[1]))
+    assert row["price"] == "" and row["room_status"] == ""
+
+
+# ===== VALIDATE (SQL, cần Postgres) =====
+
+def test_reject_invalid_sql(pg_connection):
+    staged, errors = room_import.stage_records([
+        (1, valid_record()),
+        (2, valid_record(title="")),
+        (3, valid_record(area="25m2")),
+        (4, valid_record(area=0)),
+        (5, valid_record(price=-1)),
+        (6, valid_record(room_status="sold")),
+        (7, valid_record(room_status="rented", area="1e2", price=" 1.5e6 ")),
+        # Lỗi CAST lúc INSERT làm hỏng cả chunk => phải thành lỗi của từng dòng
+        (8, valid_record(price="1e400")),
+        (9, valid_record(area="1e-400")),
+        (10, valid_record(price="1e4000")),
+        (11, valid_record(price="1e-320")),
+    ])
+    assert not errors
+
+    pg_connection.execute(room_import.CREATE_STAGE_SQL)
+    columns = room_import.STAGE_COLUMNS
+    placeholders = ", ".join(
+        f"CAST(:{column} AS jsonb)" if column == "images" else f":{column}" for column in columns
+    )
+    pg_connection.execute(
+        sqlalchemy.text(f"INSERT INTO room_import_stage ({', '.join(columns)}) VALUES ({placeholders})"),
+        [dict(zip(columns, row)) for row in staged]
+    )
+
+    rejected = dict(pg_connection.execute(
+        room_import.REJECT_INVALID_SQL,
+        {"statuses": room_import.ROOM_STATUSES, "max_price": room_import.MAX_ROOM_PRICE}
+    ).all())
+
+    assert sorted(rejected) == [2, 3, 4, 5, 6, 8, 9, 10, 11]
+    assert rejected[2] == "Thiếu trường bắt buộc: title"
+    assert rejected[3] == "Diện tích và giá phải là số"
+    assert rejected[4] == "Diện tích phải > 0 và <= 1000"
+    assert rejected[5] == "Giá phải > 0"
+    assert rejected[6].startswith("room_status phải là một trong")
+    assert rejected[8] == "Giá quá lớn"
+    assert rejected[9] == "Diện tích phải > 0 và <= 1000"
+    assert rejected[10] == "Diện tích và giá phải là số"
+    assert rejected[11] == "Giá phải > 0"
+
+    remaining = pg_connection.execute(
+        sqlalchemy.text("SELECT line_no FROM room_import_stage ORDER BY line_no")
+    ).scalars().all()
+    assert remaining == [1, 7]
+
+    # Dòng còn lại INSERT được (CAST sang double precision không lỗi)
+    landlord_id = pg_connection.execute(sqlalchemy.text(
+        "INSERT INTO users (id, email, hashed_password, is_active, is_superuser, is_verified, role, created_at) "
+        "VALUES (gen_random_uuid(), 'import-test@example.com', 'x', true, false, true, 'landlord', now()) RETURNING id"
+    )).scalar()
+    outbox_ids = pg_connection.execute(
+        room_import.INSERT_STAGED_SQL, {"landlord_id": landlord_id, "now": datetime.utcnow()}
+    ).scalars().all()
+    assert len(outbox_ids) == 2
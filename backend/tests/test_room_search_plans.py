@@ -0,0 +1,68 @@
+# tests/test_room_search_plans.py
+"""
+Regression test kế hoạch truy vấn (cần Postgres, xem conftest.py): bộ lọc địa chỉ của
+/search phải dùng GIN trigram index trên cột *_norm, lọc giá / diện tích dùng index
+(room_status, price|area). Đổi build_room_filters hoặc index mà làm mất index scan => test fail.
+"""
+import pytest
+
+findroom = pytest.importorskip("api.findroom")
+sqlalchemy = pytest.importorskip("sqlalchemy")
+
+from models.models import Room  # noqa: E402
+
+ROOM_COUNT = 5000
+
+SEED_SQL = """
+WITH landlord AS (
+    INSERT INTO users (id, email, hashed_password, is_active, is_superuser, is_verified, role, created_at)
+    VALUES (gen_random_uuid(), 'plan-test-landlord@example.com', 'x', true, false, true, 'landlord', now())
+    RETURNING id
+)
+INSERT INTO rooms (
+    id, landlord_id, title, province, district, ward, address_detail, area, price,
+    room_status, images, created_at, province_norm, district_norm, ward_norm
+)
+SELECT gen_random_uuid(), landlord.id, 'Phòng ' || i,
+       'Tỉnh ' || (i %% 60), 'Quận ' || (i %% 300), 'Phường ' || i, 'Số ' || i,
+       10 + (i %% 90), 1000000 + (i %% 100) * 100000,
+       CASE WHEN i %% 10 = 0 THEN 'rented' ELSE 'available' END,
+       '[]'::jsonb, now() - i * interval '1 minute',
+       'tinh ' || (i %% 60), 'quan ' || (i %% 300), 'phuong ' || i
+FROM landlord, generate_series(1, %(count)s) AS i
+"""
+
+
+@pytest.fixture
+def seeded(pg_connection):
+    pg_connection.exec_driver_sql(SEED_SQL, {"count": ROOM_COUNT})
+    pg_connection.exec_driver_sql("ANALYZE rooms")
+    # Bảng nhỏ => planner có thể chọn seq scan dù index dùng được; chỉ kiểm tra index CÓ được dùng
+    pg_connection.exec_driver_sql("SET LOCAL enable_seqscan = off")
+    return pg_connection
+
+
+def explain(conn, search_data: dict) -> str:
+    statement = sqlalchemy.select(Room.id).where(*findroom.build_room_filters(search_data))
+    compiled = statement.compile(conn)
+    rows = conn.exec_driver_sql(f"EXPLAIN {compiled}", compiled.params).all()
+    return "\n".join(row[0] for row in rows)
+
+
+@pytest.mark.parametrize("field, value, index", [
+    ("province", "Tỉnh 42", "ix_rooms_province_norm_trgm"),
+    ("district", "quận 123", "ix_rooms_district_norm_trgm"),
+    ("ward", "Phường 4321", "ix_rooms_ward_norm_trgm"),
+])
+def test_location_filter_uses_trigram_index(seeded, field, value, index):
+    plan = explain(seeded, {"location": {field: value}})
+    assert index in plan, plan
+
+
+@pytest.mark.parametrize("field, spec, index", [
+    ("price", {"min": 1000000, "max": 1050000}, "ix_rooms_status_price"),
+    ("area", {"min": 10, "max": 10.5}, "ix_rooms_status_area"),
+])
+def test_range_filter_uses_status_index(seeded, field, spec, index):
+    plan = explain(seeded, {"filters": {field: spec}})
+    assert index in plan, plan
@@ -0,0 +1,99 @@
+# tests/test_search_cache.py
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+search_cache = pytest.importorskip("services.search_cache")
+
+
+def room(province: str, district: str = "Quận 1", ward: str = "Phường 1"):
+    return SimpleNamespace(province=province, district=district, ward=ward)
+
+
+def cached_keys(cache, entries: dict) -> dict:
+    """Ghi các entry {tên: (scope, search_data)} vào cache, trả về {tên: key}"""
+    keys = {}
+    for name, (scope, search_data) in entries.items():
+        key, location = cache.make_key(scope, search_data, page=1)
+        asyncio.run(cache.set(key, location, {"name": name}))
+        keys[name] = key
+    return keys
+
+
+# ===== KEY =====
+
+def test_equivalent_requests_share_key():
+    cache = search_cache.SearchCache()
+    key, location = cache.make_key("search", {"location": {"province": "Thành phố  Hà Nội"}}, page=1, limit=20)
+    same, _ = cache.make_key("search", {"location": {"province": "thanh pho ha noi", "ward": ""}}, limit=20, page=1)
+
+    assert key == same
+    assert key.startswith("sql:")
+    assert location == (("province", "thanh pho ha noi"),)
+    assert cache.make_key("combined", {"location": {"province": "Hà Nội"}})[0].startswith("es:")
+    assert cache.make_key("search", {"filters": {"price": "3m-5m"}}, page=1)[0] != \
+        cache.make_key("search", {"filters": {"price": "5m-7m"}}, page=1)[0]
+    assert cache.make_key("search", {}, page=1)[0] != cache.make_key("search", {}, page=2)[0]
+
+
+# ===== INVALIDATION =====
+
+def test_invalidate_only_matching_group_and_location():
+    cache = search_cache.SearchCache()
+    keys = cached_keys(cache, {
+        "ha_noi": ("search", {"location": {"province": "Hà Nội"}}),
+        "da_nang": ("search", {"location": {"province": "Đà Nẵng"}}),
+        "all": ("search", {}),
+        "es_ha_noi": ("combined", {"location": {"province": "Hà Nội"}}),
+    })
+
+    cache.invalidate_local(["sql"], [search_cache.room_location(room("Thành phố Hà Nội"))])
+
+    assert asyncio.run(cache.get(keys["ha_noi"])) is None
+    assert asyncio.run(cache.get(keys["all"])) is None
+    assert asyncio.run(cache.get(keys["da_nang"])) == {"name": "da_nang"}
+    # Nhóm "es" chỉ xóa khi ES đã có thay đổi
+    assert asyncio.run(cache.get(keys["es_ha_noi"])) == {"name": "es_ha_noi"}
+
+
+def test_invalidate_without_locations_clears_whole_group():
+    cache = search_cache.SearchCache()
+    keys = cached_keys(cache, {
+        "da_nang": ("search", {"location": {"province": "Đà Nẵng"}}),
+        "es_da_nang": ("keyword", {"location": {"province": "Đà Nẵng"}}),
+    })
+
+    cache.invalidate_local(["es"])
+
+    assert asyncio.run(cache.get(keys["es_da_nang"])) is None
+    assert asyncio.run(cache.get(keys["da_nang"])) == {"name": "da_nang"}
+
+
+def test_expired_and_evicted_entries_are_misses(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(search_cache.time, "monotonic", lambda: now[0])
+    cache = search_cache.SearchCache(maxsize=2, ttl=30)
+    keys = cached_keys(cache, {name: ("search", {"location": {"ward": name}}) for name in ("a", "b", "c")})
+
+    assert asyncio.run(cache.get(keys["a"])) is None  # LRU: bị đẩy ra khi thêm "c"
+    assert asyncio.run(cache.get(keys["c"])) == {"name": "c"}
+    now[0] += 31
+    assert asyncio.run(cache.get(keys["c"])) is None
+
+
+def test_invalidation_messages_fall_back_to_whole_group():
+    cache_invalidation = pytest.importorskip("services.cache_invalidation")
+    rooms = [room(f"Tỉnh {i}") for i in range(cache_invalidation.MAX_NOTIFY_ROOMS + 1)]
+    detail_ids = list(range(cache_invalidation.MAX_NOTIFY_DETAIL_IDS + 1))
+
+    messages = [json.loads(m["payload"]) for m in cache_invalidation.invalidation_messages(["sql"], rooms, detail_ids)]
+
+    # Quá nhiều địa chỉ cho 1 payload NOTIFY => xóa cả nhóm; id chi tiết chia thành nhiều thông báo
+    assert messages[0]["groups"] == ["sql"] and messages[0]["rooms"] is None
+    assert [len(m["detail"]) for m in messages] == [cache_invalidation.MAX_NOTIFY_DETAIL_IDS, 1]
+    assert messages[1]["groups"] == []
+
+    (message,) = [json.loads(m["payload"]) for m in cache_invalidation.invalidation_messages(["sql"], rooms[:1])]
+    assert message["rooms"] == [{"province": "tinh 0", "district": "quan 1", "ward": "phuong 1"}]
@@ -0,0 +1,81 @@
+# tests/test_wallet.py
+import asyncio
+from decimal import Decimal
+from uuid import uuid4
+
+import pytest
+
+ledger_service = pytest.importorskip("services.ledger_service")
+walletapi = pytest.importorskip("api.walletapi")
+from fastapi import HTTPException  # noqa: E402
+
+
+# ===== to_money =====
+
+@pytest.mark.parametrize("value, expected", [
+    ("150000", Decimal("150000.00")),
+    (5, Decimal("5.00")),
+    (0.1, Decimal("0.10")),
+    ("-20000.5", Decimal("-20000.50")),
+    (Decimal("1.005"), Decimal("1.00")),
+    ("9999999999999999.99", Decimal("9999999999999999.99")),
+])
+def test_to_money(value, expected):
+    assert ledger_service.to_money(value) == expected
+
+
+@pytest.mark.parametrize("value", [True, False, None, "abc", 0, "0.001", "NaN", "Infinity", [1],
+                                   "1e16", "-1e17", "9999999999999999.995", "1e400"])
+def test_to_money_rejects(value):
+    with pytest.raises(ledger_service.LedgerError):
+        ledger_service.to_money(value)
+
+
+# ===== post_transactions =====
+
+class OverflowSession:
+    """Session giả: câu lệnh ledger lỗi tràn NUMERIC như Postgres"""
+
+    def __init__(self):
+        self.rolled_back = False
+
+    async def execute(self, statement, params=None):
+        raise ledger_service.DataError("UPDATE wallets ...", params, Exception("numeric field overflow"))
+
+    async def rollback(self):
+        self.rolled_back = True
+
+
+def test_post_transactions_overflow_is_ledger_error():
+    session = OverflowSession()
+    postings = [{"wallet_id": uuid4(), "amount": "9000000000000000", "type": "top_up"}] * 2
+    with pytest.raises(ledger_service.LedgerError):
+        asyncio.run(ledger_service.post_transactions(session, postings))
+    assert session.rolled_back
+
+
+# ===== validate_postings =====
+
+def test_validate_postings_single_and_batch():
+    wallet_id = uuid4()
+    single = walletapi.validate_postings(wallet_id, {"amount": "1000", "type": " top_up "})
+    assert single == [{"wallet_id": wallet_id, "amount": "1000", "type": "top_up", "description": None}]
+
+    batch = walletapi.validate_postings(wallet_id, {"transactions": [
+        {"amount": "1000", "type": "top_up", "description": "nạp"},
+        {"amount": "-500", "type": "charge"},
+    ]})
+    assert [posting["amount"] for posting in batch] == ["1000", "-500"]
+
+
+@pytest.mark.parametrize("body", [
+    {"transactions": []},
+    {"transactions": "x"},
+    {"type": "top_up"},
+    {"amount": "1000"},
+    {"amount": "1000", "type": "top_up", "description": 1},
+])
+def test_validate_postings_rejects(body):
+    with pytest.raises(HTTPException) as error:
+        walletapi.validate_postings(uuid4(), body)
+    assert error.value.status_code == 400